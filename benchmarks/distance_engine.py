@@ -0,0 +1,129 @@
+"""Kelionės atstumo skaičiavimo mikrotestas.
+
+Palyginamas NumPy haversino ir Vincenty skaičiavimas su paprastu Python ciklu, o
+nurodžius --pipeline, ir su ankstesniu MongoDB $lookup/$reduce pipeline (reikalingas mongod).
+
+    python benchmarks/distance_engine.py --sizes 1000 10000 100000 [--pipeline]
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "flaskr"))
+from distance import EARTH_RADIUS_KM, load_track, path_length  # noqa: E402
+
+
+def generate_points(count):
+    start = datetime(2024, 12, 16, 8, 0, 0)
+    latitude, longitude = 54.6872, 25.2797
+    points = []
+    for i in range(count):
+        latitude += random.uniform(-0.0005, 0.0005)
+        longitude += random.uniform(-0.0005, 0.0005)
+        points.append({"timestamp": start + timedelta(seconds=5 * i), "latitude": latitude, "longitude": longitude})
+    return points
+
+
+def python_haversine(points):
+    total = 0.0
+    for previous, current in zip(points, points[1:]):
+        lat1, lat2 = math.radians(previous["latitude"]), math.radians(current["latitude"])
+        dlat = lat2 - lat1
+        dlon = math.radians(current["longitude"] - previous["longitude"])
+        a = math.sin(dlat / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon / 2) ** 2
+        total += 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+    return total
+
+
+# Ankstesnis GET /journeys/{journey_id} atstumo skaičiavimas duomenų bazėje
+PIPELINE_REDUCE = {
+    "$reduce": {
+        "input": {"$range": [1, {"$size": "$points"}]},
+        "initialValue": 0,
+        "in": {"$add": ["$$value", {"$let": {
+            "vars": {
+                "prev": {"$arrayElemAt": ["$points", {"$subtract": ["$$this", 1]}]},
+                "current": {"$arrayElemAt": ["$points", "$$this"]}
+            },
+            "in": {"$sqrt": {"$add": [
+                {"$pow": [{"$subtract": ["$$current.latitude", "$$prev.latitude"]}, 2]},
+                {"$pow": [{"$subtract": ["$$current.longitude", "$$prev.longitude"]}, 2]}
+            ]}}
+        }}]}
+    }
+}
+
+
+def best_of(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return round(min(timings) * 1000, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--pipeline", action="store_true", help="Matuoti ir MongoDB pipeline (reikalingas mongod)")
+    parser.add_argument("--mongo-uri", default=os.environ.get("MONGO_URI", "mongodb://localhost:27017/"))
+    args = parser.parse_args()
+
+    random.seed(42)
+    db = None
+    if args.pipeline:
+        from bson.objectid import ObjectId
+        from pymongo import MongoClient
+        db = MongoClient(args.mongo_uri)["travel_registration_benchmark"]
+
+    results = []
+    for size in args.sizes:
+        points = generate_points(size)
+        track = load_track(points)
+        result = {
+            "points": size,
+            "load_track_ms": best_of(lambda: load_track(points), args.repeat),
+            "python_haversine_ms": best_of(lambda: python_haversine(points), args.repeat),
+            "numpy_haversine_ms": best_of(lambda: path_length(track.latitudes, track.longitudes, "haversine"), args.repeat),
+            "numpy_vincenty_ms": best_of(lambda: path_length(track.latitudes, track.longitudes, "vincenty"), args.repeat),
+            "haversine_km": round(path_length(track.latitudes, track.longitudes, "haversine"), 6),
+            "vincenty_km": round(path_length(track.latitudes, track.longitudes, "vincenty"), 6)
+        }
+        assert np.isclose(result["haversine_km"], python_haversine(points))
+
+        if db is not None:
+            journey_id = ObjectId()
+            db.journeys.insert_one({"_id": journey_id})
+            db.journey_points.insert_many([dict(point, journey_id=journey_id) for point in points])
+            db.journey_points.create_index("journey_id")
+            pipeline = [
+                {"$match": {"_id": journey_id}},
+                {"$lookup": {"from": "journey_points", "localField": "_id", "foreignField": "journey_id", "as": "points"}},
+                {"$project": {"total_distance": PIPELINE_REDUCE}}
+            ]
+            result["mongo_pipeline_ms"] = best_of(lambda: list(db.journeys.aggregate(pipeline)), args.repeat)
+
+            def find_and_compute():
+                cursor = db.journey_points.find({"journey_id": journey_id}, {"_id": 0}).sort("timestamp", 1)
+                stored = load_track(cursor)
+                return path_length(stored.latitudes, stored.longitudes)
+
+            result["mongo_find_and_numpy_ms"] = best_of(find_and_compute, args.repeat)
+        results.append(result)
+
+    if db is not None:
+        db.client.drop_database("travel_registration_benchmark")
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
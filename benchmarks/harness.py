@@ -0,0 +1,266 @@
+"""API apkrovos testas: užklausų sparta ir vėlinimas pagal maršrutą.
+
+Į atskirą duomenų bazę per API įrašoma N klientų su transporto priemonėmis ir kelionėmis
+(po M taškų), po to keliais srautais vykdomas pasirinktas užklausų mišinys. Rezultatai
+(sparta, p50/p95/p99 kiekvienam maršrutui) spausdinami JSON formatu, kad juos būtų galima
+palyginti tarp versijų. Veikia su vietiniu mongod arba procese su mongomock.
+
+    python benchmarks/harness.py --backend mongomock --clients 20 --operations 5000
+    python benchmarks/harness.py --backend mongod --mix log_coordinates=10,journey_details=5 --output result.json
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from threading import Lock
+
+APP_DIR = os.path.join(os.path.dirname(__file__), "..", "flaskr")
+
+DEFAULT_MIX = "start_journey=1,log_coordinates=20,journey_details=5,vehicle_statistics=2,search=1"
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
+# Taškų laikas prasideda prieš parą, kad testo taškai būtų vėlesni už planuoklio įrašytus
+START = datetime.now().replace(microsecond=0) - timedelta(days=1)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def parse_mix(value):
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        if name.strip() not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Nežinoma operacija: {name}. Galimos: {', '.join(OPERATIONS)}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+# Programa importuojama tik nustačius aplinką (duomenų bazę ir, jei reikia, mongomock)
+def load_app(args):
+    os.environ["MONGO_URI"] = args.mongo_uri
+    os.environ["MONGO_DB"] = args.database
+    if args.backend == "mongomock":
+        import mongomock
+        import pymongo
+        pymongo.MongoClient = mongomock.MongoClient
+    sys.path.insert(0, APP_DIR)
+    import app
+    return app
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=APP_DIR, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Taškas kas sekundę; padėtis kartojasi kas 1000 taškų, kad neišeitų už leistinų ribų
+def coordinates(index, latitude=54.6872, longitude=25.2797):
+    return {
+        "latitude": round(latitude + (index % 1000) * 1e-4, 6),
+        "longitude": round(longitude + (index % 1000) * 1e-4, 6),
+        "timestamp": (START + timedelta(seconds=index)).strftime(TIMESTAMP_FORMAT)
+    }
+
+
+# Testo duomenys: klientai, transporto priemonės, baigtos ir vykstančios kelionės
+class Fixture:
+    def __init__(self):
+        self.vehicles = []
+        self.journeys = []
+        self.open_journeys = []
+        self.words = []
+        self._counters = {}
+        self._lock = Lock()
+
+    # Kitas (didėjantis) kelionės taško laikas, kad taškai būtų registruojami eilės tvarka
+    def next_index(self, journey_id):
+        with self._lock:
+            counter = self._counters.setdefault(journey_id, itertools.count(10 ** 6))
+            return next(counter)
+
+    def add_open_journey(self, journey_id):
+        with self._lock:
+            self.open_journeys.append(journey_id)
+            self.journeys.append(journey_id)
+
+
+def seed(client, args):
+    fixture = Fixture()
+    for c in range(args.clients):
+        response = client.put("/clients", json={
+            "first_name": f"Vardas{c}", "last_name": f"Pavarde{c}",
+            "email": f"client{c}@example.com", "birth_date": "1990-01-01"
+        })
+        client_id = response.get_json()["client_id"]
+        fixture.words.append(f"Pavarde{c}")
+        for v in range(args.vehicles):
+            response = client.put("/vehicles", json={
+                "client_id": client_id, "model": "Model", "manufacturer": f"Gamintojas{v}",
+                "license_plate": f"B{c:04d}{v:02d}", "vin": f"VIN{c:08d}{v:04d}", "year": 2020
+            })
+            vehicle_id = response.get_json()["id"]
+            fixture.vehicles.append(vehicle_id)
+
+            for j in range(args.journeys):
+                journey_id = client.put("/journeys", json={"vehicle_id": vehicle_id, "interval": 3600}).get_json()["id"]
+                for start in range(0, args.points, 10000):
+                    batch = [coordinates(i) for i in range(start, min(args.points, start + 10000))]
+                    client.post(f"/journeys/{journey_id}/coordinates:batch", json=batch)
+                # Paskutinė transporto priemonės kelionė paliekama vykstanti
+                if j < args.journeys - 1:
+                    client.put(f"/journeys/{journey_id}/end")
+                    fixture.journeys.append(journey_id)
+                else:
+                    fixture.add_open_journey(journey_id)
+    return fixture
+
+
+def start_journey(client, fixture, rng):
+    response = client.put("/journeys", json={"vehicle_id": rng.choice(fixture.vehicles), "interval": 3600})
+    if response.status_code == 201:
+        fixture.add_open_journey(response.get_json()["id"])
+    return response
+
+
+def log_coordinates(client, fixture, rng):
+    journey_id = rng.choice(fixture.open_journeys)
+    return client.post(f"/journeys/{journey_id}/coordinates", json=coordinates(fixture.next_index(journey_id)))
+
+
+def journey_details(client, fixture, rng):
+    return client.get(f"/journeys/{rng.choice(fixture.journeys)}")
+
+
+def vehicle_statistics(client, fixture, rng):
+    return client.get(f"/vehicles/{rng.choice(fixture.vehicles)}/statistics")
+
+
+def search(client, fixture, rng):
+    return client.get("/search", query_string={"q": rng.choice(fixture.words)})
+
+
+OPERATIONS = {
+    "start_journey": start_journey,
+    "log_coordinates": log_coordinates,
+    "journey_details": journey_details,
+    "vehicle_statistics": vehicle_statistics,
+    "search": search
+}
+
+
+def run(app, fixture, args):
+    names = list(args.mix)
+    weights = [args.mix[name] for name in names]
+    plan = random.Random(args.seed).choices(names, weights, k=args.operations)
+    results = {name: {"latencies": [], "statuses": {}} for name in names}
+    lock = Lock()
+
+    def worker(worker_index):
+        client = app.app.test_client()
+        rng = random.Random(args.seed + worker_index + 1)
+        for name in plan[worker_index::args.concurrency]:
+            started = time.perf_counter()
+            try:
+                status = OPERATIONS[name](client, fixture, rng).status_code
+            except Exception as e:
+                status = type(e).__name__
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                results[name]["latencies"].append(elapsed)
+                results[name]["statuses"][status] = results[name]["statuses"].get(status, 0) + 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as executor:
+        list(executor.map(worker, range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    endpoints = {}
+    for name, result in results.items():
+        latencies = result["latencies"]
+        if not latencies:
+            continue
+        errors = sum(count for status, count in result["statuses"].items()
+                     if not isinstance(status, int) or status >= 400)
+        endpoints[name] = {
+            "count": len(latencies),
+            "errors": errors,
+            "throughput_rps": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 0.5), 3),
+            "p95_ms": round(percentile(latencies, 0.95), 3),
+            "p99_ms": round(percentile(latencies, 0.99), 3),
+            "statuses": {str(status): count for status, count in sorted(result["statuses"].items(), key=str)}
+        }
+    return elapsed, endpoints
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=["mongomock", "mongod"], default="mongomock")
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017/")
+    parser.add_argument("--database", default="travel_registration_benchmark")
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--vehicles", type=int, default=1, help="Transporto priemonių kiekvienam klientui")
+    parser.add_argument("--journeys", type=int, default=3, help="Kelionių kiekvienai transporto priemonei")
+    parser.add_argument("--points", type=int, default=200, help="Taškų kiekvienoje kelionėje")
+    parser.add_argument("--operations", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help=f"Operacijų svoriai (numatytieji: {DEFAULT_MIX})")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Rezultatų JSON failas")
+    args = parser.parse_args()
+
+    app = load_app(args)
+    client = app.app.test_client()
+    try:
+        client.post("/cleanup")
+        app.create_indexes()
+        seeding_started = time.perf_counter()
+        fixture = seed(client, args)
+        seed_seconds = time.perf_counter() - seeding_started
+
+        elapsed, endpoints = run(app, fixture, args)
+        report = {
+            "commit": git_commit(),
+            "backend": args.backend,
+            "config": {
+                "clients": args.clients,
+                "vehicles": args.vehicles,
+                "journeys": args.journeys,
+                "points": args.points,
+                "operations": args.operations,
+                "concurrency": args.concurrency,
+                "mix": args.mix,
+                "seed": args.seed
+            },
+            "seed_seconds": round(seed_seconds, 3),
+            "duration_seconds": round(elapsed, 3),
+            "throughput_rps": round(args.operations / elapsed, 1),
+            "endpoints": endpoints
+        }
+        output = json.dumps(report, indent=2)
+        print(output)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                f.write(output + "\n")
+    finally:
+        client.post("/cleanup")
+        app.coordinate_scheduler.stop(timeout=5)
+        if app.ingest_buffer is not None:
+            app.ingest_buffer.stop(timeout=5)
+
+
+if __name__ == "__main__":
+    main()
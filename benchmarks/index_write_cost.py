@@ -0,0 +1,135 @@
+"""Indeksų kaina įrašant: ankstesnis indeksų rinkinys vs mažiausias (indexes.py).
+
+Į atskirą duomenų bazę įrašomos vienodos sintetinės kelionės ir jų taškai, kai
+kolekcijose sukurti ankstesni indeksai (papildomas journey_id, (latitude, longitude),
+(start_time, end_time), (vehicle_id, is_completed) ir kelionės aprašymo tekstinis
+indeksas) ir kai sukurti tik deklaruoti indeksai. Palyginama taškų įrašymo sparta,
+kelionių pradžios ir pabaigos sparta bei indeksų dydis. Reikalingas veikiantis mongod.
+
+    python benchmarks/index_write_cost.py --journeys 200 --points 1000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, DESCENDING, GEOSPHERE, TEXT, IndexModel, MongoClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "flaskr"))
+from indexes import JOURNEY_INDEXES, JOURNEY_POINT_INDEXES, ensure_indexes  # noqa: E402
+from point_store import DocumentPointStore  # noqa: E402
+
+# Indeksai, kurie buvo kuriami prieš indeksų peržiūrą
+PREVIOUS_INDEXES = {
+    "journey_points": [
+        IndexModel([("journey_id", ASCENDING)]),
+        IndexModel([("journey_id", ASCENDING), ("timestamp", ASCENDING)], unique=True),
+        IndexModel([("latitude", ASCENDING), ("longitude", ASCENDING)]),
+        IndexModel([("location", GEOSPHERE), ("timestamp", ASCENDING)])
+    ],
+    "journeys": [
+        IndexModel([("vehicle_id", ASCENDING), ("start_time", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("client_id", ASCENDING), ("start_time", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("start_time", ASCENDING), ("end_time", ASCENDING)]),
+        IndexModel([("vehicle_id", ASCENDING), ("is_completed", ASCENDING)]),
+        IndexModel([("is_completed", ASCENDING)], partialFilterExpression={"is_completed": False}),
+        IndexModel([("archived", ASCENDING), ("end_time", ASCENDING)], partialFilterExpression={"is_completed": True}),
+        IndexModel([("description", TEXT)], default_language="english")
+    ]
+}
+
+MINIMAL_INDEXES = {
+    "journey_points": JOURNEY_POINT_INDEXES,
+    "journeys": JOURNEY_INDEXES
+}
+
+
+def generate_journey(journey_id, points, interval):
+    start = datetime(2024, 12, 16, 8, 0, 0)
+    latitude, longitude = 54.6872, 25.2797
+    for i in range(points):
+        latitude += random.uniform(-0.0005, 0.0005)
+        longitude += random.uniform(-0.0005, 0.0005)
+        yield {
+            "journey_id": journey_id,
+            "timestamp": start + timedelta(seconds=i * interval),
+            "latitude": round(latitude, 6),
+            "longitude": round(longitude, 6)
+        }
+
+
+def run(db, index_set, journey_ids, vehicle_ids, args):
+    for name, models in index_set.items():
+        db.drop_collection(name)
+        ensure_indexes(db[name], models)
+    store = DocumentPointStore(db["journey_points"])
+
+    # Kelionių pradžia ir pabaiga (kaip PUT /journeys ir PUT /journeys/<id>/end)
+    started = time.perf_counter()
+    for journey_id in journey_ids:
+        db.journeys.insert_one({
+            "_id": journey_id,
+            "vehicle_id": random.choice(vehicle_ids),
+            "client_id": ObjectId(),
+            "start_time": datetime(2024, 12, 16, 8, 0, 0),
+            "end_time": None,
+            "is_completed": False,
+            "interval": args.interval
+        })
+    for journey_id in journey_ids:
+        db.journeys.update_one(
+            {"_id": journey_id, "is_completed": False},
+            {"$set": {"end_time": datetime(2024, 12, 16, 9, 0, 0), "is_completed": True}}
+        )
+    journey_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for journey_id in journey_ids:
+        batch = list(generate_journey(journey_id, args.points, args.interval))
+        for i in range(0, len(batch), args.batch_size):
+            store.insert(batch[i:i + args.batch_size])
+    write_seconds = time.perf_counter() - started
+
+    point_stats = db.command("collStats", "journey_points")
+    journey_stats = db.command("collStats", "journeys")
+    return {
+        "indexes": {name: sorted(db[name].index_information()) for name in index_set},
+        "write_points_per_second": round(len(journey_ids) * args.points / write_seconds),
+        "journeys_started_and_ended_per_second": round(len(journey_ids) / journey_seconds),
+        "point_index_size_bytes": point_stats["totalIndexSize"],
+        "journey_index_size_bytes": journey_stats["totalIndexSize"]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-uri", default=os.environ.get("MONGO_URI", "mongodb://localhost:27017/"))
+    parser.add_argument("--database", default="travel_registration_benchmark")
+    parser.add_argument("--journeys", type=int, default=100)
+    parser.add_argument("--points", type=int, default=1000, help="Taškų skaičius vienoje kelionėje")
+    parser.add_argument("--interval", type=int, default=5, help="Intervalas tarp taškų sekundėmis")
+    parser.add_argument("--batch-size", type=int, default=100, help="Taškų skaičius vienoje įrašymo operacijoje")
+    parser.add_argument("--vehicles", type=int, default=20)
+    args = parser.parse_args()
+
+    db = MongoClient(args.mongo_uri)[args.database]
+    vehicle_ids = [ObjectId() for _ in range(args.vehicles)]
+    results = {"journeys": args.journeys, "points_per_journey": args.points}
+    for name, index_set in (("previous", PREVIOUS_INDEXES), ("minimal", MINIMAL_INDEXES)):
+        random.seed(42)
+        journey_ids = [ObjectId() for _ in range(args.journeys)]
+        results[name] = run(db, index_set, journey_ids, vehicle_ids, args)
+    db.client.drop_database(args.database)
+
+    results["write_speedup"] = round(
+        results["minimal"]["write_points_per_second"] / results["previous"]["write_points_per_second"], 2
+    )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""JSON atsakymų serializavimo mikrotestas.
+
+Palyginamas ankstesnis kelias (ObjectId verčiamas str() kiekvienam įrašui, po to
+standartinis Flask jsonify) su MongoJSONProvider (dokumentai serializuojami tiesiogiai)
+standartiniu json ir orjson varikliu, dideliems transporto priemonių sąrašo ir paieškos
+atsakymams. Duomenų bazė nereikalinga.
+
+    python benchmarks/json_encoding.py --sizes 1000 10000 50000 --repeat 5
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+from bson.objectid import ObjectId
+from flask import Flask
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "flaskr"))
+import json_provider  # noqa: E402
+from json_provider import MongoJSONProvider  # noqa: E402
+
+
+def vehicles(count, client_id):
+    return [{
+        "_id": ObjectId(),
+        "client_id": client_id,
+        "model": random.choice(["Model S", "Corolla", "Golf", "Octavia"]),
+        "manufacturer": random.choice(["Tesla", "Toyota", "Volkswagen", "Škoda"]),
+        "license_plate": f"ABC{i:04d}",
+        "vin": f"VIN{i:014d}",
+        "year": 2000 + i % 25
+    } for i in range(count)]
+
+
+def search_results(count):
+    return [{
+        "_id": ObjectId(),
+        "description": f"Kelionė {i} iš Vilniaus į Kauną",
+        "vehicle_id": ObjectId(),
+        "score": random.random(),
+        "type": "journeys"
+    } for i in range(count)]
+
+
+# Ankstesnis kelias: kiekvienas dokumentas kopijuojamas ir ObjectId verčiami tekstu
+def legacy_vehicles(items):
+    return [{**item, "_id": str(item["_id"]), "client_id": str(item["client_id"])} for item in items]
+
+
+def legacy_search(items):
+    results = {"clients": [], "vehicles": [], "journeys": []}
+    for item in items:
+        record = {key: value for key, value in item.items() if key != "type"}
+        for field in ("_id", "vehicle_id"):
+            record[field] = str(record[field])
+        results[item["type"]].append(record)
+    return results
+
+
+def direct_search(items):
+    results = {"clients": [], "vehicles": [], "journeys": []}
+    for item in items:
+        results[item.pop("type")].append(item)
+    return results
+
+
+def make_app(provider, engine):
+    app = Flask(__name__)
+    app.config["JSON_ENGINE"] = engine
+    if provider is not None:
+        app.json = provider(app)
+    return app
+
+
+def measure(app, build, data, repeat):
+    timings = []
+    with app.app_context():
+        for _ in range(repeat):
+            # Paieškos rezultatai keičiami vietoje, todėl kiekvienam kartui naudojama kopija
+            items = [dict(item) for item in data]
+            started = time.perf_counter()
+            response = app.json.response(build(items))
+            response.get_data()
+            timings.append((time.perf_counter() - started) * 1000)
+    return round(min(timings), 2), len(response.get_data())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    variants = [("flask-default", None, "json", legacy_vehicles, legacy_search)]
+    variants.append(("provider-json", MongoJSONProvider, "json", list, direct_search))
+    if json_provider.orjson is not None:
+        variants.append(("provider-orjson", MongoJSONProvider, "orjson", list, direct_search))
+
+    results = []
+    client_id = ObjectId()
+    for size in args.sizes:
+        data = {"vehicles": vehicles(size, client_id), "search": search_results(size)}
+        for name, provider, engine, build_vehicles, build_search in variants:
+            app = make_app(provider, engine)
+            for response, build in (("vehicles", build_vehicles), ("search", build_search)):
+                milliseconds, size_bytes = measure(app, build, data[response], args.repeat)
+                results.append({
+                    "variant": name, "response": response, "documents": size,
+                    "ms": milliseconds, "bytes": size_bytes
+                })
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Kelionės taškų saugojimo būdų palyginimas: dokumentas kiekvienam taškui vs kibirai.
+
+Į atskirą duomenų bazę įrašomos vienodos sintetinės kelionės abiem būdais ir
+palyginamas kolekcijų bei indeksų dydis, įrašymo trukmė ir kelionės nuskaitymo
+vėlinimas. Reikalingas veikiantis mongod.
+
+    python benchmarks/point_storage.py --journeys 200 --points 2000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from bson.objectid import ObjectId
+from pymongo import MongoClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "flaskr"))
+from point_store import DocumentPointStore, BucketedPointStore  # noqa: E402
+
+
+def generate_journey(journey_id, points, interval):
+    start = datetime(2024, 12, 16, 8, 0, 0)
+    latitude, longitude = 54.6872, 25.2797
+    for i in range(points):
+        latitude += random.uniform(-0.0005, 0.0005)
+        longitude += random.uniform(-0.0005, 0.0005)
+        yield {
+            "journey_id": journey_id,
+            "timestamp": start + timedelta(seconds=i * interval),
+            "latitude": round(latitude, 6),
+            "longitude": round(longitude, 6)
+        }
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run(store, db, collection_name, journey_ids, args):
+    db.drop_collection(collection_name)
+    store.create_indexes()
+
+    started = time.perf_counter()
+    for journey_id in journey_ids:
+        batch = list(generate_journey(journey_id, args.points, args.interval))
+        for i in range(0, len(batch), args.batch_size):
+            store.insert(batch[i:i + args.batch_size])
+    write_seconds = time.perf_counter() - started
+
+    read_ms = []
+    for journey_id in random.sample(journey_ids, min(args.reads, len(journey_ids))):
+        started = time.perf_counter()
+        count = sum(1 for _ in store.iter_points(journey_id))
+        read_ms.append((time.perf_counter() - started) * 1000)
+        assert count == args.points
+
+    stats = db.command("collStats", collection_name)
+    return {
+        "documents": stats["count"],
+        "data_size_bytes": stats["size"],
+        "storage_size_bytes": stats["storageSize"],
+        "index_size_bytes": stats["totalIndexSize"],
+        "write_points_per_second": round(len(journey_ids) * args.points / write_seconds),
+        "read_journey_ms_p50": round(percentile(read_ms, 0.50), 2),
+        "read_journey_ms_p95": round(percentile(read_ms, 0.95), 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-uri", default=os.environ.get("MONGO_URI", "mongodb://localhost:27017/"))
+    parser.add_argument("--database", default="travel_registration_benchmark")
+    parser.add_argument("--journeys", type=int, default=100)
+    parser.add_argument("--points", type=int, default=1000, help="Taškų skaičius vienoje kelionėje")
+    parser.add_argument("--interval", type=int, default=5, help="Intervalas tarp taškų sekundėmis")
+    parser.add_argument("--batch-size", type=int, default=100, help="Taškų skaičius vienoje įrašymo operacijoje")
+    parser.add_argument("--bucket-points", type=int, default=200)
+    parser.add_argument("--bucket-minutes", type=int, default=60)
+    parser.add_argument("--reads", type=int, default=50, help="Nuskaitomų kelionių skaičius")
+    args = parser.parse_args()
+
+    random.seed(42)
+    db = MongoClient(args.mongo_uri)[args.database]
+    journey_ids = [ObjectId() for _ in range(args.journeys)]
+    stores = {
+        "documents": ("journey_points", DocumentPointStore(db["journey_points"])),
+        "buckets": ("journey_point_buckets", BucketedPointStore(
+            db["journey_point_buckets"],
+            max_points=args.bucket_points,
+            max_span=timedelta(minutes=args.bucket_minutes)
+        ))
+    }
+
+    results = {"journeys": args.journeys, "points_per_journey": args.points}
+    for name, (collection_name, store) in stores.items():
+        results[name] = run(store, db, collection_name, journey_ids, args)
+    db.client.drop_database(args.database)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
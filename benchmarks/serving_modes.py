@@ -0,0 +1,164 @@
+"""Serverio režimų palyginimas: Flask su srautais (wsgi) vs Starlette + Motor (asgi).
+
+Kiekvienam režimui paleidžiamas flaskr/serve.py, sukuriama kelionė ir iš daug vienu metu
+atidarytų (keep-alive) prisijungimų siunčiamos koordinačių užklausos. Spausdinama
+užklausų sparta per sekundę ir vėlinimo procentiliai. Reikalingas veikiantis mongod.
+
+    python benchmarks/serving_modes.py --connections 50 500 2000 --requests 20000
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from datetime import datetime, timedelta
+
+SERVE = os.path.join(os.path.dirname(__file__), "..", "flaskr", "serve.py")
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def call(base, method, path, payload):
+    request = urllib.request.Request(
+        base + path, data=json.dumps(payload).encode(), method=method,
+        headers={"Content-Type": "application/json"}
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Serveris neatsiliepė per {timeout} s")
+
+
+# Viena keep-alive HTTP/1.1 jungtis; serveriui uždarius jungtį prisijungiama iš naujo
+class Connection:
+    def __init__(self, port):
+        self.port = port
+        self.reader = self.writer = None
+
+    async def request(self, payload):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection("127.0.0.1", self.port)
+        self.writer.write(payload)
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        length, close = 0, False
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+            elif name.lower() == "connection" and value.strip().lower() == "close":
+                close = True
+        await self.reader.readexactly(length)
+        if close:
+            self.writer.close()
+            self.reader = self.writer = None
+        return status
+
+
+def coordinate_request(port, journey_id, index):
+    body = json.dumps({
+        "latitude": 54.6872 + index * 1e-6,
+        "longitude": 25.2797,
+        "timestamp": (datetime(2024, 12, 16, 8) + timedelta(seconds=index)).strftime("%Y-%m-%dT%H:%M:%S")
+    }).encode()
+    return (
+        f"POST /journeys/{journey_id}/coordinates HTTP/1.1\r\n"
+        f"Host: 127.0.0.1:{port}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n"
+    ).encode() + body
+
+
+async def load(port, journey_id, connections, total):
+    latencies = []
+    statuses = {}
+    counter = iter(range(total))
+
+    async def worker():
+        connection = Connection(port)
+        for index in counter:
+            started = time.perf_counter()
+            try:
+                status = await connection.request(coordinate_request(port, journey_id, index))
+            except (OSError, asyncio.IncompleteReadError, IndexError, ValueError):
+                connection.writer = None
+                status = "error"
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(connections)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests_per_second": round(total / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.5), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+        "statuses": {str(status): count for status, count in statuses.items()}
+    }
+
+
+def run_mode(mode, args):
+    server = subprocess.Popen(
+        [sys.executable, SERVE, "--mode", mode, "--port", str(args.port), "--workers", str(args.workers)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_for_port(args.port)
+        base = f"http://127.0.0.1:{args.port}"
+        call(base, "POST", "/cleanup", {})
+        client_id = call(base, "PUT", "/clients", {
+            "first_name": "Test", "last_name": "Test", "email": "benchmark@example.com", "birth_date": "1990-01-01"
+        })["client_id"]
+        vehicle_id = call(base, "PUT", "/vehicles", {
+            "client_id": client_id, "model": "Model", "manufacturer": "Maker",
+            "license_plate": "BNC001", "vin": "BENCHMARKVIN00001", "year": 2020
+        })["id"]
+
+        results = []
+        for connections in args.connections:
+            journey_id = call(base, "PUT", "/journeys", {"vehicle_id": vehicle_id, "interval": 3600})["id"]
+            result = asyncio.run(load(args.port, journey_id, connections, args.requests))
+            results.append({"mode": mode, "connections": connections, **result})
+            call(base, "PUT", f"/journeys/{journey_id}/end", {})
+        return results
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", nargs="+", choices=["wsgi", "asgi"], default=["wsgi", "asgi"])
+    parser.add_argument("--connections", type=int, nargs="+", default=[50, 500, 2000])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--workers", type=int, default=1, help="asgi procesų skaičius")
+    parser.add_argument("--port", type=int, default=5055)
+    args = parser.parse_args()
+
+    results = []
+    for mode in args.modes:
+        results.extend(run_mode(mode, args))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+from datetime import timedelta
+
+import numpy as np
+from pymongo.errors import DuplicateKeyError
+
+from distance import EPOCH, haversine, load_track
+
+# Greitis (km/h), mažesnis už šį, laikomas stovėjimu (tuščiąja eiga)
+IDLE_SPEED_KMH = 3.0
+# Trumpiausias saugomas sustojimas (s); užklausoje nurodoma ne trumpesnė trukmė
+MIN_STOP_SECONDS = 60
+DEFAULT_STOP_MINUTES = 5
+# Greičio histograma: intervalai po SPEED_BIN_KMH, paskutinis - nuo SPEED_BINS * SPEED_BIN_KMH ir daugiau
+SPEED_BIN_KMH = 10
+SPEED_BINS = 20
+
+
+def to_seconds(moment):
+    return (moment - EPOCH).total_seconds()
+
+
+def to_datetime(seconds):
+    return EPOCH + timedelta(seconds=float(seconds))
+
+
+# Pradinė kelionės analitikos būsena (journey_analytics dokumentas)
+def empty_analytics(journey_id):
+    return {
+        "_id": journey_id,
+        "is_completed": False,
+        "point_count": 0,
+        "first_timestamp": None,
+        "last_point": None,
+        "distance_km": 0.0,
+        "moving_distance_km": 0.0,
+        "moving_seconds": 0.0,
+        "idle_seconds": 0.0,
+        "max_speed_kmh": 0.0,
+        "speed_histogram": [0.0] * (SPEED_BINS + 1),
+        "stops": [],
+        # Sustojimas, tebesitęsiantis paskutiniame apdorotame taške (pradžia ir vieta)
+        "open_stop": None
+    }
+
+
+# Stovėjimo intervalas pridedamas prie sustojimų, jei jis ne trumpesnis už MIN_STOP_SECONDS
+def close_stop(state, stop, end):
+    if end - stop["start"] >= MIN_STOP_SECONDS:
+        state["stops"].append({
+            "start": to_datetime(stop["start"]),
+            "end": to_datetime(end),
+            "latitude": stop["latitude"],
+            "longitude": stop["longitude"]
+        })
+
+
+# Vienas vektorizuotas perėjimas per pagal laiką išrikiuotus taškus. Masyvų pirmasis taškas -
+# paskutinis jau apdorotas taškas (jei toks yra), todėl būsena tęsiama nuo jo: atkarpų greičiai,
+# važiavimo ir stovėjimo laikas, greičio histograma ir stovėjimo intervalai (sustojimai).
+def advance(state, timestamps, latitudes, longitudes):
+    if len(timestamps) < 2:
+        return state
+    distances = haversine(latitudes, longitudes)
+    durations = np.diff(timestamps)
+    speeds = np.divide(distances * 3600, durations, out=np.zeros_like(distances), where=durations > 0)
+    moving = (durations > 0) & (speeds >= IDLE_SPEED_KMH)
+
+    state["distance_km"] += float(distances.sum())
+    state["moving_distance_km"] += float(distances[moving].sum())
+    state["moving_seconds"] += float(durations[moving].sum())
+    state["idle_seconds"] += float(durations[~moving].sum())
+    state["max_speed_kmh"] = max(state["max_speed_kmh"], float(speeds.max()))
+    bins = np.minimum((speeds // SPEED_BIN_KMH).astype(np.int64), SPEED_BINS)
+    histogram = np.bincount(bins, weights=durations, minlength=SPEED_BINS + 1)
+    state["speed_histogram"] = [a + float(b) for a, b in zip(state["speed_histogram"], histogram)]
+
+    # Nuoseklių stovėjimo atkarpų grupės: atkarpos [starts[k], ends[k]) nuo taško starts[k] iki taško ends[k]
+    edges = np.diff(np.concatenate(([0], (~moving).astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    open_stop = state["open_stop"]
+    if open_stop is not None and (not len(starts) or starts[0] != 0):
+        close_stop(state, open_stop, timestamps[0])
+        open_stop = None
+    for start, end in zip(starts, ends):
+        stop = {"start": float(timestamps[start]), "latitude": float(latitudes[start]), "longitude": float(longitudes[start])}
+        if start == 0 and open_stop is not None:
+            stop = open_stop
+        if end == len(moving):
+            open_stop = stop
+        else:
+            close_stop(state, stop, timestamps[end])
+            open_stop = None
+    state["open_stop"] = open_stop
+    return state
+
+
+# Kelionės analitika: vidutinis ir didžiausias greitis, stovėjimo laikas, sustojimai ir
+# greičio histograma. Skaičiuojama vienu perėjimu per taškus ir saugoma journey_analytics
+# kolekcijoje: vykstančiai kelionei būsena tęsiama nuo paskutinio apdoroto taško (skaitomi tik
+# naujesni taškai), baigtai kelionei rezultatas apskaičiuojamas vieną kartą ir nebekeičiamas.
+class TripAnalytics:
+    def __init__(self, collection, point_store):
+        self.collection = collection
+        self.point_store = point_store
+
+    # journey - kelionės dokumentas su is_completed ir stats_stale
+    def get(self, journey):
+        state = self.collection.find_one({"_id": journey["_id"]})
+        if state is not None and state["is_completed"]:
+            return state
+
+        previous_count = state["point_count"] if state is not None else None
+        # Taškai, įrašyti senesni už paskutinį žinomą (stats_stale), perskaičiuojami iš naujo
+        if state is None or journey.get("stats_stale"):
+            state = empty_analytics(journey["_id"])
+        state = self._advance(state)
+
+        if journey.get("is_completed"):
+            if state["open_stop"] is not None:
+                close_stop(state, state["open_stop"], to_seconds(state["last_point"]["timestamp"]))
+                state["open_stop"] = None
+            state["is_completed"] = True
+            self.collection.replace_one({"_id": journey["_id"]}, state, upsert=True)
+        elif previous_count is None:
+            try:
+                self.collection.insert_one(state)
+            except DuplicateKeyError:  # Lygiagreti užklausa jau įrašė būseną
+                pass
+        elif state["point_count"] != previous_count:
+            # Būsena keičiama tik jei jos nepakeitė lygiagreti užklausa
+            self.collection.replace_one(
+                {"_id": journey["_id"], "is_completed": False, "point_count": previous_count}, state
+            )
+        return state
+
+    def _advance(self, state):
+        last_point = state["last_point"]
+        track = load_track(self.point_store.iter_points(
+            state["_id"], last_point["timestamp"] if last_point is not None else None
+        ))
+        if not len(track):
+            return state
+
+        timestamps, latitudes, longitudes = track.timestamps, track.latitudes, track.longitudes
+        if last_point is None:
+            state["first_timestamp"] = track.first["timestamp"]
+        else:
+            timestamps = np.concatenate(([to_seconds(last_point["timestamp"])], timestamps))
+            latitudes = np.concatenate(([last_point["latitude"]], latitudes))
+            longitudes = np.concatenate(([last_point["longitude"]], longitudes))
+        advance(state, timestamps, latitudes, longitudes)
+        state["point_count"] += len(track)
+        state["last_point"] = {
+            "timestamp": track.last["timestamp"],
+            "latitude": track.last["latitude"],
+            "longitude": track.last["longitude"]
+        }
+        return state
+
+    def invalidate(self, journey_id):
+        self.collection.delete_one({"_id": journey_id})
@@ -1,645 +1,1410 @@
-from flask import Flask, request, jsonify
-from pymongo import MongoClient
-from bson.objectid import ObjectId
-import re
-from datetime import datetime
-from threading import Thread, Event
-import time
-import requests
-
-app = Flask(__name__)
-
-BASE_URL = "http://127.0.0.1:5000"
-client = MongoClient('mongodb://localhost:27017/')
-db = client['travel_registration_system']
-clients_collection = db['clients']
-vehicles_collection = db['vehicles']
-journeys_collection = db['journeys']
-journey_points_collection = db["journey_points"]
-
-## Klientų kolekcija
-clients_collection.create_index("email", unique=True)  # Indeksas pagal el. paštą, užtikrinant unikalumą
-clients_collection.create_index("_id")  # Indeksas pagal pagrindinį raktą (_id) (nebūtina)
-
-# Transporto priemonių kolekcija
-vehicles_collection.create_index("vin", unique=True)  # Indeksas pagal VIN, užtikrinant unikalumą
-vehicles_collection.create_index("client_id")  # Indeksas pagal klientų ID
-
-# Kelionių kolekcija
-journeys_collection.create_index("_id")  # Indeksas pagal pagrindinį raktą (_id)
-journeys_collection.create_index("vehicle_id")  # Indeksas pagal transporto priemonės ID
-journeys_collection.create_index([("start_time", 1), ("end_time", 1)])  # Indeksas pagal kelionės pradžios ir pabaigos laiką
-
-# Kelionės taškų kolekcija
-journey_points_collection.create_index("journey_id")  # Indeksas pagal kelionės ID
-journey_points_collection.create_index([("latitude", 1), ("longitude", 1)])  # Sudėtinis indeksas pagal platumą ir ilgumą
-
-
-def is_valid_email(email):
-    email_regex = r'^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$'
-    return re.match(email_regex, email) is not None
-
-# 1. Registruoti naują klientą
-@app.route('/clients', methods=['PUT'])
-def register_client():
-    try:
-        data = request.get_json()
-
-        # Įvestis
-        required_fields = ["first_name", "last_name", "email", "birth_date"]
-        for field in required_fields:
-            if field not in data:
-                return jsonify({"error": f"Trūksta duomenų: {field}"}), 400
-        if not is_valid_email(data["email"]):
-            return jsonify({"error": "Netinkamas pašto formatas."})
-        if clients_collection.find_one({"email": data["email"]}):
-            return jsonify({"error": "Klientas jau egzistuoja!"}), 400
-        # birth_date paverčiama į datetime tipą
-        try:
-            birth_date = datetime.strptime(data["birth_date"], "%Y-%m-%d")
-        except ValueError:
-            return jsonify({"error": "Netinkamas datos formatas. Naudokite YYYY-MM-DD."}), 400
-
-        # client data
-        client_data = {
-            "first_name": data["first_name"],
-            "last_name": data["last_name"],
-            "email": data["email"],
-            "birth_date": birth_date
-        }
-        # client data pridedama į duomenų bazę
-        result = clients_collection.insert_one(client_data)
-
-        return jsonify({"message": "Klientas užregistruotas sėkmingai", "client_id": str(result.inserted_id)}), 201
-
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
-
-# 2. Gauti kliento duomenis
-@app.route('/clients/<string:clientId>', methods=['GET'])
-def get_client_details(clientId):
-    try:
-        if not ObjectId.is_valid(clientId):
-            return jsonify({"error": "Netinkamas client_id formatas!"}), 400
-
-        # Gauti kliento duomenis iš duomenų bazės
-        client_data = clients_collection.find_one({"_id": ObjectId(clientId)})
-
-        if not client_data:
-            return jsonify({"error": "Klientas nerastas"}), 404
-
-        response = {
-            "id": str(client_data["_id"]),
-            "first_name": client_data["first_name"],
-            "last_name": client_data["last_name"],
-            "email": client_data["email"],
-            "birth_date": client_data["birth_date"].strftime("%Y-%m-%d")
-        }
-
-        return jsonify(response), 200
-
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
-
-# 3. Registruoti transporto priemonę 
-@app.route("/vehicles", methods=["PUT"])
-def register_vehicle():
-    data = request.json
-    # Konvertuojamas client_id iš string į ObjectId
-    try:
-        client_id = ObjectId(data["client_id"])
-    except Exception:
-        return jsonify({"error": "Neteisingas client_id formatas!"}), 400
-
-    # Tikrinama, ar klientas egzistuoja
-    if not clients_collection.find_one({"_id": client_id}):
-        return jsonify({"error": "Klientas nerastas!"}), 400
-
-    # Tikrinama, ar transporto priemonė su tokiu VIN jau egzistuoja
-    if vehicles_collection.find_one({"vin": data["vin"]}):
-        return jsonify({"error": "Transporto priemonė su šiuo VIN jau egzistuoja!"}), 400
-
-    # Pridedama transporto priemonė į duomenų bazę
-    vehicle_data = {
-        "client_id": client_id,
-        "model": data["model"],
-        "manufacturer": data["manufacturer"],
-        "license_plate": data["license_plate"],
-        "vin": data["vin"],
-        "year": data["year"]
-    }
-    result = vehicles_collection.insert_one(vehicle_data)
-    return jsonify({"message": "Transporto priemonė užregistruota sėkmingai!", "id": str(result.inserted_id)})
-
-
-# 4. Gauti transporto priemonės duomenis
-@app.route("/clients/<client_id>/vehicles", methods=["GET"])
-def get_vehicles_by_client(client_id):
-    # Konvertuojamas client_id iš string į ObjectId
-    try:
-        client_id_object = ObjectId(client_id)
-    except Exception:
-        return jsonify({"error": "Neteisingas client_id formatas!"}), 400
-
-    # Tikrinama, ar klientas egzistuoja
-    if not clients_collection.find_one({"_id": client_id_object}):
-        return jsonify({"error": "Klientas nerastas!"}), 400
-
-    # Gaunamos visos transporto priemonės, susietos su klientu
-    vehicles = list(vehicles_collection.find({"client_id": client_id_object}))
-    # Konvertuojamas ObjectId į string JSON serializavimui
-    for vehicle in vehicles:
-        vehicle["_id"] = str(vehicle["_id"])
-        vehicle["client_id"] = str(vehicle["client_id"])
-    return jsonify(vehicles)
-
-# Signalas sustabdyti kelionę
-stop_signal = Event()
-
-# 5. Pradėti naują kelionę
-@app.route("/journeys", methods=["PUT"])
-def start_journey():
-    try:
-        data = request.json
-
-        # Tikrinama, ar būtini laukai yra pateikti
-        if "vehicle_id" not in data or "interval" not in data:
-            return jsonify({"error": "Trūksta laukelių: vehicle_id arba interval"}), 400
-
-        # Tikrinamas intervalas (mažiausiai 5 sekundės)
-        interval = int(data["interval"])
-        if interval < 5:
-            return jsonify({"error": "Intervalas turi būti ne mažesnis kaip 5 sekundės!"}), 400
-
-        # Tikrinamas vehicle_id formatas
-        try:
-            vehicle_id = ObjectId(data["vehicle_id"])
-        except Exception:
-            return jsonify({"error": "Neteisingas vehicle_id formatas!"}), 400
-
-        # Tikrinama, ar transporto priemonė egzistuoja
-        if not vehicles_collection.find_one({"_id": vehicle_id}):
-            return jsonify({"error": "Transporto priemonė nerasta!"}), 404
-
-        # Sukuriamas naujas kelionės įrašas
-        journey_data = {
-            "vehicle_id": vehicle_id,
-            "start_time": datetime.now(),
-            "is_completed": False,
-            "interval": interval
-        }
-        result = journeys_collection.insert_one(journey_data)
-
-        # Pradedama užduotis koordinatėms registruoti
-        journey_id = result.inserted_id
-        thread = Thread(target=log_coordinates_periodically, args=(str(journey_id), interval))
-        thread.start()
-
-        return jsonify({"message": "Kelionė pradėta!", "id": str(journey_id)}), 201
-
-    except Exception as e:
-        return jsonify({"error": f"Serverio klaida: {str(e)}"}), 500
-
-
-# 6. Registruoti transporto priemonės koordinates
-@app.route("/journeys/<string:journey_id>/coordinates", methods=["POST"])
-def log_coordinates(journey_id):
-    try:
-        # Tikrinamas journey_id formatas
-        if not ObjectId.is_valid(journey_id):
-            return jsonify({"error": "Neteisingas journey_id formatas!"}), 400
-
-        # Tikrinama, ar kelionė egzistuoja ir nėra baigta
-        journey = journeys_collection.find_one({"_id": ObjectId(journey_id), "is_completed": False})
-        if not journey:
-            return jsonify({"error": "Kelionė nerasta arba jau baigta!"}), 404
-
-        # Gauti koordinates iš užklausos
-        data = request.json
-        required_fields = ["latitude", "longitude", "timestamp"]
-        for field in required_fields:
-            if field not in data:
-                return jsonify({"error": f"Trūksta laukelio: {field}"}), 400
-
-        # Įrašomos koordinatės į duomenų bazę
-        coordinates = {
-            "journey_id": ObjectId(journey_id),
-            "timestamp": datetime.strptime(data["timestamp"], "%Y-%m-%dT%H:%M:%S"),
-            "latitude": float(data["latitude"]),
-            "longitude": float(data["longitude"])
-        }
-        journey_points_collection.insert_one(coordinates)
-
-        # Konvertuojama atsakymui
-        response = {
-            "message": "Koordinatės sėkmingai įkeltos!",
-            "data": {
-                "journey_id": journey_id,
-                "timestamp": data["timestamp"],
-                "latitude": coordinates["latitude"],
-                "longitude": coordinates["longitude"]
-            }
-        }
-        return jsonify(response), 200
-
-    except Exception as e:
-        return jsonify({"error": f"Serverio klaida: {str(e)}"}), 500
-
-
-
-# Periodiškai kviečiama koordinatės įkėlimo funkcija
-def log_coordinates_periodically(journey_id, interval):
-    try:
-        print(f"Pradedamas periodinis užkrovimas kelionei {journey_id} su intervalu {interval} sekundžių.")
-
-        while not stop_signal.is_set():
-            # Tikrinama, ar kelionė vis dar vyksta
-            journey = journeys_collection.find_one({"_id": ObjectId(journey_id)})
-            if not journey or journey.get("is_completed"):
-                print(f"Kelionė {journey_id} baigta. Periodinis užkrovimas sustabdytas.")
-                break
-
-            # Generuojamos atsitiktinės koordinatės (simuliacija)
-            latitude = round(54.6872 + (time.time() % 0.01), 6)
-            longitude = round(25.2797 + (time.time() % 0.01), 6)
-            timestamp = datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
-
-            # Siunčiama į endpoint'ą /journeys/{journey_id}/coordinates
-            url = f"{BASE_URL}/journeys/{journey_id}/coordinates"
-            input = {
-                "latitude": latitude,
-                "longitude": longitude,
-                "timestamp": timestamp
-            }
-            response = requests.post(url, json=input)
-
-            if response.status_code == 200:
-                print(f"Koordinatės įkeltos kelionei {journey_id}: {input}")
-            else:
-                print(f"Klaida siunčiant koordinates: {response.json()}")
-
-            # Palaukiama nustatytą intervalą
-            time.sleep(interval)
-
-    except Exception as e:
-        print(f"Klaida periodinio užkrovimo metu: {str(e)}")
-
-# 6. Gauti kelionės informaciją (naudojant pipeline)
-@app.route("/journeys/<string:journey_id>", methods=["GET"])
-def get_journey_details(journey_id):
-    try:
-        # Tikrinamas journey_id formatas
-        if not ObjectId.is_valid(journey_id):
-            return jsonify({"error": "Neteisingas journey_id formatas!"}), 400
-
-        # Pipeline skirtas apskaičiuoti bendrą atstumą ir taškų sąrašą
-        pipeline = [
-    {"$match": {"_id": ObjectId(journey_id)}},
-    {
-        "$lookup": {
-            "from": "journey_points",
-            "localField": "_id",
-            "foreignField": "journey_id",
-            "as": "points"
-        }
-    },
-    {
-        "$project": {
-            "vehicle_id": {"$toString": "$vehicle_id"},
-            "start_time": 1,
-            "end_time": 1,
-            "points": {
-                "$cond": {
-                    "if": {"$isArray": "$points"},
-                    "then": "$points",
-                    "else": []
-                }
-            }
-        }
-    },
-    {
-        "$addFields": {
-            "total_distance": {
-                "$reduce": {
-                    "input": {"$range": [0, {"$size": "$points"}]},
-                    "initialValue": 0,
-                    "in": {
-                        "$add": [
-                            "$$value",
-                            {
-                                "$cond": {
-                                    "if": {"$and": [{"$gt": ["$$this", 0]}, {"$gt": ["$$this", 1]}]},
-                                    "then": {
-                                        "$let": {
-                                            "vars": {
-                                                "prev": {"$arrayElemAt": ["$points", {"$subtract": ["$$this", 1]}]},
-                                                "current": {"$arrayElemAt": ["$points", "$$this"]}
-                                            },
-                                            "in": {
-                                                "$sqrt": {
-                                                    "$add": [
-                                                        {
-                                                            "$pow": [
-                                                                {"$subtract": ["$$current.latitude", "$$prev.latitude"]},
-                                                                2
-                                                            ]
-                                                        },
-                                                        {
-                                                            "$pow": [
-                                                                {"$subtract": ["$$current.longitude", "$$prev.longitude"]},
-                                                                2
-                                                            ]
-                                                        }
-                                                    ]
-                                                }
-                                            }
-                                        }
-                                    },
-                                    "else": 0
-                                }
-                            }
-                        ]
-                    }
-                }
-            },
-            "total_duration": {
-                "$divide": [
-                    {"$subtract": ["$end_time", "$start_time"]}, 60000
-                ]
-            }
-        }
-    },
-    {
-        "$project": {
-            "_id": 0,
-            "journey_id": {"$toString": "$_id"},
-            "vehicle_id": 1,
-            "start_time": 1,
-            "end_time": 1,
-            "total_duration": 1,
-            "total_distance": 1
-        }
-    }
-]
-
-        # Vykdomas pipeline ir gaunamas rezultatas
-        result = list(journeys_collection.aggregate(pipeline))
-
-        if not result:
-            return jsonify({"error": "Kelionė nerasta!"}), 404
-
-        return jsonify(result[0]), 200
-
-    except Exception as e:
-        return jsonify({"error": f"Serverio klaida: {str(e)}"}), 500
-
-
-# 7. Gauti bendrą konkrečios transporto priemonės kelionių statistiką (naudojant pipeline)
-@app.route("/vehicles/<string:vehicle_id>/statistics", methods=["GET"])
-def get_vehicle_statistics(vehicle_id):
-    try:
-        # vehicle_id formatas
-        if not ObjectId.is_valid(vehicle_id):
-            return jsonify({"error": "Neteisingas vehicle_id formatas!"}), 400
-
-        pipeline = [
-            # journeys pagal atitinkamą vehicle_id
-            {"$match": {"vehicle_id": ObjectId(vehicle_id)}},
-            {
-                "$lookup": {
-                    "from": "journey_points",  # Sujungiama su journey_points
-                    "localField": "_id",      # journey _id atitinka su journey_points.journey_id
-                    "foreignField": "journey_id",
-                    "as": "points"
-                }
-            },
-            {
-                "$addFields": {
-                    # Užtikrinama, kad taškai (points) visada yra masyve
-                    "points": {
-                        "$cond": {
-                            "if": {"$isArray": "$points"},
-                            "then": "$points",
-                            "else": []
-                        }
-                    }
-                }
-            },
-            {
-                "$addFields": {
-                    # Skaičiuojama bendras atstumas kiekvienai kelionei
-                    "total_distance": {
-                        "$reduce": {
-                            "input": {"$range": [1, {"$size": "$points"}]},
-                            "initialValue": 0,
-                            "in": {
-                                "$add": [
-                                    "$$value",
-                                    {
-                                        "$let": {
-                                            "vars": {
-                                                "prev": {"$arrayElemAt": ["$points", {"$subtract": ["$$this", 1]}]},
-                                                "current": {"$arrayElemAt": ["$points", "$$this"]}
-                                            },
-                                            "in": {
-                                                "$sqrt": {
-                                                    "$add": [
-                                                        {"$pow": [{"$subtract": ["$$current.latitude", "$$prev.latitude"]}, 2]},
-                                                        {"$pow": [{"$subtract": ["$$current.longitude", "$$prev.longitude"]}, 2]}
-                                                    ]
-                                                }
-                                            }
-                                        }
-                                    }
-                                ]
-                            }
-                        }
-                    },
-                    # Skaičiuojamas bendras laikas kiekvienai kelionei
-                    "total_duration": {
-                        "$cond": {
-                            "if": {"$and": ["$end_time", "$start_time"]},
-                            "then": {
-                                "$divide": [
-                                    {"$subtract": ["$end_time", "$start_time"]}, 60000  # Konvertuojama ms į minutes
-                                ]
-                            },
-                            "else": 0
-                        }
-                    }
-                }
-            },
-            {
-                "$group": {
-                    "_id": "$vehicle_id",
-                    "total_distance": {"$sum": "$total_distance"},  # Bendra atstumų suma
-                    "total_duration": {"$sum": "$total_duration"}   # Bendra laiko trukmė
-                }
-            },
-            {
-                "$project": {
-                    "_id": 0,
-                    "vehicle_id": {"$toString": "$_id"},
-                    "total_distance_km": "$total_distance",
-                    "total_duration_minutes": "$total_duration"
-                }
-            }
-        ]
-
-        # Vydomas pipeline
-        result = list(db.journeys.aggregate(pipeline))
-
-        if not result:
-            return jsonify({"error": "Statistika nerasta arba transporto priemonė neturi kelionių!"}), 404
-
-        return jsonify(result[0]), 200
-
-    except Exception as e:
-        return jsonify({"error": f"Serverio klaida: {str(e)}"}), 500
-
-    
-# 8. Baigti kelionę
-@app.route("/journeys/<journey_id>/end", methods=["PUT"])
-def end_journey(journey_id):
-    try:
-        # Tikrinamas journey_id formatas
-        if not ObjectId.is_valid(journey_id):
-            return jsonify({"error": "Neteisingas journey_id formatas!"}), 400
-
-        # Konvertuojamas journey_id į ObjectId
-        journey_id_object = ObjectId(journey_id)
-
-        # Tikrinama, ar kelionė egzistuoja ir nėra baigta
-        journey = journeys_collection.find_one({"_id": journey_id_object, "is_completed": False})
-        if not journey:
-            return jsonify({"error": "Kelionė nerasta arba jau baigta!"}), 404
-
-        # Pažymima, kad kelionė baigta
-        update_result = journeys_collection.update_one(
-            {"_id": journey_id_object},
-            {"$set": {"end_time": datetime.now(), "is_completed": True}}
-        )
-
-        # Tikrinama, ar atnaujinimas pavyko
-        if update_result.modified_count == 0:
-            return jsonify({"error": "Nepavyko užbaigti kelionės. Bandykite dar kartą!"}), 500
-
-        return jsonify({"message": "Kelionė sėkmingai baigta!"}), 200
-
-    except Exception as e:
-        return jsonify({"error": f"Serverio klaida: {str(e)}"}), 500
-
-
-#9. Išvalyti duomenų bazę
-@app.route('/cleanup', methods=['POST'])
-def flush_all():
-    try:
-        client.drop_database('travel_registration_system')
-        return jsonify({'message': 'Duomenų bazė išvalyta'}), 200
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-    
-
-clients_collection.create_index(
-    [("first_name", "text"), ("last_name", "text"), ("email", "text")],
-    default_language="english"
-)
-
-vehicles_collection.create_index(
-    [("model", "text"), ("manufacturer", "text"), ("license_plate", "text")],
-    default_language="english"
-)
-
-journeys_collection.create_index(
-    [("description", "text")],
-    default_language="english"
-)
-
-@app.route('/search', methods=['GET'])
-def full_text_search():
-    try:
-        query = request.args.get('q')
-
-        if not query:
-            return jsonify({"error": "Search query is missing"}), 400
-
-        # Aggregation pipelines for full-text search
-        client_pipeline = [
-            {"$match": {"$text": {"$search": query}}},
-            {"$addFields": {"score": {"$meta": "textScore"}}},
-            {"$sort": {"score": -1}},
-            {"$project": {"_id": 1, "first_name": 1, "last_name": 1, "email": 1, "score": 1}}
-        ]
-
-        vehicle_pipeline = [
-            {"$match": {"$text": {"$search": query}}},
-            {"$addFields": {"score": {"$meta": "textScore"}}},
-            {"$sort": {"score": -1}},
-            {"$project": {"_id": 1, "model": 1, "manufacturer": 1, "license_plate": 1, "client_id": 1, "score": 1}}
-        ]
-
-        journey_pipeline = [
-            {"$match": {"$text": {"$search": query}}},
-            {"$addFields": {"score": {"$meta": "textScore"}}},
-            {"$sort": {"score": -1}},
-            {"$project": {"_id": 1, "description": 1, "vehicle_id": 1, "score": 1}}
-        ]
-
-        client_results = list(clients_collection.aggregate(client_pipeline))
-        vehicle_results = list(vehicles_collection.aggregate(vehicle_pipeline))
-        journey_results = list(journeys_collection.aggregate(journey_pipeline))
-
-        # ObjectId verčiamas į string
-        for client in client_results:
-            client["_id"] = str(client["_id"])
-
-        for vehicle in vehicle_results:
-            vehicle["_id"] = str(vehicle["_id"])
-            vehicle["client_id"] = str(vehicle.get("client_id", ""))
-
-        for journey in journey_results:
-            journey["_id"] = str(journey["_id"])
-            journey["vehicle_id"] = str(journey.get("vehicle_id", ""))
-
-        if ObjectId.is_valid(query):
-            # Pagal journey_id
-            journey_results_by_id = list(journeys_collection.aggregate([
-                {"$match": {"_id": ObjectId(query)}},
-                {"$project": {"_id": 1, "description": 1, "vehicle_id": 1}}
-            ]))
-
-            for journey in journey_results_by_id:
-                journey["_id"] = str(journey["_id"])
-                journey["vehicle_id"] = str(journey.get("vehicle_id", ""))
-
-            journey_results.extend(journey_results_by_id)
-
-            # Pagal vehicle_id
-            journey_results_by_vehicle_id = list(journeys_collection.aggregate([
-                {"$match": {"vehicle_id": ObjectId(query)}},
-                {"$project": {"_id": 1, "description": 1, "vehicle_id": 1}}
-            ]))
-
-            for journey in journey_results_by_vehicle_id:
-                journey["_id"] = str(journey["_id"])
-                journey["vehicle_id"] = str(journey.get("vehicle_id", ""))
-
-            journey_results.extend(journey_results_by_vehicle_id)
-
-        return jsonify({
-            "clients": client_results,
-            "vehicles": vehicle_results,
-            "journeys": journey_results
-        }), 200
-
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
-
-
-if __name__ == "__main__":
-    try:
-        print("Serveris paleistas...")
-        app.run(debug=True, use_reloader=False, threaded=True, port=5000)
-    except KeyboardInterrupt:
-        print("Serveris stabdomas...")
-        stop_signal.set()
\ No newline at end of file
+from flask import Flask, Blueprint, Response, request, jsonify, stream_with_context
+from urllib.parse import urlencode
+import io
+import os
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, OperationFailure
+from bson.objectid import ObjectId
+from datetime import datetime, timedelta
+from threading import Event, Lock, active_count
+import time
+import click
+from scheduler import CoordinateScheduler
+from ingestion import PointIngestor, RecentKeys, empty_journey_stats
+from point_store import make_point_store, DocumentPointStore, migrate_journey
+from indexes import declared_indexes, ensure_indexes, unused_indexes, explain_query, poor_plan, MAX_EXAMINED_RATIO
+from archive import JourneyArchive, TieredPointStore, JourneyCompactor
+from config import load_settings
+from db import LazyMongoClient, client_options
+from vehicle_stats import VehicleStatsRollup, empty_totals, add_totals, day_start
+from distance import DEFAULT_METHOD, EPOCH, journey_distance, load_track
+from analytics import TripAnalytics, MIN_STOP_SECONDS, DEFAULT_STOP_MINUTES
+from simplify import ALGORITHMS, SimplificationCache, significance, select
+from export import FORMATS, TIMESTAMP_FORMAT, export_stream
+from cache import ReadThroughCache, make_shared_cache
+from pubsub import LocalPubSub
+from registry import ActiveJourneyRegistry
+from live import LiveBroker, VEHICLES_TOPIC, journey_topic, vehicle_topic
+from buffer import IngestBuffer, BufferFull
+from validation import MAX_BATCH_POINTS, parse_client, parse_vehicle, parse_journey, parse_coordinates, parse_batch_records, \
+    parse_distance_method, parse_timestamp
+from serializers import client_record, coordinates_record, journey_record, position_record, area_journey_record, \
+    suggestion_record, journey_list_record, analytics_record
+from json_provider import MongoJSONProvider
+from metrics import MetricsRegistry, CommandMetrics, SlowQueryLog, instrument_flask
+from geo import Circle, VehiclePositions, parse_area
+from importer import IMPORT_FORMATS, BulkImporter, read_records
+from pagination import KeysetPage, parse_limit, parse_fields
+from search import SearchEngine, DEFAULT_LIMIT as DEFAULT_SEARCH_LIMIT, MAX_LIMIT as MAX_SEARCH_LIMIT, MIN_PREFIX_LENGTH, \
+    decode_search_cursor, search_key
+
+# Nustatymai iš aplinkos kintamųjų. Paslaugos (duomenų bazė, podėliai, registras, buferis)
+# sukuriamos importuojant modulį nesikreipiant į duomenų bazę, Flask programa - create_app().
+settings = load_settings()
+api = Blueprint("api", __name__, cli_group=None)
+
+# Metrikos: užklausų ir MongoDB komandų trukmė, įrašyti taškai, foniniai srautai (/metrics)
+metrics = MetricsRegistry()
+slow_query_log = None
+if settings["SLOW_QUERY_MS"] is not None:
+    slow_query_log = SlowQueryLog(settings["SLOW_QUERY_MS"], settings["SLOW_QUERY_LOG"])
+command_metrics = CommandMetrics(metrics, slow_query_log)
+points_ingested = metrics.counter("points_ingested_total", "Įrašyti kelionių taškai", ("source",))
+points_deduplicated = metrics.counter("points_deduplicated_total", "Pakartotinai atsiųsti ir neįrašyti taškai", ("source",))
+live_events_dropped = metrics.counter("live_events_dropped_total", "Lėtiems prenumeratoriams neišsiųsti realaus laiko įvykiai")
+
+# MongoDB klientas sukuriamas pirmą kartą jo prireikus, atskirai kiekviename procese (po fork - iš naujo).
+# Ryšių telkinys, laiko ribos, skaitymo pirmenybė ir įrašymo patvirtinimas - pagal konfigūraciją.
+client = LazyMongoClient(settings["MONGO_URI"], event_listeners=[command_metrics], **client_options(settings))
+db = client[settings["MONGO_DB"]]
+clients_collection = db['clients']
+vehicles_collection = db['vehicles']
+journeys_collection = db['journeys']
+journey_points_collection = db["journey_points"]
+vehicle_stats_collection = db["vehicle_stats"]
+vehicle_stats_daily_collection = db["vehicle_stats_daily"]
+vehicle_positions_collection = db["vehicle_positions"]
+journey_analytics_collection = db["journey_analytics"]
+journey_archives_collection = db["journey_archives"]
+
+# Kelionės taškų saugykla (atskiri dokumentai arba kibirai, pagal POINT_STORAGE). Baigtų kelionių
+# taškai po COMPACT_AFTER_MINUTES perkeliami į suglaudintą archyvą ir skaitomi iš jo.
+journey_archive = JourneyArchive(journey_archives_collection, settings["ARCHIVE_CODEC"])
+point_store = TieredPointStore(make_point_store(db, settings), journey_archive)
+
+# Paskutinės transporto priemonių padėtys (2dsphere indeksas pagal vietą)
+vehicle_positions = VehiclePositions(vehicle_positions_collection)
+
+
+# Duomenų bazės indeksai kuriami vienkartine migracija prieš paleidžiant programos procesus
+# (flask --app app migrate), o ne kiekvieno proceso paleidimo metu. Kuriami indexes.py
+# deklaruoti indeksai; grąžinami esami nedeklaruoti indeksai pagal kolekciją (jei
+# drop_unused - pašalinti).
+def create_indexes(drop_unused=False):
+    unused = {}
+    for name, models in declared_indexes(settings["POINT_STORAGE"]).items():
+        unused[name] = ensure_indexes(db[name], models, drop_unused)
+    return unused
+
+
+# Skaitymo podėliai dažniems klientų, transporto priemonių ir kelionių patikrinimams.
+# Įrašai šalinami registruojant, baigiant kelionę ir valant duomenų bazę.
+shared_cache = make_shared_cache(settings)
+clients_cache = ReadThroughCache("clients", settings["CACHE_TTL_SECONDS"], settings["CACHE_MAX_ENTRIES"], shared_cache)
+vehicles_cache = ReadThroughCache("vehicles", settings["CACHE_TTL_SECONDS"], settings["CACHE_MAX_ENTRIES"], shared_cache)
+journeys_cache = ReadThroughCache("journeys", settings["CACHE_TTL_SECONDS"], settings["CACHE_MAX_ENTRIES"], shared_cache)
+caches = [clients_cache, vehicles_cache, journeys_cache]
+
+
+def load_client(client_id):
+    return clients_collection.find_one({"_id": client_id})
+
+
+def load_vehicle(vehicle_id):
+    return vehicles_collection.find_one({"_id": vehicle_id}, {"client_id": 1})
+
+
+def load_journey(journey_id):
+    return journeys_collection.find_one({"_id": journey_id}, {"vehicle_id": 1, "is_completed": 1})
+
+
+# Signalas sustabdyti kelionę
+stop_signal = Event()
+
+# Vykstančių kelionių registras atmintyje: koordinačių registravimas nebeskaito kelionės dokumento.
+# Procesai sinchronizuojami per pub/sub (viename procese) arba change stream (REGISTRY_SYNC=changestream);
+# be sinchronizavimo įrašai tikrinami duomenų bazėje kas REGISTRY_RECHECK_SECONDS sekundžių.
+# Registras užkraunamas paleidžiant proceso paslaugas (start_services).
+event_pubsub = LocalPubSub()
+journey_registry = ActiveJourneyRegistry(
+    journeys_collection, event_pubsub,
+    settings["REGISTRY_RECHECK_SECONDS"] if settings["REGISTRY_SYNC"] == "none" else None
+)
+
+# Realaus laiko įvykiai (SSE): nauji kelionių taškai ir transporto priemonių padėtys.
+# Keliuose procesuose įvykiai gaunami per change stream (LIVE_SOURCE=changestream).
+live_broker = LiveBroker(settings["LIVE_QUEUE_MAX"], live_events_dropped.inc)
+
+# Baigtų kelionių archyvavimas (foniniu srautu, jei COMPACTION=background)
+journey_compactor = JourneyCompactor(
+    journeys_collection, point_store.hot, journey_archive, stop_signal,
+    timedelta(minutes=settings["COMPACT_AFTER_MINUTES"]), settings["COMPACT_INTERVAL_SECONDS"]
+)
+
+
+# Vykstanti kelionė iš registro (None, jei kelionė nerasta arba jau baigta)
+def open_journey(journey_id):
+    return journey_registry.get(journey_id)
+
+
+# 1. Registruoti naują klientą
+@api.route('/clients', methods=['PUT'])
+def register_client():
+    try:
+        # Įvestis
+        try:
+            client_data = parse_client(request.get_json(silent=True))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if clients_collection.find_one({"email": client_data["email"]}):
+            return jsonify({"error": "Klientas jau egzistuoja!"}), 400
+
+        # client data pridedama į duomenų bazę
+        result = clients_collection.insert_one(client_data)
+        clients_cache.invalidate(result.inserted_id)
+
+        return jsonify({"message": "Klientas užregistruotas sėkmingai", "client_id": str(result.inserted_id)}), 201
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# 2. Gauti kliento duomenis
+@api.route('/clients/<string:clientId>', methods=['GET'])
+def get_client_details(clientId):
+    try:
+        if not ObjectId.is_valid(clientId):
+            return jsonify({"error": "Netinkamas client_id formatas!"}), 400
+
+        # Gauti kliento duomenis iš podėlio arba duomenų bazės
+        client_data = clients_cache.get_or_load(ObjectId(clientId), load_client)
+
+        if not client_data:
+            return jsonify({"error": "Klientas nerastas"}), 404
+
+        return jsonify(client_record(client_data)), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# 3. Registruoti transporto priemonę 
+@api.route("/vehicles", methods=["PUT"])
+def register_vehicle():
+    # Tikrinami laukai, client_id paverčiamas iš string į ObjectId
+    try:
+        vehicle_data = parse_vehicle(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Tikrinama, ar klientas egzistuoja
+    if not clients_cache.get_or_load(vehicle_data["client_id"], load_client):
+        return jsonify({"error": "Klientas nerastas!"}), 400
+
+    # Tikrinama, ar transporto priemonė su tokiu VIN jau egzistuoja
+    if vehicles_collection.find_one({"vin": vehicle_data["vin"]}):
+        return jsonify({"error": "Transporto priemonė su šiuo VIN jau egzistuoja!"}), 400
+
+    # Pridedama transporto priemonė į duomenų bazę
+    result = vehicles_collection.insert_one(vehicle_data)
+    vehicles_cache.invalidate(result.inserted_id)
+    return jsonify({"message": "Transporto priemonė užregistruota sėkmingai!", "id": str(result.inserted_id)})
+
+
+# Sąrašų laukai, kuriuos galima pasirinkti (?fields=), ir rikiavimas puslapiavimui
+VEHICLE_LIST_FIELDS = ("client_id", "model", "manufacturer", "license_plate", "vin", "year")
+VEHICLE_LIST_SORT = [("_id", 1)]
+JOURNEY_LIST_FIELDS = (
+    "vehicle_id", "client_id", "start_time", "end_time", "is_completed", "interval", "point_count", "total_distance"
+)
+JOURNEY_LIST_SORT = [("start_time", -1), ("_id", -1)]
+
+
+# Kito puslapio nuoroda antraštėse (Link su rel="next" ir X-Next-Cursor)
+def paginated(response, next_cursor):
+    if next_cursor is not None:
+        args = request.args.to_dict()
+        args["cursor"] = next_cursor
+        response.headers["Link"] = f'<{request.base_url}?{urlencode(args)}>; rel="next"'
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response
+
+
+# 4. Gauti transporto priemonės duomenis (puslapiais po limit, kitas puslapis - Link antraštėje)
+@api.route("/clients/<client_id>/vehicles", methods=["GET"])
+def get_vehicles_by_client(client_id):
+    # Konvertuojamas client_id iš string į ObjectId
+    try:
+        client_id_object = ObjectId(client_id)
+    except Exception:
+        return jsonify({"error": "Neteisingas client_id formatas!"}), 400
+
+    # Tikrinami puslapiavimo parametrai
+    try:
+        page = KeysetPage(VEHICLE_LIST_SORT, parse_limit(request.args.get("limit")), request.args.get("cursor"))
+        projection = parse_fields(request.args.get("fields"), VEHICLE_LIST_FIELDS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Tikrinama, ar klientas egzistuoja
+    if not clients_cache.get_or_load(client_id_object, load_client):
+        return jsonify({"error": "Klientas nerastas!"}), 400
+
+    # Gaunamas vienas kliento transporto priemonių puslapis (ObjectId serializuoja JSON tiekėjas)
+    vehicles, next_cursor = page.result(list(page.find(vehicles_collection, {"client_id": client_id_object}, projection)))
+    return paginated(jsonify(vehicles), next_cursor)
+
+
+# Kelionių sąrašo filtras: neprivalomai tik kelionės, vykusios laikotarpyje [since, until)
+def journey_list_query(query, since=None, until=None):
+    if until is not None:
+        query["start_time"] = {"$lt": until}
+    if since is not None:
+        query["$or"] = [{"end_time": {"$gte": since}}, {"is_completed": False}]
+    return query
+
+
+# Kelionių sąrašo puslapis: naujausios pirmiau, neprivalomai tik vykusios laikotarpyje [from, to)
+def list_journeys(query):
+    since = parse_timestamp(request.args.get("from"))
+    until = parse_timestamp(request.args.get("to"))
+    if since is not None and until is not None and since >= until:
+        raise ValueError("from turi būti ankstesnis nei to!")
+    page = KeysetPage(JOURNEY_LIST_SORT, parse_limit(request.args.get("limit")), request.args.get("cursor"))
+    projection = parse_fields(request.args.get("fields"), JOURNEY_LIST_FIELDS, ("start_time",))
+
+    cursor = page.find(journeys_collection, journey_list_query(query, since, until), dict(projection, stats_stale=1))
+    journeys, next_cursor = page.result(list(cursor))
+    records = [journey_list_record(refresh_journey_stats(journey)) for journey in journeys]
+    response = jsonify({"journeys": records, "next_cursor": next_cursor})
+    return paginated(response, next_cursor)
+
+
+# 4.1. Gauti transporto priemonės keliones
+@api.route("/vehicles/<string:vehicle_id>/journeys", methods=["GET"])
+def get_vehicle_journeys(vehicle_id):
+    try:
+        if not ObjectId.is_valid(vehicle_id):
+            return jsonify({"error": "Neteisingas vehicle_id formatas!"}), 400
+        if not vehicles_cache.get_or_load(ObjectId(vehicle_id), load_vehicle):
+            return jsonify({"error": "Transporto priemonė nerasta!"}), 404
+        try:
+            return list_journeys({"vehicle_id": ObjectId(vehicle_id)}), 200
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    except Exception as e:
+        return jsonify({"error": f"Serverio klaida: {str(e)}"}), 500
+
+
+# 4.2. Gauti kliento keliones (kelionėse saugomas transporto priemonės kliento ID)
+@api.route("/clients/<string:client_id>/journeys", methods=["GET"])
+def get_client_journeys(client_id):
+    try:
+        if not ObjectId.is_valid(client_id):
+            return jsonify({"error": "Neteisingas client_id formatas!"}), 400
+        if not clients_cache.get_or_load(ObjectId(client_id), load_client):
+            return jsonify({"error": "Klientas nerastas!"}), 404
+        try:
+            return list_journeys({"client_id": ObjectId(client_id)}), 200
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    except Exception as e:
+        return jsonify({"error": f"Serverio klaida: {str(e)}"}), 500
+
+# Masinis klientų ir transporto priemonių importas (dalimis per bulk_write, podėliai valomi naujiems įrašams)
+def imported(collection_name, ids):
+    cache = clients_cache if collection_name == clients_collection.name else vehicles_cache
+    for inserted_id in ids:
+        cache.invalidate(inserted_id)
+
+
+bulk_importer = BulkImporter(clients_collection, vehicles_collection, on_inserted=imported)
+
+
+# Importuojami užklausos turinio įrašai (CSV arba NDJSON), skaitomi srautu
+def import_request(import_records):
+    import_format = IMPORT_FORMATS.get(request.mimetype)
+    if import_format is None:
+        return jsonify({"error": f"Nepalaikomas turinio tipas! Galimi: {', '.join(IMPORT_FORMATS)}"}), 400
+    lines = io.TextIOWrapper(request.stream, encoding="utf-8-sig", newline="")
+    try:
+        summary = import_records(read_records(lines, import_format))
+    except UnicodeDecodeError:
+        return jsonify({"error": "Turinys turi būti UTF-8 koduotės!"}), 400
+    return jsonify(summary.as_dict()), 200
+
+
+# 4.3. Importuoti klientus (CSV arba NDJSON)
+@api.route('/import/clients', methods=['POST'])
+def import_clients():
+    try:
+        return import_request(bulk_importer.import_clients)
+    except Exception as e:
+        return jsonify({"error": f"Serverio klaida: {str(e)}"}), 500
+
+
+# 4.4. Importuoti transporto priemones (CSV arba NDJSON; klientas nurodomas client_id arba client_email)
+@api.route('/import/vehicles', methods=['POST'])
+def import_vehicles():
+    try:
+        return import_request(bulk_importer.import_vehicles)
+    except Exception as e:
+        return jsonify({"error": f"Serverio klaida: {str(e)}"}), 500
+
+
+# 5. Pradėti naują kelionę
+@api.route("/journeys", methods=["PUT"])
+def start_journey():
+    try:
+        # Tikrinami būtini laukai, intervalas (mažiausiai 5 sekundės) ir vehicle_id formatas
+        try:
+            vehicle_id, interval = parse_journey(request.get_json(silent=True))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        # Tikrinama, ar transporto priemonė egzistuoja
+        vehicle = vehicles_cache.get_or_load(vehicle_id, load_vehicle)
+        if not vehicle:
+            return jsonify({"error": "Transporto priemonė nerasta!"}), 404
+
+        # Sukuriamas naujas kelionės įrašas (su kliento ID kliento kelionių sąrašui)
+        journey_data = {
+            "vehicle_id": vehicle_id,
+            "client_id": vehicle["client_id"],
+            "start_time": datetime.now(),
+            "is_completed": False,
+            "interval": interval,
+            **empty_journey_stats()
+        }
+        result = journeys_collection.insert_one(journey_data)
+        journey_started(journey_data)
+
+        return jsonify({"message": "Kelionė pradėta!", "id": str(result.inserted_id)}), 201
+
+    except Exception as e:
+        return jsonify({"error": f"Serverio klaida: {str(e)}"}), 500
+
+
+# 6. Registruoti transporto priemonės koordinates
+@api.route("/journeys/<string:journey_id>/coordinates", methods=["POST"])
+def log_coordinates(journey_id):
+    try:
+        # Tikrinamas journey_id formatas
+        if not ObjectId.is_valid(journey_id):
+            return jsonify({"error": "Neteisingas journey_id formatas!"}), 400
+
+        # Tikrinama, ar kelionė egzistuoja ir nėra baigta
+        journey = open_journey(ObjectId(journey_id))
+        if not journey:
+            return jsonify({"error": "Kelionė nerasta arba jau baigta!"}), 404
+
+        # Pakartota užklausa su tuo pačiu Idempotency-Key gauna pirmosios užklausos atsakymą
+        idempotency_key = request.headers.get("Idempotency-Key")
+        replayed = idempotent_response(journey["_id"], idempotency_key)
+        if replayed is not None:
+            return jsonify(replayed[0]), replayed[1]
+
+        # Gauti koordinates iš užklausos
+        try:
+            coordinates = parse_coordinates(ObjectId(journey_id), request.json)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        # Jau įrašytas taškas (tas pats laikas) neįrašomas dar kartą
+        if already_stored(coordinates):
+            return jsonify(duplicate_response(journey_id, coordinates)), 200
+
+        # Įrašomos koordinatės į duomenų bazę (per buferį, jei jis įjungtas)
+        if ingest_buffer is None:
+            stored = True
+            store_points([coordinates])
+        else:
+            try:
+                stored = ingest_buffer.submit(coordinates, timeout=settings["INGEST_ACK_TIMEOUT"])
+            except BufferFull:
+                response = jsonify({"error": "Koordinačių eilė pilna, bandykite vėliau!"})
+                response.headers["Retry-After"] = "1"
+                return response, 429
+            except TimeoutError as e:
+                return jsonify({"error": str(e)}), 503
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+
+        # Konvertuojama atsakymui
+        response = {
+            "message": "Koordinatės sėkmingai įkeltos!" if stored else "Koordinatės priimtos įrašymui!",
+            "data": coordinates_record(journey_id, coordinates)
+        }
+        remember_response(journey["_id"], idempotency_key, response, 200 if stored else 202)
+        return jsonify(response), 200 if stored else 202
+
+    except Exception as e:
+        return jsonify({"error": f"Serverio klaida: {str(e)}"}), 500
+
+
+# Pakartotinių užklausų atpažinimas atmintyje: Idempotency-Key atsakymai ir neseniai įrašytų
+# taškų laikai kiekvienai kelionei. Tarp procesų pasikartojimus atmeta unikalus indeksas.
+recent_keys = RecentKeys(settings["INGEST_DEDUP_WINDOW"])
+
+
+# Ankstesnės užklausos su tuo pačiu Idempotency-Key atsakymas ir būsenos kodas (None, jei nežinomas)
+def idempotent_response(journey_id, idempotency_key):
+    if not idempotency_key:
+        return None
+    return recent_keys.get(journey_id, ("idempotency_key", idempotency_key))
+
+
+def remember_response(journey_id, idempotency_key, response, status):
+    if idempotency_key:
+        recent_keys.add(journey_id, ("idempotency_key", idempotency_key), (response, status))
+
+
+# Taškas, kurio laikas neseniai įrašytas, atpažįstamas nesikreipiant į duomenų bazę
+def already_stored(point):
+    if recent_keys.seen(point["journey_id"], point["timestamp"]):
+        points_deduplicated.inc(1, "api")
+        return True
+    return False
+
+
+def duplicate_response(journey_id, coordinates):
+    return {
+        "message": "Koordinatės jau įkeltos!",
+        "duplicate": True,
+        "data": coordinates_record(journey_id, coordinates)
+    }
+
+
+# Paketo įrašai validuojami ir teisingi taškai įrašomi viena neišrikiuota insert_many operacija.
+# Grąžinamas atsakymas su klaidomis pagal įrašo indeksą (naudojama ir ASGI programos).
+def ingest_batch(journey, records):
+    # Validuojami visi įrašai, klaidos kaupiamos pagal įrašo indeksą
+    errors = []
+    points = []
+    positions = []
+    timestamps = set()
+    duplicates = 0
+    for index, (record, error) in enumerate(records):
+        if error is None:
+            try:
+                point = parse_coordinates(journey["_id"], record)
+            except ValueError as e:
+                error = str(e)
+            else:
+                # Pakartotinai atsiųsti taškai (neseniai įrašyti arba pasikartojantys pakete) praleidžiami
+                if point["timestamp"] in timestamps or already_stored(point):
+                    duplicates += 1
+                else:
+                    timestamps.add(point["timestamp"])
+                    points.append(point)
+                    positions.append(index)
+                continue
+        errors.append({"index": index, "error": error})
+
+    # Taškai įrašomi viena neišrikiuota insert_many operacija; jau įrašyti taškai praleidžiami
+    inserted = 0
+    if points:
+        try:
+            inserted = len(store_points(points))
+            duplicates += len(points) - inserted
+        except BulkWriteError as e:
+            inserted = len(points)
+            for write_error in e.details.get("writeErrors", []):
+                inserted -= 1
+                if write_error.get("code") == 11000:
+                    duplicates += 1
+                else:
+                    errors.append({"index": positions[write_error["index"]], "error": write_error.get("errmsg")})
+
+    errors.sort(key=lambda item: item["index"])
+    response = {
+        "message": "Koordinatės sėkmingai įkeltos!" if not errors else "Dalis koordinačių neįkelta.",
+        "journey_id": str(journey["_id"]),
+        "received": len(records),
+        "inserted": inserted,
+        "duplicates": duplicates,
+        "failed": len(errors),
+        "errors": errors
+    }
+    return response
+
+
+# 6.1. Registruoti transporto priemonės koordinates paketu
+@api.route("/journeys/<string:journey_id>/coordinates:batch", methods=["POST"])
+def log_coordinates_batch(journey_id):
+    try:
+        # Tikrinamas journey_id formatas
+        if not ObjectId.is_valid(journey_id):
+            return jsonify({"error": "Neteisingas journey_id formatas!"}), 400
+
+        # Kelionė tikrinama vieną kartą visam paketui
+        journey = open_journey(ObjectId(journey_id))
+        if not journey:
+            return jsonify({"error": "Kelionė nerasta arba jau baigta!"}), 404
+
+        records = parse_batch_records(request.mimetype, request.get_data(as_text=True))
+        if records is None:
+            return jsonify({"error": "Tikimasi JSON masyvo arba NDJSON įrašų!"}), 400
+        if len(records) > MAX_BATCH_POINTS:
+            return jsonify({"error": f"Per daug taškų viename pakete (daugiausiai {MAX_BATCH_POINTS})!"}), 413
+
+        # Pakartota užklausa su tuo pačiu Idempotency-Key gauna pirmosios užklausos atsakymą
+        idempotency_key = request.headers.get("Idempotency-Key")
+        replayed = idempotent_response(journey["_id"], idempotency_key)
+        if replayed is not None:
+            return jsonify(replayed[0]), replayed[1]
+
+        response = ingest_batch(journey, records)
+        status = batch_status(response, records)
+        if status == 200:
+            remember_response(journey["_id"], idempotency_key, response, status)
+        return jsonify(response), status
+
+    except Exception as e:
+        return jsonify({"error": f"Serverio klaida: {str(e)}"}), 500
+
+
+# Paketas nepriimtas (400), jei neįrašytas nė vienas taškas ir nė vienas nebuvo įrašytas anksčiau
+def batch_status(response, records):
+    return 200 if response["inserted"] or response["duplicates"] or not records else 400
+
+
+# Bendra taškų įrašymo funkcija, naudojama API ir planuoklio.
+# Taškai įrašomi viena insert_many operacija, kartu atnaujinamos kelionių suvestinės.
+point_ingestor = PointIngestor(point_store, journeys_collection)
+
+
+# Kartu atnaujinamos transporto priemonių paskutinės padėtys (transporto priemonė randama registre)
+# ir įvykiai perduodami šio proceso realaus laiko prenumeratoriams. Grąžinami įrašyti taškai
+# (jau įrašyti anksčiau praleidžiami), jų laikai įtraukiami į pakartotinių taškų langą.
+# Iš dalies nepavykus įrašyti, šalutiniai veiksmai atliekami įrašytiems taškams, o BulkWriteError
+# (klaidų indeksai - taškų pozicijos) perduodama kviečiančiajam atmestiems taškams pranešti.
+def store_points(points, source="api"):
+    try:
+        stored = point_ingestor.ingest(points)
+    except BulkWriteError as e:
+        codes = {error["index"]: error.get("code") for error in e.details.get("writeErrors", [])}
+        known = [point for index, point in enumerate(points) if codes.get(index, 11000) == 11000]
+        points_written([point for index, point in enumerate(points) if index not in codes], known, source)
+        raise
+    points_written(stored, points, source)
+    return stored
+
+
+# Įrašytų taškų metrika, pakartotinių taškų langas (įskaitant anksčiau įrašytus), transporto
+# priemonių padėtys ir realaus laiko įvykiai
+def points_written(stored, known, source):
+    points_ingested.inc(len(stored), source)
+    if len(known) > len(stored):
+        points_deduplicated.inc(len(known) - len(stored), source)
+    recent_keys.remember(known)
+    vehicle_positions.record(stored, journey_vehicle)
+    if settings["LIVE_SOURCE"] == "local":
+        live_broker.publish_points(stored, journey_vehicle)
+
+
+def journey_vehicle(journey_id):
+    journey = journey_registry.get(journey_id)
+    return journey["vehicle_id"] if journey else None
+
+
+# Pavienių koordinačių buferis: užklausų taškai įrašomi kartu vienu store_points kvietimu.
+# ack-on-enqueue režimu po nutrūkimo likę žurnalo taškai įrašomi paleidžiant proceso paslaugas.
+ingest_buffer = None
+if settings["INGEST_DURABILITY"] != "sync":
+    ingest_buffer = IngestBuffer(
+        store_points,
+        durability=settings["INGEST_DURABILITY"],
+        max_points=settings["INGEST_FLUSH_POINTS"],
+        flush_interval=settings["INGEST_FLUSH_MS"] / 1000,
+        max_queue=settings["INGEST_QUEUE_MAX"],
+        spill_dir=settings["INGEST_SPILL_DIR"],
+        spill_fsync=settings["INGEST_SPILL_FSYNC"]
+    )
+
+
+# Proceso paslaugų paleidimas: užkraunamas vykstančių kelionių registras, paleidžiami
+# change stream srautai ir kelionių archyvavimas, įrašomi po nutrūkimo likę žurnalo taškai. Vykdoma vieną kartą kiekviename
+# procese pirmos užklausos metu (po fork - iš naujo), todėl importuojant modulį ir paleidžiant
+# darbininkus į duomenų bazę nesikreipiama.
+services_started = None  # Proceso, kuriame paslaugos paleistos, ID
+services_lock = Lock()
+
+
+def start_services():
+    global services_started
+    if services_started == os.getpid():
+        return
+    with services_lock:
+        if services_started == os.getpid():
+            return
+        journey_registry.load()
+        if settings["REGISTRY_SYNC"] == "changestream":
+            journey_registry.watch(stop_signal)
+        if settings["LIVE_SOURCE"] == "changestream":
+            live_broker.watch(db, vehicle_positions_collection.name, journeys_collection.name, stop_signal)
+        if settings["COMPACTION"] == "background":
+            journey_compactor.start()
+        if ingest_buffer is not None and ingest_buffer.spills:
+            replayed = ingest_buffer.replay()
+            if replayed:
+                print(f"Iš žurnalo įrašyta {replayed} koordinačių.")
+        services_started = os.getpid()
+
+
+# Grąžinama aibė kelionių, kurios iš pateiktų dar nėra baigtos (tikrinama registre)
+def active_journeys(journey_ids):
+    return {journey_id for journey_id in journey_ids if journey_registry.is_open(journey_id)}
+
+
+# Generuojamos atsitiktinės koordinatės (simuliacija)
+def simulate_coordinates(journey_id):
+    return {
+        "journey_id": journey_id,
+        "timestamp": datetime.now().replace(microsecond=0),
+        "latitude": round(54.6872 + (time.time() % 0.01), 6),
+        "longitude": round(25.2797 + (time.time() % 0.01), 6)
+    }
+
+
+# Periodinis koordinačių registravimas visoms aktyvioms kelionėms vykdomas viename fono sraute
+coordinate_scheduler = CoordinateScheduler(
+    stop_signal, active_journeys, simulate_coordinates, lambda points: store_points(points, "scheduler")
+)
+
+metrics.gauge("scheduled_journeys", "Kelionės periodinio registravimo planuoklyje", coordinate_scheduler.active_count)
+metrics.gauge("active_journeys", "Vykstančios kelionės registre", lambda: len(journey_registry))
+metrics.gauge("live_subscribers", "Realaus laiko įvykių (SSE) prenumeratoriai", lambda: len(live_broker))
+metrics.gauge("background_threads", "Proceso srautų skaičius", active_count)
+metrics.gauge("ingest_queue_depth", "Koordinačių buferio eilės dydis",
+              lambda: ingest_buffer.stats()["queue_depth"] if ingest_buffer is not None else 0)
+
+
+# Pradėta kelionė įtraukiama į registrą ir perduodama bendram koordinačių planuokliui
+def journey_started(journey):
+    journey_registry.add(journey)
+    coordinate_scheduler.schedule(journey["_id"], journey["interval"])
+
+# Atstumo skaičiavimo metodas (?method=): numatytuoju metodu skaičiuotas atstumas
+# saugomas suvestinėse, kitais metodais atstumas perskaičiuojamas iš kelionės taškų
+def requested_distance_method():
+    return parse_distance_method(request.args.get("method"))
+
+
+# 6. Gauti kelionės informaciją (iš kelionės dokumente palaikomų suvestinių)
+@api.route("/journeys/<string:journey_id>", methods=["GET"])
+def get_journey_details(journey_id):
+    try:
+        # Tikrinamas journey_id formatas
+        if not ObjectId.is_valid(journey_id):
+            return jsonify({"error": "Neteisingas journey_id formatas!"}), 400
+        try:
+            method = requested_distance_method()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        journey = journeys_collection.find_one(
+            {"_id": ObjectId(journey_id)},
+            {"vehicle_id": 1, "start_time": 1, "end_time": 1, "point_count": 1, "total_distance": 1, "stats_stale": 1}
+        )
+        if not journey:
+            return jsonify({"error": "Kelionė nerasta!"}), 404
+        refresh_journey_stats(journey)
+
+        result = journey_record(journey, method)
+        if method != DEFAULT_METHOD:
+            result["total_distance"] = journey_distance(point_store, journey["_id"], method)
+
+        return jsonify(result), 200
+
+    except Exception as e:
+        return jsonify({"error": f"Serverio klaida: {str(e)}"}), 500
+
+
+# Didžiausias taškų kiekis viename eksporto puslapyje
+MAX_EXPORT_LIMIT = 1000000
+
+# Baigtų kelionių taškų reikšmingumas supaprastinimui skaičiuojamas vieną kartą
+simplification_cache = SimplificationCache(settings["SIMPLIFY_CACHE_POINTS"])
+
+
+# Supaprastinto kelionės tako taškai. Kiekvienam taškui apskaičiuojamas reikšmingumas
+# (DP arba VW), pagal kurį atrenkami taškai; baigtoms kelionėms jis laikomas podėlyje.
+def simplified_points(journey, algorithm, tolerance, max_points, after):
+    key = (journey["_id"], algorithm)
+    cached = simplification_cache.get(key) if journey.get("is_completed") else None
+    if cached is not None:
+        track, values = cached
+    else:
+        track = load_track(point_store.iter_points(journey["_id"]))
+        values = significance(track, algorithm)
+        if journey.get("is_completed"):
+            simplification_cache.put(key, track, values)
+
+    indices = select(values, tolerance, max_points)
+    if after is not None:
+        indices = indices[track.timestamps[indices] > (after - EPOCH).total_seconds()]
+    return track.points(indices)
+
+
+# 6.2. Gauti kelionės taškus (srautu, NDJSON / GeoJSON / GPX formatu)
+@api.route("/journeys/<string:journey_id>/points", methods=["GET"])
+def export_journey_points(journey_id):
+    try:
+        # Tikrinamas journey_id formatas
+        if not ObjectId.is_valid(journey_id):
+            return jsonify({"error": "Neteisingas journey_id formatas!"}), 400
+
+        export_format = request.args.get("format", "ndjson")
+        if export_format not in FORMATS:
+            return jsonify({"error": f"Nežinomas formatas! Galimi: {', '.join(FORMATS)}"}), 400
+
+        # Puslapiavimas: taškai po after laiko žymos, ne daugiau kaip limit
+        try:
+            after = datetime.strptime(request.args["after"], TIMESTAMP_FORMAT) if request.args.get("after") else None
+        except ValueError:
+            return jsonify({"error": "Netinkamas laiko formatas. Naudokite YYYY-MM-DDTHH:MM:SS."}), 400
+        limit = request.args.get("limit", type=int)
+        if limit is not None and not 0 < limit <= MAX_EXPORT_LIMIT:
+            return jsonify({"error": f"limit turi būti tarp 1 ir {MAX_EXPORT_LIMIT}!"}), 400
+
+        # Neprivalomas tako supaprastinimas: tolerancija metrais ir (arba) didžiausias taškų skaičius
+        algorithm = request.args.get("algorithm", "dp")
+        tolerance = request.args.get("tolerance", type=float)
+        max_points = request.args.get("max_points", type=int)
+        if algorithm not in ALGORITHMS:
+            return jsonify({"error": f"Nežinomas supaprastinimo algoritmas! Galimi: {', '.join(ALGORITHMS)}"}), 400
+        if (tolerance is not None and tolerance < 0) or (max_points is not None and max_points < 2):
+            return jsonify({"error": "tolerance turi būti neneigiamas, o max_points - ne mažesnis kaip 2!"}), 400
+
+        journey = journeys_cache.get_or_load(ObjectId(journey_id), load_journey)
+        if not journey:
+            return jsonify({"error": "Kelionė nerasta!"}), 404
+
+        if tolerance is not None or max_points is not None:
+            points = simplified_points(journey, algorithm, tolerance, max_points, after)
+        else:
+            # Taškai skaitomi išrikiuotu kursoriu ir siunčiami klientui jų nekaupiant atmintyje
+            points = point_store.iter_points(journey["_id"], after)
+        mimetype, extension = FORMATS[export_format]
+        return Response(
+            stream_with_context(export_stream(export_format, journey_id, points, limit)),
+            mimetype=mimetype,
+            headers={"Content-Disposition": f"inline; filename={journey_id}.{extension}"}
+        )
+
+    except Exception as e:
+        return jsonify({"error": f"Serverio klaida: {str(e)}"}), 500
+
+
+# Kelionių analitika (greitis, stovėjimas, sustojimai): vykstančioms kelionėms skaičiuojama
+# nuo paskutinio apdoroto taško, baigtoms - vieną kartą ir saugoma journey_analytics kolekcijoje
+trip_analytics = TripAnalytics(journey_analytics_collection, point_store)
+
+
+# Kelionės suvestinės, pažymėtos perskaičiavimui (vėliau atsiųsti senesni taškai), perskaičiuojamos
+# iš taškų prieš jas grąžinant ar įtraukiant į transporto priemonės suvestines; analitika
+# tada skaičiuojama iš naujo. Grąžinamas tas pats (atnaujintas) kelionės dokumentas.
+def refresh_journey_stats(journey):
+    if point_ingestor.refresh(journey):
+        journey_points_changed(journey["_id"])
+    return journey
+
+
+# Pasikeitus kelionės taškams (vėliau atsiųsti senesni, pašalinti pasikartojantys),
+# iš jų apskaičiuota analitika ir supaprastinto tako reikšmingumas skaičiuojami iš naujo
+def journey_points_changed(journey_id):
+    trip_analytics.invalidate(journey_id)
+    simplification_cache.invalidate(journey_id)
+
+
+# 6.3. Gauti kelionės analitiką: vidutinis ir didžiausias greitis, stovėjimo laikas,
+# sustojimai, ilgesni nei stop_minutes, ir greičio histograma
+@api.route("/journeys/<string:journey_id>/analytics", methods=["GET"])
+def get_journey_analytics(journey_id):
+    try:
+        # Tikrinamas journey_id formatas
+        if not ObjectId.is_valid(journey_id):
+            return jsonify({"error": "Neteisingas journey_id formatas!"}), 400
+        stop_minutes = request.args.get("stop_minutes", DEFAULT_STOP_MINUTES, type=float)
+        if stop_minutes < MIN_STOP_SECONDS / 60:
+            return jsonify({"error": f"stop_minutes turi būti ne mažesnis kaip {MIN_STOP_SECONDS // 60}!"}), 400
+
+        journey = journeys_collection.find_one({"_id": ObjectId(journey_id)}, {"is_completed": 1, "stats_stale": 1})
+        if not journey:
+            return jsonify({"error": "Kelionė nerasta!"}), 404
+
+        # Pažymėtos perskaičiavimui kelionės suvestinė atnaujinama, tada analitika imama iš podėlio
+        refresh_journey_stats(journey)
+        return jsonify(analytics_record(trip_analytics.get(journey), stop_minutes)), 200
+
+    except Exception as e:
+        return jsonify({"error": f"Serverio klaida: {str(e)}"}), 500
+
+
+# Server-Sent Events atsakymas: prenumerata uždaroma klientui atsijungus arba baigus kelionę
+def live_response(subscription):
+    return Response(
+        stream_with_context(live_broker.stream(subscription, settings["LIVE_HEARTBEAT_SECONDS"])),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# 6.4. Sekti kelionę realiu laiku (SSE): įvykiai "point" kiekvienam naujam taškui ir "end" baigus kelionę
+@api.route("/journeys/<string:journey_id>/live", methods=["GET"])
+def get_journey_live(journey_id):
+    try:
+        # Tikrinamas journey_id formatas
+        if not ObjectId.is_valid(journey_id):
+            return jsonify({"error": "Neteisingas journey_id formatas!"}), 400
+        journey_id_object = ObjectId(journey_id)
+
+        # Prenumeruojama prieš tikrinant kelionę, kad nebūtų praleistas jos pabaigos įvykis
+        subscription = live_broker.subscribe([journey_topic(journey_id_object)])
+        if not journey_registry.is_open(journey_id_object):
+            live_broker.unsubscribe(subscription)
+            return jsonify({"error": "Kelionė nerasta arba jau baigta!"}), 404
+
+        return live_response(subscription)
+
+    except Exception as e:
+        return jsonify({"error": f"Serverio klaida: {str(e)}"}), 500
+
+
+# Transporto priemonių statistikos suvestinės, atnaujinamos baigus kelionę
+vehicle_stats_rollup = VehicleStatsRollup(
+    vehicle_stats_collection, vehicle_stats_daily_collection, journeys_collection, refresh_journey_stats
+)
+
+
+# Baigta kelionė pridedama prie transporto priemonės statistikos suvestinių ir pašalinama
+# iš registro bei podėlio; periodinis registravimas nutraukiamas nelaukiant planuoklio
+def journey_completed(journey):
+    vehicle_stats_rollup.record_completed(refresh_journey_stats(journey))
+    journey_registry.remove(journey["_id"])
+    journeys_cache.invalidate(journey["_id"])
+    coordinate_scheduler.cancel(journey["_id"])
+    recent_keys.forget(journey["_id"])
+    if settings["LIVE_SOURCE"] == "local":
+        live_broker.publish_end(journey["_id"])
+
+
+# Transporto priemonės kelionės, pradėtos [since, until) intervale
+def vehicle_journeys_cursor(vehicle_id, since=None, until=None):
+    query = {"vehicle_id": vehicle_id}
+    if since is not None or until is not None:
+        query["start_time"] = {}
+        if since is not None:
+            query["start_time"]["$gte"] = since
+        if until is not None:
+            query["start_time"]["$lt"] = until
+    return journeys_collection.find(query, {"start_time": 1})
+
+
+# Transporto priemonės kelionių atstumai pasirinktu metodu, sugrupuoti pagal kelionės pradžios dieną
+def vehicle_distances_by_day(vehicle_id, method, since=None, until=None):
+    until_exclusive = until + timedelta(days=1) if until is not None else None
+    distances = {}
+    for journey in vehicle_journeys_cursor(vehicle_id, since, until_exclusive):
+        day = day_start(journey["start_time"])
+        distances[day] = distances.get(day, 0) + journey_distance(point_store, journey["_id"], method)
+    return distances
+
+
+# Suvestinės atvaizdavimas atsakyme
+def format_vehicle_totals(totals):
+    return {
+        "journey_count": totals["journey_count"],
+        "point_count": totals["point_count"],
+        "total_distance_km": totals["total_distance"],
+        "total_duration_minutes": totals["total_duration"]
+    }
+
+
+# 7. Gauti bendrą konkrečios transporto priemonės kelionių statistiką (iš suvestinių)
+@api.route("/vehicles/<string:vehicle_id>/statistics", methods=["GET"])
+def get_vehicle_statistics(vehicle_id):
+    try:
+        # vehicle_id formatas
+        if not ObjectId.is_valid(vehicle_id):
+            return jsonify({"error": "Neteisingas vehicle_id formatas!"}), 400
+
+        # Neprivalomas dienų intervalas (from/to, YYYY-MM-DD, imtinai)
+        try:
+            since = datetime.strptime(request.args["from"], "%Y-%m-%d") if request.args.get("from") else None
+            until = datetime.strptime(request.args["to"], "%Y-%m-%d") if request.args.get("to") else None
+        except ValueError:
+            return jsonify({"error": "Netinkamas datos formatas. Naudokite YYYY-MM-DD."}), 400
+        try:
+            method = requested_distance_method()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        # Kitu nei numatytasis metodu atstumai perskaičiuojami iš visų kelionių taškų
+        distances = None
+        if method != DEFAULT_METHOD:
+            distances = vehicle_distances_by_day(ObjectId(vehicle_id), method, since, until)
+
+        if since is None and until is None:
+            totals = vehicle_stats_rollup.totals(ObjectId(vehicle_id))
+            if totals is None:
+                return jsonify({"error": "Statistika nerasta arba transporto priemonė neturi kelionių!"}), 404
+            if distances is not None:
+                totals["total_distance"] = sum(distances.values())
+            return jsonify({"vehicle_id": vehicle_id, "distance_method": method, **format_vehicle_totals(totals)}), 200
+
+        # Intervalo statistika sumuojama iš dienos suvestinių
+        days = vehicle_stats_rollup.daily(ObjectId(vehicle_id), since, until)
+        totals = empty_totals()
+        for day in days:
+            if distances is not None:
+                day["total_distance"] = distances.get(day["day"], 0)
+            add_totals(totals, day)
+
+        return jsonify({
+            "vehicle_id": vehicle_id,
+            "distance_method": method,
+            "from": request.args.get("from"),
+            "to": request.args.get("to"),
+            **format_vehicle_totals(totals),
+            "daily": [{"date": day["day"].strftime("%Y-%m-%d"), **format_vehicle_totals(day)} for day in days]
+        }), 200
+
+    except Exception as e:
+        return jsonify({"error": f"Serverio klaida: {str(e)}"}), 500
+
+    
+# 8. Baigti kelionę
+@api.route("/journeys/<journey_id>/end", methods=["PUT"])
+def end_journey(journey_id):
+    try:
+        # Tikrinamas journey_id formatas
+        if not ObjectId.is_valid(journey_id):
+            return jsonify({"error": "Neteisingas journey_id formatas!"}), 400
+
+        # Konvertuojamas journey_id į ObjectId
+        journey_id_object = ObjectId(journey_id)
+
+        # Tikrinama, ar kelionė egzistuoja ir nėra baigta
+        journey = journeys_collection.find_one({"_id": journey_id_object, "is_completed": False})
+        if not journey:
+            return jsonify({"error": "Kelionė nerasta arba jau baigta!"}), 404
+
+        # Pažymima, kad kelionė baigta (tik jei jos dar nebaigė lygiagreti užklausa)
+        completed_journey = journeys_collection.find_one_and_update(
+            {"_id": journey_id_object, "is_completed": False},
+            {"$set": {"end_time": datetime.now(), "is_completed": True}},
+            return_document=ReturnDocument.AFTER
+        )
+
+        # Tikrinama, ar atnaujinimas pavyko
+        if completed_journey is None:
+            return jsonify({"error": "Nepavyko užbaigti kelionės. Bandykite dar kartą!"}), 500
+
+        journey_completed(completed_journey)
+
+        return jsonify({"message": "Kelionė sėkmingai baigta!"}), 200
+
+    except Exception as e:
+        return jsonify({"error": f"Serverio klaida: {str(e)}"}), 500
+
+
+# Didžiausias geografinės paieškos rezultatų skaičius
+MAX_GEO_LIMIT = 1000
+
+
+def requested_geo_limit():
+    return parse_limit(request.args.get("limit"), 100, MAX_GEO_LIMIT)
+
+
+# 10. Transporto priemonių paskutinės padėtys spindulyje (lat, lon, radius metrais) arba daugiakampyje (polygon)
+@api.route("/geo/vehicles", methods=["GET"])
+def get_vehicles_in_area():
+    try:
+        try:
+            area = parse_area(request.args)
+            since = parse_timestamp(request.args.get("since"))
+            limit = requested_geo_limit()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        positions = vehicle_positions.find(area, since, limit)
+        return jsonify({"vehicles": [position_record(position) for position in positions]}), 200
+
+    except OperationFailure as e:
+        return jsonify({"error": f"Netinkama paieškos sritis: {e.details.get('errmsg', str(e))}"}), 400
+    except Exception as e:
+        return jsonify({"error": f"Serverio klaida: {str(e)}"}), 500
+
+
+# 10.1. Sekti transporto priemonių padėtis realiu laiku (SSE): įvykis "position" kiekvienam
+# įrašymui (visų arba tik nurodytų vehicle_id transporto priemonių)
+@api.route("/vehicles/live", methods=["GET"])
+def get_vehicles_live():
+    try:
+        vehicle_ids = request.args.getlist("vehicle_id")
+        if not all(ObjectId.is_valid(vehicle_id) for vehicle_id in vehicle_ids):
+            return jsonify({"error": "Neteisingas vehicle_id formatas!"}), 400
+
+        topics = [vehicle_topic(ObjectId(vehicle_id)) for vehicle_id in vehicle_ids] or [VEHICLES_TOPIC]
+        return live_response(live_broker.subscribe(topics))
+
+    except Exception as e:
+        return jsonify({"error": f"Serverio klaida: {str(e)}"}), 500
+
+
+# 11. Kelionės, kurių taškai pateko į sritį laikotarpyje nuo from iki to
+@api.route("/geo/journeys", methods=["GET"])
+def get_journeys_in_area():
+    try:
+        try:
+            area = parse_area(request.args)
+            since = parse_timestamp(request.args.get("from"))
+            until = parse_timestamp(request.args.get("to"))
+            limit = requested_geo_limit()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if since is not None and until is not None and since >= until:
+            return jsonify({"error": "from turi būti ankstesnis nei to!"}), 400
+
+        journeys = point_store.journeys_in_area(area, since, until, limit)
+        vehicles = {
+            journey["_id"]: journey["vehicle_id"]
+            for journey in journeys_collection.find({"_id": {"$in": [item["_id"] for item in journeys]}}, {"vehicle_id": 1})
+        }
+        return jsonify({"journeys": [area_journey_record(item, vehicles.get(item["_id"])) for item in journeys]}), 200
+
+    except OperationFailure as e:
+        return jsonify({"error": f"Netinkama paieškos sritis: {e.details.get('errmsg', str(e))}"}), 400
+    except Exception as e:
+        return jsonify({"error": f"Serverio klaida: {str(e)}"}), 500
+
+
+# Podėlių pataikymų ir nepataikymų skaitikliai
+@api.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    return jsonify({cache.name: cache.stats() for cache in caches}), 200
+
+
+# Metrikos Prometheus tekstiniu formatu
+@api.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# Koordinačių buferio būsena: eilės dydis, įrašymų skaičius ir trukmė
+@api.route('/ingest/stats', methods=['GET'])
+def get_ingest_stats():
+    if ingest_buffer is None:
+        return jsonify({"durability": "sync"}), 200
+    return jsonify(ingest_buffer.stats()), 200
+
+
+#9. Išvalyti duomenų bazę
+@api.route('/cleanup', methods=['POST'])
+def flush_all():
+    try:
+        client.drop_database(db.name)
+        simplification_cache.clear()
+        for cache in caches:
+            cache.clear()
+        journey_registry.clear()
+        recent_keys.clear()
+        live_broker.close_all()
+        return jsonify({'message': 'Duomenų bazė išvalyta'}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+
+# Duomenų bazės indeksų kūrimas (vienkartinė migracija prieš paleidžiant programos procesus):
+# flask --app app migrate
+@api.cli.command("migrate")
+@click.option("--drop-unused", is_flag=True, help="Pašalinti nedeklaruotus (nenaudojamus) indeksus.")
+def migrate(drop_unused):
+    unused = create_indexes(drop_unused)
+    click.echo(f"Sukurti duomenų bazės {db.name} indeksai")
+    for name, indexes in unused.items():
+        if indexes:
+            action = "Pašalinti" if drop_unused else "Nenaudojami (--drop-unused pašalina)"
+            click.echo(f"{action} {name} indeksai: {', '.join(indexes)}")
+
+
+# Tipinės maršrutų užklausos (maršrutas, neįvykdytas kursorius), sudarytos tais pačiais
+# metodais kaip maršrutuose. ID ir sritis imami iš duomenų bazės (transporto priemonė, turinti
+# daugiausia kelionių, jos naujausia kelionė), kad peržiūrėtų dokumentų skaičius būtų tikroviškas.
+def audit_cursors():
+    busiest = next(journeys_collection.aggregate([
+        {"$group": {"_id": "$vehicle_id", "count": {"$sum": 1}}}, {"$sort": {"count": -1}}, {"$limit": 1}
+    ]), None)
+    vehicle_id = busiest["_id"] if busiest else ObjectId()
+    journey = journeys_collection.find_one({"vehicle_id": vehicle_id}, sort=JOURNEY_LIST_SORT) or {}
+    vehicle = vehicles_collection.find_one({"_id": vehicle_id}) or {}
+    client = clients_collection.find_one({"_id": vehicle.get("client_id")}) or {}
+    client_id = vehicle.get("client_id") or ObjectId()
+    since = day_start(journey.get("start_time") or datetime.now())
+    until = since + timedelta(days=1)
+    last_point = journey.get("last_point") or {"latitude": 54.6872, "longitude": 25.2797}
+    area = Circle(last_point["latitude"], last_point["longitude"], 1000)
+    prefix = search_key(vehicle.get("license_plate", ""))[:MIN_PREFIX_LENGTH] or "AB"
+
+    journey_page = KeysetPage(JOURNEY_LIST_SORT, parse_limit(None))
+    journey_fields = parse_fields(None, JOURNEY_LIST_FIELDS, ("start_time",))
+    vehicle_page = KeysetPage(VEHICLE_LIST_SORT, parse_limit(None))
+    cursors = [
+        ("PUT /clients", clients_collection.find({"email": client.get("email", "")}).limit(1)),
+        ("PUT /vehicles", vehicles_collection.find({"vin": vehicle.get("vin", "")}).limit(1)),
+        ("GET /clients/<id>/vehicles",
+         vehicle_page.find(vehicles_collection, {"client_id": client_id}, parse_fields(None, VEHICLE_LIST_FIELDS))),
+        ("GET /vehicles/<id>/journeys",
+         journey_page.find(journeys_collection, journey_list_query({"vehicle_id": vehicle_id}), journey_fields)),
+        ("GET /vehicles/<id>/journeys?to=",
+         journey_page.find(journeys_collection, journey_list_query({"vehicle_id": vehicle_id}, until=until), journey_fields)),
+        ("GET /clients/<id>/journeys",
+         journey_page.find(journeys_collection, journey_list_query({"client_id": client_id}), journey_fields)),
+        ("GET /vehicles/<id>/statistics", vehicle_stats_rollup.live_cursor(vehicle_id)),
+        ("GET /vehicles/<id>/statistics?from=&to=", vehicle_stats_rollup.live_cursor(vehicle_id, since, until)),
+        ("GET /vehicles/<id>/statistics?from=&to= (dienos)", vehicle_stats_rollup.daily_cursor(vehicle_id, since, until)),
+        ("GET /vehicles/<id>/statistics?method=", vehicle_journeys_cursor(vehicle_id, since, until)),
+        ("GET /journeys/<id>/points", point_store.hot.points_cursor(journey.get("_id") or ObjectId())),
+        ("GET /geo/vehicles?polygon=", vehicle_positions.within_cursor(area)),
+        ("GET /geo/journeys", point_store.hot.area_cursor(area, since, until)),
+        ("GET /geo/journeys (archyvas)", journey_archive.area_cursor(area, since, until)),
+        ("GET /search/suggest", search_engine.suggest_cursor(prefix)),
+        ("Vykstančių kelionių registras", journey_registry.open_cursor()),
+        ("Kelionių archyvavimas", journey_compactor.due_cursor())
+    ]
+    # Paieškos šaltiniai vykdomi agregavimu; indeksą naudoja jų pradinė $match sąlyga
+    for source in search_engine.sources(str(vehicle_id)):
+        cursors.append((f"GET /search ({source.kind})", source.collection.find(source.match)))
+    return cursors
+
+
+# Ar tipinės maršrutų užklausos naudoja tinkamus indeksus (explain): flask --app app audit-indexes.
+# Jei bent viena užklausa peržiūri visą kolekciją (COLLSCAN) arba peržiūri daugiau nei
+# --max-ratio kartų daugiau dokumentų, nei grąžina, komanda baigiasi klaida.
+@api.cli.command("audit-indexes")
+@click.option("--max-ratio", default=MAX_EXAMINED_RATIO, show_default=True, type=float,
+              help="Didžiausias peržiūrėtų ir grąžintų dokumentų santykis.")
+def audit_indexes(max_ratio):
+    failures = 0
+    for endpoint, cursor in audit_cursors():
+        stages, examined, returned = explain_query(cursor)
+        status = "OK"
+        if poor_plan(stages, examined, returned, max_ratio):
+            status = "COLLSCAN" if "COLLSCAN" in stages else "PRASTAS"
+            failures += 1
+        click.echo(
+            f"{status:<8} {endpoint} ({cursor.collection.name}): {' > '.join(reversed(stages))}, "
+            f"peržiūrėta {examined}, grąžinta {returned}"
+        )
+    for name, models in declared_indexes(settings["POINT_STORAGE"]).items():
+        indexes = unused_indexes(db[name], models)
+        if indexes:
+            click.echo(f"Nenaudojami {name} indeksai (migrate --drop-unused pašalina): {', '.join(indexes)}")
+    if failures:
+        raise click.ClickException(f"Indekso nenaudojančių arba per daug dokumentų peržiūrinčių užklausų: {failures}")
+
+
+# Kelionių suvestinių perskaičiavimas iš taškų (vienkartinis esamų kelionių užpildymas):
+# flask --app app rebuild-journey-stats [--journey-id ID] [--stale-only]
+@api.cli.command("rebuild-journey-stats")
+@click.option("--journey-id", default=None, help="Perskaičiuoti tik šią kelionę.")
+@click.option("--stale-only", is_flag=True, help="Tik kelionės, pažymėtos perskaičiavimui.")
+def rebuild_journey_stats(journey_id, stale_only):
+    query = {}
+    if journey_id:
+        query["_id"] = ObjectId(journey_id)
+    elif stale_only:
+        query["stats_stale"] = True
+
+    count = 0
+    for journey in journeys_collection.find(query, {"_id": 1}):
+        point_ingestor.rebuild(journey["_id"])
+        # Analitika ir supaprastintas takas perskaičiuojami iš naujo (galėjo būti praleisti
+        # vėliau įrašyti senesni taškai)
+        journey_points_changed(journey["_id"])
+        count += 1
+    click.echo(f"Perskaičiuota kelionių: {count}")
+
+
+# Transporto priemonių statistikos suvestinių perskaičiavimas iš baigtų kelionių:
+# flask --app app rebuild-vehicle-stats [--vehicle-id ID]
+@api.cli.command("rebuild-vehicle-stats")
+@click.option("--vehicle-id", default=None, help="Perskaičiuoti tik šią transporto priemonę.")
+def rebuild_vehicle_stats(vehicle_id):
+    count = vehicle_stats_rollup.rebuild(ObjectId(vehicle_id) if vehicle_id else None)
+    click.echo(f"Į suvestines įtraukta baigtų kelionių: {count}")
+
+
+# Kelionės taškų perkėlimas tarp saugojimo būdų (po perkėlimo nustatomas POINT_STORAGE):
+# flask --app app migrate-points --to buckets [--journey-id ID]
+@api.cli.command("migrate-points")
+@click.option("--to", "target_name", type=click.Choice(["documents", "buckets"]), required=True)
+@click.option("--journey-id", default=None, help="Perkelti tik šios kelionės taškus.")
+@click.option("--batch-size", default=5000, show_default=True, help="Taškų skaičius vienoje įrašymo operacijoje.")
+def migrate_points(target_name, journey_id, batch_size):
+    stores = {
+        "documents": DocumentPointStore(journey_points_collection),
+        "buckets": make_point_store(db, dict(settings, POINT_STORAGE="buckets"))
+    }
+    target = stores[target_name]
+    source = stores["buckets" if target_name == "documents" else "documents"]
+    target.create_indexes()
+
+    query = {"_id": ObjectId(journey_id)} if journey_id else {}
+    journeys = points = 0
+    for journey in journeys_collection.find(query, {"_id": 1}):
+        points += migrate_journey(source, target, journey["_id"], batch_size)
+        journeys += 1
+    click.echo(f"Perkelta kelionių: {journeys}, taškų: {points}")
+
+
+# Pasikartojančių kelionės taškų (ta pati kelionė ir laikas) šalinimas prieš kuriant unikalų
+# indeksą (migrate) ir tų kelionių suvestinių perskaičiavimas:
+# flask --app app dedupe-points
+@api.cli.command("dedupe-points")
+def dedupe_points():
+    removed = point_store.hot.remove_duplicates()
+    for journey_id in removed:
+        point_ingestor.rebuild(journey_id)
+        journey_points_changed(journey_id)
+    click.echo(f"Pašalinta pasikartojančių taškų: {sum(removed.values())}, kelionių: {len(removed)}")
+
+
+# Baigtų kelionių archyvavimas (pvz., kai COMPACTION=manual arba pirmą kartą įjungus archyvavimą):
+# flask --app app compact-journeys [--older-than-minutes 10] [--limit 1000]
+@api.cli.command("compact-journeys")
+@click.option("--older-than-minutes", default=None, type=float, help="Kelionės, pasibaigusios anksčiau nei prieš tiek minučių.")
+@click.option("--limit", default=None, type=int, help="Didžiausias archyvuojamų kelionių skaičius.")
+def compact_journeys(older_than_minutes, limit):
+    delay = timedelta(minutes=older_than_minutes) if older_than_minutes is not None else None
+    journeys = points = 0
+    while limit is None or journeys < limit:
+        batch = 100 if limit is None else min(100, limit - journeys)
+        compacted, archived = journey_compactor.compact_due(delay, batch)
+        journeys += compacted
+        points += archived
+        if compacted < batch:
+            break
+    click.echo(f"Suarchyvuota kelionių: {journeys}, taškų: {points}")
+
+
+# Klientų arba transporto priemonių importas iš failo (formatas pagal plėtinį: .csv arba .ndjson/.jsonl):
+# flask --app app import-data clients klientai.csv
+@api.cli.command("import-data")
+@click.argument("kind", type=click.Choice(["clients", "vehicles"]))
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--chunk-size", default=1000, show_default=True, help="Įrašų skaičius vienoje bulk_write operacijoje.")
+def import_data(kind, path, chunk_size):
+    import_format = "csv" if os.path.splitext(path)[1].lower() == ".csv" else "ndjson"
+    importer = BulkImporter(clients_collection, vehicles_collection, chunk_size, on_inserted=imported)
+    import_records = importer.import_clients if kind == "clients" else importer.import_vehicles
+    with open(path, encoding="utf-8-sig", newline="") as lines:
+        summary = import_records(read_records(lines, import_format)).as_dict()
+    for item in summary["errors"]:
+        click.echo(f"Įrašas {item['index']}: {item['error']}", err=True)
+    click.echo(
+        f"Gauta: {summary['received']}, įrašyta: {summary['inserted']}, "
+        f"pasikartojančių: {summary['duplicates']}, netinkamų: {summary['invalid']}"
+    )
+
+
+# Kliento ID papildomos anksčiau pradėtos kelionės (kliento kelionių sąrašui):
+# flask --app app backfill-journey-clients
+@api.cli.command("backfill-journey-clients")
+def backfill_journey_clients():
+    count = 0
+    for vehicle in vehicles_collection.find({}, {"client_id": 1}):
+        count += journeys_collection.update_many(
+            {"vehicle_id": vehicle["_id"], "client_id": {"$exists": False}},
+            {"$set": {"client_id": vehicle["client_id"]}}
+        ).modified_count
+    click.echo(f"Papildyta kelionių: {count}")
+
+
+# Paieškos raktai (valstybinio numerio ir VIN pradžiai) anksčiau užregistruotoms transporto priemonėms:
+# flask --app app rebuild-search-keys
+@api.cli.command("rebuild-search-keys")
+def rebuild_search_keys():
+    click.echo(f"Atnaujinta transporto priemonių: {search_engine.rebuild_keys()}")
+
+
+# Vietos (GeoJSON) pridedamos anksčiau įrašytiems taškams, pašalinamas nebenaudojamas
+# platumos ir ilgumos indeksas ir atkuriamos transporto priemonių paskutinės padėtys:
+# flask --app app backfill-locations
+@api.cli.command("backfill-locations")
+def backfill_locations():
+    updated = point_store.backfill_locations()
+    if "latitude_1_longitude_1" in journey_points_collection.index_information():
+        journey_points_collection.drop_index("latitude_1_longitude_1")
+    vehicles = vehicle_positions.rebuild(journeys_collection)
+    click.echo(f"Papildyta taškų dokumentų: {updated}, transporto priemonių padėčių: {vehicles}")
+
+
+# Paieška klientuose, transporto priemonėse ir kelionėse (užklausos vykdomos lygiagrečiai)
+search_engine = SearchEngine(clients_collection, vehicles_collection, journeys_collection)
+
+
+def requested_search_limit():
+    return parse_limit(request.args.get("limit"), DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT)
+
+
+# Pilno teksto paieška: rezultatai sujungiami pagal įvertį (rasti pagal ObjectId - pirmiausia)
+# ir puslapiuojami: kitas puslapis gaunamas perduodant next_cursor kaip cursor
+@api.route('/search', methods=['GET'])
+def full_text_search():
+    try:
+        query = request.args.get('q')
+
+        if not query:
+            return jsonify({"error": "Search query is missing"}), 400
+        try:
+            limit = requested_search_limit()
+            cursor = decode_search_cursor(request.args["cursor"]) if request.args.get("cursor") else None
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        page, next_cursor = search_engine.search(query, limit, cursor)
+
+        results = {"clients": [], "vehicles": [], "journeys": []}
+        for item in page:
+            results[item.pop("type")].append(item)
+        return jsonify({**results, "next_cursor": next_cursor}), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+# Pasiūlymai įvedant: transporto priemonės pagal valstybinio numerio arba VIN pradžią
+@api.route('/search/suggest', methods=['GET'])
+def search_suggest():
+    try:
+        try:
+            limit = requested_search_limit()
+            vehicles = search_engine.suggest(request.args.get("q", ""), limit)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify({"vehicles": [suggestion_record(vehicle) for vehicle in vehicles]}), 200
+
+    except Exception as e:
+        return jsonify({"error": f"Serverio klaida: {str(e)}"}), 500
+
+
+# Flask programa (gamykla): konfigūracija, JSON tiekėjas, metrikos, maršrutai ir komandos.
+# Proceso paslaugos paleidžiamos pirmos užklausos metu, todėl darbininkų paleidimas greitas
+# ir saugus po fork (pvz., gunicorn --preload app:app).
+def create_app():
+    application = Flask(__name__)
+    application.config.update(settings)
+    # JSON atsakymai: ObjectId ir laikas serializuojami tiesiogiai (neprivalomai su orjson)
+    application.json = MongoJSONProvider(application)
+    application.extensions["request_duration"] = instrument_flask(application, metrics)
+    application.before_request(start_services)
+    application.register_blueprint(api)
+    return application
+
+
+app = create_app()
+
+
+if __name__ == "__main__":
+    try:
+        print("Serveris paleistas...")
+        app.run(debug=True, use_reloader=False, threaded=True, port=5000)
+    except KeyboardInterrupt:
+        print("Serveris stabdomas...")
+    finally:
+        coordinate_scheduler.stop(timeout=5)
+        if ingest_buffer is not None:
+            ingest_buffer.stop(timeout=5)
\ No newline at end of file
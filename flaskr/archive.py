@@ -0,0 +1,286 @@
+import heapq
+import zlib
+from datetime import datetime, timedelta
+from threading import Thread
+
+import numpy as np
+from bson.binary import Binary
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from distance import EPOCH, load_track
+from indexes import JOURNEY_ARCHIVE_INDEXES, ensure_indexes
+
+try:
+    import zstandard
+except ImportError:  # zstandard neprivalomas, naudojamas zlib
+    zstandard = None
+
+# Koordinatės saugomos sveikaisiais skaičiais 1e-7 laipsnio tikslumu (~1 cm), laikas - milisekundėmis
+COORDINATE_SCALE = 10 ** 7
+# Archyvo dokumento duomenų riba (MongoDB dokumentas negali viršyti 16 MB)
+MAX_ARCHIVE_BYTES = 15 * 1024 * 1024
+# Archyvo srities stačiakampio paraštė ir didžiausias kraštinės ilgis laipsniais: 2dsphere kraštinės
+# yra geodezinės linijos, todėl ilgos kraštinės skaidomos, kad sritis apimtų visus taškus
+BOUNDS_MARGIN = 0.01
+BOUNDS_STEP = 1.0
+
+
+def archive_codec(name="auto"):
+    if name == "zstd" and zstandard is None:
+        raise RuntimeError("ARCHIVE_CODEC=zstd, tačiau paketas zstandard neįdiegtas")
+    if name == "auto":
+        return "zstd" if zstandard is not None else "zlib"
+    if name not in ("zstd", "zlib"):
+        raise ValueError(f"Nežinomas archyvo glaudinimo būdas: {name}")
+    return name
+
+
+def compress(data, codec):
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=9).compress(data)
+    return zlib.compress(data, 9)
+
+
+def decompress(data, codec):
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Archyvas suglaudintas zstd, tačiau paketas zstandard neįdiegtas")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+# Sveikųjų skaičių skirtumai užkoduojami zigzag (maži neigiami skaičiai tampa mažais teigiamais)
+# ir baitai perrikiuojami pagal reikšmingumą, kad vienodi aukštieji baitai glaudintųsi kartu
+def pack(values):
+    deltas = np.diff(values, prepend=np.int64(0))
+    zigzag = ((deltas << 1) ^ (deltas >> 63)).astype("<u8")
+    return zigzag.view(np.uint8).reshape(-1, 8).T.tobytes()
+
+
+def unpack(data, count):
+    zigzag = np.frombuffer(data, dtype=np.uint8).reshape(8, count).T.copy().view("<u8").ravel()
+    deltas = (zigzag >> np.uint64(1)).astype(np.int64) ^ -(zigzag & np.uint64(1)).astype(np.int64)
+    return np.cumsum(deltas)
+
+
+# Kelionės taškai (Track) užkoduojami vienu dvejetainiu lauku: laikas, platuma ir ilguma
+def encode_track(track, codec):
+    times = np.round(track.timestamps * 1000).astype(np.int64)
+    latitudes = np.round(track.latitudes * COORDINATE_SCALE).astype(np.int64)
+    longitudes = np.round(track.longitudes * COORDINATE_SCALE).astype(np.int64)
+    return compress(pack(np.concatenate((times, latitudes, longitudes))), codec)
+
+
+# Grąžinami masyvai: laikas sekundėmis nuo epochos, platuma, ilguma
+def decode_track(data, count, codec):
+    values = unpack(decompress(data, codec), count * 3)
+    times, latitudes, longitudes = values[:count], values[count:2 * count], values[2 * count:]
+    return times / 1000, latitudes / COORDINATE_SCALE, longitudes / COORDINATE_SCALE
+
+
+# Kelionės taškus gaubiantis stačiakampis GeoJSON daugiakampiu (2dsphere indeksui).
+# Ilgumų intervalas imamas trumpesnis, todėl kelionė per 180° dienovidinį neapima viso pasaulio.
+def bounding_polygon(latitudes, longitudes):
+    south = max(float(latitudes.min()) - BOUNDS_MARGIN, -90.0)
+    north = min(float(latitudes.max()) + BOUNDS_MARGIN, 90.0)
+    west, east = float(longitudes.min()), float(longitudes.max())
+    shifted = longitudes % 360
+    if float(shifted.max() - shifted.min()) < east - west:
+        west, east = float(shifted.min()), float(shifted.max())
+    west, east = west - BOUNDS_MARGIN, east + BOUNDS_MARGIN
+    steps = max(1, int(np.ceil((east - west) / BOUNDS_STEP)))
+    edge = [west + (east - west) * i / steps for i in range(steps + 1)]
+    ring = [[lon, south] for lon in edge] + [[lon, north] for lon in reversed(edge)]
+    ring = [[(lon + 180) % 360 - 180, lat] for lon, lat in ring]
+    return {"type": "Polygon", "coordinates": [ring + [ring[0]]]}
+
+
+# Baigtų kelionių archyvas: visi kelionės taškai viename journey_archives dokumente
+# {_id: journey_id, codec, count, start, end, bounds, data}, kuriame laikas ir koordinatės
+# saugomi skirtumais ir suglaudinti (zstd, jei įdiegtas zstandard, kitaip zlib)
+class JourneyArchive:
+    def __init__(self, collection, codec="auto"):
+        self.collection = collection
+        self.codec = archive_codec(codec)
+
+    def create_indexes(self):
+        ensure_indexes(self.collection, JOURNEY_ARCHIVE_INDEXES)
+
+    # Kelionės taškai (Track) įrašomi į archyvą. Grąžinama False, jei suglaudinti taškai
+    # netelpa į vieną dokumentą. Jau esantis archyvas (nutrūkęs ankstesnis bandymas) paliekamas.
+    def insert(self, journey_id, track):
+        data = encode_track(track, self.codec)
+        if len(data) > MAX_ARCHIVE_BYTES:
+            return False
+        try:
+            self.collection.insert_one({
+                "_id": journey_id,
+                "codec": self.codec,
+                "count": len(track),
+                "start": track.first["timestamp"],
+                "end": track.last["timestamp"],
+                "bounds": bounding_polygon(track.latitudes, track.longitudes),
+                "data": Binary(data)
+            })
+        except DuplicateKeyError:
+            pass
+        return True
+
+    # Kelionės taškai iš archyvo (None, jei kelionė nesuarchyvuota)
+    def iter_points(self, journey_id, after=None):
+        archive = self.collection.find_one({"_id": journey_id}, {"bounds": 0})
+        if archive is None:
+            return None
+        return self._points(archive, after)
+
+    @staticmethod
+    def _decode(archive):
+        return decode_track(archive["data"], archive["count"], archive["codec"])
+
+    def _points(self, archive, after):
+        times, latitudes, longitudes = self._decode(archive)
+        start = 0
+        if after is not None:
+            start = int(np.searchsorted(times, (after - EPOCH).total_seconds(), side="right"))
+        for i in range(start, len(times)):
+            yield {
+                "timestamp": EPOCH + timedelta(milliseconds=int(round(times[i] * 1000))),
+                "latitude": float(latitudes[i]),
+                "longitude": float(longitudes[i])
+            }
+
+    # Archyvai, kurių sritį gaubiantis stačiakampis kerta sritį ir laiko intervalą
+    def area_cursor(self, area, since=None, until=None):
+        query = {"bounds": {"$geoIntersects": {"$geometry": area.geometry()}}}
+        if since is not None:
+            query["end"] = {"$gte": since}
+        if until is not None:
+            query["start"] = {"$lt": until}
+        return self.collection.find(query, {"bounds": 0})
+
+    # Taškai srityje ir laikotarpyje tikrinami iškodavus atrinktus archyvus
+    def journeys_in_area(self, area, since=None, until=None, limit=100):
+        journeys = []
+        for archive in self.area_cursor(area, since, until):
+            times, latitudes, longitudes = self._decode(archive)
+            mask = np.ones(len(times), dtype=bool)
+            if since is not None:
+                mask &= times >= (since - EPOCH).total_seconds()
+            if until is not None:
+                mask &= times < (until - EPOCH).total_seconds()
+            inside = [i for i in np.flatnonzero(mask) if area.contains(float(latitudes[i]), float(longitudes[i]))]
+            if inside:
+                journeys.append({
+                    "_id": archive["_id"],
+                    "first_timestamp": EPOCH + timedelta(milliseconds=int(round(times[inside[0]] * 1000))),
+                    "last_timestamp": EPOCH + timedelta(milliseconds=int(round(times[inside[-1]] * 1000))),
+                    "point_count": len(inside)
+                })
+        return sorted(journeys, key=lambda journey: journey["first_timestamp"])[:limit]
+
+    def delete(self, journey_id):
+        self.collection.delete_one({"_id": journey_id})
+
+
+# Kelionės taškų saugykla su archyvu: nauji taškai įrašomi į įprastą saugyklą (dokumentai
+# arba kibirai), o suarchyvuotų kelionių taškai skaitomi iš archyvo, todėl skaitantiems
+# maršrutams nesvarbu, ar kelionė jau suarchyvuota
+class TieredPointStore:
+    def __init__(self, hot, archive):
+        self.hot = hot
+        self.archive = archive
+        self.name = hot.name
+
+    def create_indexes(self):
+        self.hot.create_indexes()
+        self.archive.create_indexes()
+
+    def insert(self, points):
+        return self.hot.insert(points)
+
+    # Suarchyvuotos kelionės taškai sujungiami su saugykloje likusiais (pvz., įrašytais
+    # iš žurnalo po archyvavimo), kad nė vienas taškas nedingtų
+    def iter_points(self, journey_id, after=None):
+        points = self.archive.iter_points(journey_id, after)
+        if points is None:
+            return self.hot.iter_points(journey_id, after)
+        return heapq.merge(points, self.hot.iter_points(journey_id, after), key=lambda point: point["timestamp"])
+
+    # Kelionė, archyvuojama paieškos metu, gali būti rasta abiejose saugyklose
+    def journeys_in_area(self, area, since=None, until=None, limit=100):
+        journeys = {}
+        for found in (self.hot.journeys_in_area(area, since, until, limit),
+                      self.archive.journeys_in_area(area, since, until, limit)):
+            for journey in found:
+                known = journeys.get(journey["_id"])
+                if known is None:
+                    journeys[journey["_id"]] = journey
+                else:
+                    known["first_timestamp"] = min(known["first_timestamp"], journey["first_timestamp"])
+                    known["last_timestamp"] = max(known["last_timestamp"], journey["last_timestamp"])
+                    known["point_count"] = max(known["point_count"], journey["point_count"])
+        return sorted(journeys.values(), key=lambda journey: journey["first_timestamp"])[:limit]
+
+    def backfill_locations(self):
+        return self.hot.backfill_locations()
+
+    def delete(self, journey_id):
+        self.hot.delete(journey_id)
+        self.archive.delete(journey_id)
+
+
+# Baigtų kelionių suspaudimas: praėjus delay po kelionės pabaigos jos taškai perkeliami į
+# archyvą, o atskiri taškų dokumentai ištrinami, todėl darbinis rinkinys ir indeksai apima
+# tik neseniai baigtas ir vykstančias keliones. Kelionė pažymima archived: true (false -
+# jei taškai netelpa į vieną archyvo dokumentą ir paliekami saugykloje).
+class JourneyCompactor:
+    def __init__(self, journeys_collection, hot, archive, stop_signal, delay=timedelta(minutes=10), interval=60):
+        self.journeys_collection = journeys_collection
+        self.hot = hot
+        self.archive = archive
+        self.stop_signal = stop_signal
+        self.delay = delay
+        self.interval = interval
+        self._thread = None
+
+    # Kelionės taškai įrašomi į archyvą ir tik tada ištrinami iš saugyklos, todėl nutrūkus
+    # archyvavimui taškai neprarandami. Grąžinamas suarchyvuotų taškų skaičius.
+    def compact(self, journey_id):
+        track = load_track(self.hot.iter_points(journey_id))
+        archived = True
+        if len(track):
+            archived = self.archive.insert(journey_id, track)
+            if archived:
+                self.hot.delete(journey_id)
+        self.journeys_collection.update_one({"_id": journey_id}, {"$set": {"archived": archived}})
+        return len(track) if archived else 0
+
+    # Baigtų, dar nesuarchyvuotų kelionių, pasibaigusių anksčiau nei prieš delay, kursorius
+    def due_cursor(self, delay=None, limit=100):
+        cutoff = datetime.now() - (self.delay if delay is None else delay)
+        return self.journeys_collection.find(
+            {"is_completed": True, "archived": None, "end_time": {"$lt": cutoff}}, {"_id": 1}
+        ).sort("end_time", 1).limit(limit)
+
+    # Suarchyvuojamos kelionės, pasibaigusios anksčiau nei prieš delay (seniausios pirmiau).
+    # Grąžinama (kelionių, taškų) skaičius.
+    def compact_due(self, delay=None, limit=100):
+        journeys = points = 0
+        for journey in self.due_cursor(delay, limit):
+            points += self.compact(journey["_id"])
+            journeys += 1
+        return journeys, points
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = Thread(target=self._run, name="journey-compactor", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self.stop_signal.wait(self.interval):
+            try:
+                while self.compact_due()[0] and not self.stop_signal.is_set():
+                    pass
+            except PyMongoError as e:
+                print(f"Kelionių archyvavimo klaida: {str(e)}")
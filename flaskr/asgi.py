@@ -0,0 +1,486 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+from bson.objectid import ObjectId
+try:
+    from motor.motor_asyncio import AsyncIOMotorClient
+except ImportError as e:  # Motor 2.5 (pymongo 3.12) neveikia su Python 3.11 ir naujesnėmis versijomis
+    raise ImportError("ASGI programai reikalingas Motor 2.5 ir Python 3.10 arba senesnis; "
+                      "naudokite serve.py --mode wsgi.") from e
+from pymongo import ReturnDocument
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+
+try:
+    from a2wsgi import WSGIMiddleware
+except ImportError:  # a2wsgi neprivalomas, naudojamas Starlette adapteris
+    from starlette.middleware.wsgi import WSGIMiddleware
+
+import app as wsgi
+from buffer import BufferFull
+from db import client_options
+from distance import DEFAULT_METHOD, journey_distance
+from ingestion import empty_journey_stats
+from live import VEHICLES_TOPIC, journey_topic, vehicle_topic
+from pagination import KeysetPage, parse_limit, parse_fields
+from serializers import client_record, coordinates_record, journey_record
+from validation import MAX_BATCH_POINTS, parse_client, parse_vehicle, parse_journey, parse_coordinates, \
+    parse_batch_records, parse_distance_method
+
+# Asinchroninė tos pačios API programa (ASGI, Starlette + Motor).
+# Įrenginių naudojami maršrutai vykdomi asinchroniškai su Motor, todėl laukiant MongoDB
+# atsakymo neužimamas srautas. Būsena (registras, podėliai, buferis, planuoklis) ir
+# validavimas bendri su Flask programa, o likę maršrutai perduodami Flask programai.
+
+motor_client = None
+db = None
+
+
+class APIResponse(JSONResponse):
+    # Serializuojama tuo pačiu Flask programos JSON tiekėju (ObjectId, laikas, orjson)
+    def render(self, content):
+        return wsgi.app.json.dumps(content).encode("utf-8")
+
+
+def error(message, status_code):
+    return APIResponse({"error": message}, status_code)
+
+
+async def read_json(request):
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+async def load_client(client_id):
+    return await db.clients.find_one({"_id": client_id})
+
+
+async def load_vehicle(vehicle_id):
+    return await db.vehicles.find_one({"_id": vehicle_id}, {"client_id": 1})
+
+
+# Laukiama, kol buferis įrašys tašką, neužimant srauto (ack-after-flush).
+# Be buferio taškas įrašomas gijų telkinyje.
+async def submit_point(point):
+    buffer = wsgi.ingest_buffer
+    if buffer is None:
+        await run_in_threadpool(wsgi.store_points, [point])
+        return True
+
+    ticket = buffer.put(point)
+    if buffer.spills:
+        return False
+
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def resolve(future):
+        if not future.done():
+            future.set_result(None)
+
+    def resolved(ticket):
+        try:
+            loop.call_soon_threadsafe(resolve, future)
+        except RuntimeError:  # Įvykių ciklas jau uždarytas
+            pass
+
+    ticket.add_done_callback(resolved)
+    try:
+        await asyncio.wait_for(future, wsgi.settings["INGEST_ACK_TIMEOUT"])
+    except asyncio.TimeoutError:
+        raise TimeoutError("Koordinačių įrašymas užtruko per ilgai!")
+    if ticket.error is not None:
+        raise ticket.error
+    return True
+
+
+# 1. Registruoti naują klientą
+async def register_client(request):
+    try:
+        try:
+            client_data = parse_client(await read_json(request))
+        except ValueError as e:
+            return error(str(e), 400)
+        if await db.clients.find_one({"email": client_data["email"]}, {"_id": 1}):
+            return error("Klientas jau egzistuoja!", 400)
+
+        result = await db.clients.insert_one(client_data)
+        wsgi.clients_cache.invalidate(result.inserted_id)
+        return APIResponse({"message": "Klientas užregistruotas sėkmingai", "client_id": str(result.inserted_id)}, 201)
+
+    except Exception as e:
+        return error(str(e), 500)
+
+
+# 2. Gauti kliento duomenis
+async def get_client_details(request):
+    try:
+        client_id = request.path_params["client_id"]
+        if not ObjectId.is_valid(client_id):
+            return error("Netinkamas client_id formatas!", 400)
+
+        client_data = await wsgi.clients_cache.get_or_load_async(ObjectId(client_id), load_client)
+        if not client_data:
+            return error("Klientas nerastas", 404)
+        return APIResponse(client_record(client_data))
+
+    except Exception as e:
+        return error(str(e), 500)
+
+
+# 3. Registruoti transporto priemonę
+async def register_vehicle(request):
+    try:
+        try:
+            vehicle_data = parse_vehicle(await read_json(request))
+        except ValueError as e:
+            return error(str(e), 400)
+        if not await wsgi.clients_cache.get_or_load_async(vehicle_data["client_id"], load_client):
+            return error("Klientas nerastas!", 400)
+        if await db.vehicles.find_one({"vin": vehicle_data["vin"]}, {"_id": 1}):
+            return error("Transporto priemonė su šiuo VIN jau egzistuoja!", 400)
+
+        result = await db.vehicles.insert_one(vehicle_data)
+        wsgi.vehicles_cache.invalidate(result.inserted_id)
+        return APIResponse({"message": "Transporto priemonė užregistruota sėkmingai!", "id": str(result.inserted_id)})
+
+    except Exception as e:
+        return error(f"Serverio klaida: {str(e)}", 500)
+
+
+# 4. Gauti transporto priemonės duomenis
+async def get_vehicles_by_client(request):
+    try:
+        client_id = request.path_params["client_id"]
+        if not ObjectId.is_valid(client_id):
+            return error("Neteisingas client_id formatas!", 400)
+        try:
+            page = KeysetPage(wsgi.VEHICLE_LIST_SORT, parse_limit(request.query_params.get("limit")),
+                              request.query_params.get("cursor"))
+            projection = parse_fields(request.query_params.get("fields"), wsgi.VEHICLE_LIST_FIELDS)
+        except ValueError as e:
+            return error(str(e), 400)
+        if not await wsgi.clients_cache.get_or_load_async(ObjectId(client_id), load_client):
+            return error("Klientas nerastas!", 400)
+
+        vehicles, next_cursor = page.result(
+            await page.find(db.vehicles, {"client_id": ObjectId(client_id)}, projection).to_list(page.limit + 1)
+        )
+        response = APIResponse(vehicles)
+        if next_cursor is not None:
+            response.headers["Link"] = f'<{request.url.include_query_params(cursor=next_cursor)}>; rel="next"'
+            response.headers["X-Next-Cursor"] = next_cursor
+        return response
+
+    except Exception as e:
+        return error(f"Serverio klaida: {str(e)}", 500)
+
+
+# 5. Pradėti naują kelionę
+async def start_journey(request):
+    try:
+        try:
+            vehicle_id, interval = parse_journey(await read_json(request))
+        except ValueError as e:
+            return error(str(e), 400)
+        vehicle = await wsgi.vehicles_cache.get_or_load_async(vehicle_id, load_vehicle)
+        if not vehicle:
+            return error("Transporto priemonė nerasta!", 404)
+
+        journey_data = {
+            "vehicle_id": vehicle_id,
+            "client_id": vehicle["client_id"],
+            "start_time": datetime.now(),
+            "is_completed": False,
+            "interval": interval,
+            **empty_journey_stats()
+        }
+        result = await db.journeys.insert_one(journey_data)
+        wsgi.journey_started(journey_data)
+        return APIResponse({"message": "Kelionė pradėta!", "id": str(result.inserted_id)}, 201)
+
+    except Exception as e:
+        return error(f"Serverio klaida: {str(e)}", 500)
+
+
+# Vykstanti kelionė iš registro; registre nerasta kelionė skaitoma iš duomenų bazės
+# darbiniame sraute, kad sinchroninė užklausa neužimtų įvykių ciklo
+async def open_journey(journey_id):
+    journey = wsgi.journey_registry.cached(journey_id)
+    if journey is None:
+        journey = await run_in_threadpool(wsgi.open_journey, journey_id)
+    return journey
+
+
+# 6. Registruoti transporto priemonės koordinates
+async def log_coordinates(request):
+    try:
+        journey_id = request.path_params["journey_id"]
+        if not ObjectId.is_valid(journey_id):
+            return error("Neteisingas journey_id formatas!", 400)
+        journey = await open_journey(ObjectId(journey_id))
+        if not journey:
+            return error("Kelionė nerasta arba jau baigta!", 404)
+
+        idempotency_key = request.headers.get("Idempotency-Key")
+        replayed = wsgi.idempotent_response(journey["_id"], idempotency_key)
+        if replayed is not None:
+            return APIResponse(*replayed)
+
+        try:
+            coordinates = parse_coordinates(ObjectId(journey_id), await read_json(request))
+        except ValueError as e:
+            return error(str(e), 400)
+        if wsgi.already_stored(coordinates):
+            return APIResponse(wsgi.duplicate_response(journey_id, coordinates))
+
+        try:
+            stored = await submit_point(coordinates)
+        except BufferFull:
+            return APIResponse({"error": "Koordinačių eilė pilna, bandykite vėliau!"}, 429, headers={"Retry-After": "1"})
+        except TimeoutError as e:
+            return error(str(e), 503)
+        except ValueError as e:
+            return error(str(e), 400)
+
+        response = {
+            "message": "Koordinatės sėkmingai įkeltos!" if stored else "Koordinatės priimtos įrašymui!",
+            "data": coordinates_record(journey_id, coordinates)
+        }
+        wsgi.remember_response(journey["_id"], idempotency_key, response, 200 if stored else 202)
+        return APIResponse(response, 200 if stored else 202)
+
+    except Exception as e:
+        return error(f"Serverio klaida: {str(e)}", 500)
+
+
+# 6.1. Registruoti transporto priemonės koordinates paketu
+async def log_coordinates_batch(request):
+    try:
+        journey_id = request.path_params["journey_id"]
+        if not ObjectId.is_valid(journey_id):
+            return error("Neteisingas journey_id formatas!", 400)
+        journey = await open_journey(ObjectId(journey_id))
+        if not journey:
+            return error("Kelionė nerasta arba jau baigta!", 404)
+
+        mimetype = request.headers.get("content-type", "").split(";")[0].strip()
+        records = parse_batch_records(mimetype, (await request.body()).decode("utf-8", "replace"))
+        if records is None:
+            return error("Tikimasi JSON masyvo arba NDJSON įrašų!", 400)
+        if len(records) > MAX_BATCH_POINTS:
+            return error(f"Per daug taškų viename pakete (daugiausiai {MAX_BATCH_POINTS})!", 413)
+
+        idempotency_key = request.headers.get("Idempotency-Key")
+        replayed = wsgi.idempotent_response(journey["_id"], idempotency_key)
+        if replayed is not None:
+            return APIResponse(*replayed)
+
+        # Paketas įrašomas gijų telkinyje ta pačia funkcija kaip Flask programoje
+        response = await run_in_threadpool(wsgi.ingest_batch, journey, records)
+        status = wsgi.batch_status(response, records)
+        if status == 200:
+            wsgi.remember_response(journey["_id"], idempotency_key, response, status)
+        return APIResponse(response, status)
+
+    except Exception as e:
+        return error(f"Serverio klaida: {str(e)}", 500)
+
+
+# 6. Gauti kelionės informaciją
+async def get_journey_details(request):
+    try:
+        journey_id = request.path_params["journey_id"]
+        if not ObjectId.is_valid(journey_id):
+            return error("Neteisingas journey_id formatas!", 400)
+        try:
+            method = parse_distance_method(request.query_params.get("method"))
+        except ValueError as e:
+            return error(str(e), 400)
+
+        journey = await db.journeys.find_one(
+            {"_id": ObjectId(journey_id)},
+            {"vehicle_id": 1, "start_time": 1, "end_time": 1, "point_count": 1, "total_distance": 1, "stats_stale": 1}
+        )
+        if not journey:
+            return error("Kelionė nerasta!", 404)
+        if journey.get("stats_stale"):
+            await run_in_threadpool(wsgi.refresh_journey_stats, journey)
+
+        result = journey_record(journey, method)
+        if method != DEFAULT_METHOD:
+            result["total_distance"] = await run_in_threadpool(journey_distance, wsgi.point_store, journey["_id"], method)
+        return APIResponse(result)
+
+    except Exception as e:
+        return error(f"Serverio klaida: {str(e)}", 500)
+
+
+# 8. Baigti kelionę
+async def end_journey(request):
+    try:
+        journey_id = request.path_params["journey_id"]
+        if not ObjectId.is_valid(journey_id):
+            return error("Neteisingas journey_id formatas!", 400)
+
+        completed_journey = await db.journeys.find_one_and_update(
+            {"_id": ObjectId(journey_id), "is_completed": False},
+            {"$set": {"end_time": datetime.now(), "is_completed": True}},
+            return_document=ReturnDocument.AFTER
+        )
+        if completed_journey is None:
+            return error("Kelionė nerasta arba jau baigta!", 404)
+
+        await run_in_threadpool(wsgi.journey_completed, completed_journey)
+        return APIResponse({"message": "Kelionė sėkmingai baigta!"})
+
+    except Exception as e:
+        return error(f"Serverio klaida: {str(e)}", 500)
+
+
+# Realaus laiko įvykiai (SSE) neužimant srauto: įdėtas į prenumeratos eilę įvykis pažadina įvykių ciklą
+async def live_events(subscription):
+    loop = asyncio.get_running_loop()
+    ready = asyncio.Event()
+
+    def wake():
+        try:
+            loop.call_soon_threadsafe(ready.set)
+        except RuntimeError:  # Įvykių ciklas jau uždarytas
+            pass
+
+    subscription.waker = wake
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            # Pirmiausia paimami jau įdėti įvykiai (įskaitant įdėtus prieš nustatant waker)
+            ready.clear()
+            frames = subscription.drain()
+            if frames is None:
+                return
+            for frame in frames:
+                yield frame
+            if subscription.closed:
+                continue
+            try:
+                await asyncio.wait_for(ready.wait(), wsgi.settings["LIVE_HEARTBEAT_SECONDS"])
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+    finally:
+        wsgi.live_broker.unsubscribe(subscription)
+
+
+def live_response(subscription):
+    return StreamingResponse(
+        live_events(subscription), media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# 6.4. Sekti kelionę realiu laiku (SSE)
+async def get_journey_live(request):
+    try:
+        journey_id = request.path_params["journey_id"]
+        if not ObjectId.is_valid(journey_id):
+            return error("Neteisingas journey_id formatas!", 400)
+        journey_id = ObjectId(journey_id)
+
+        subscription = wsgi.live_broker.subscribe([journey_topic(journey_id)])
+        if not await open_journey(journey_id):
+            wsgi.live_broker.unsubscribe(subscription)
+            return error("Kelionė nerasta arba jau baigta!", 404)
+        return live_response(subscription)
+
+    except Exception as e:
+        return error(f"Serverio klaida: {str(e)}", 500)
+
+
+# 10.1. Sekti transporto priemonių padėtis realiu laiku (SSE)
+async def get_vehicles_live(request):
+    try:
+        vehicle_ids = request.query_params.getlist("vehicle_id")
+        if not all(ObjectId.is_valid(vehicle_id) for vehicle_id in vehicle_ids):
+            return error("Neteisingas vehicle_id formatas!", 400)
+
+        topics = [vehicle_topic(ObjectId(vehicle_id)) for vehicle_id in vehicle_ids] or [VEHICLES_TOPIC]
+        return live_response(wsgi.live_broker.subscribe(topics))
+
+    except Exception as e:
+        return error(f"Serverio klaida: {str(e)}", 500)
+
+
+@asynccontextmanager
+async def lifespan(application):
+    global motor_client, db
+    # Kiekvienas darbininkas kuria savo Motor klientą su tais pačiais telkinio ir laiko ribų nustatymais
+    motor_client = AsyncIOMotorClient(
+        wsgi.settings["MONGO_URI"], event_listeners=[wsgi.command_metrics], **client_options(wsgi.settings)
+    )
+    db = motor_client[wsgi.db.name]
+    await run_in_threadpool(wsgi.start_services)
+    try:
+        yield
+    finally:
+        wsgi.coordinate_scheduler.stop(timeout=5)
+        if wsgi.ingest_buffer is not None:
+            wsgi.ingest_buffer.stop(timeout=5)
+        motor_client.close()
+
+
+routes = [
+    Route("/clients", register_client, methods=["PUT"]),
+    Route("/clients/{client_id}", get_client_details, methods=["GET"]),
+    Route("/vehicles", register_vehicle, methods=["PUT"]),
+    Route("/clients/{client_id}/vehicles", get_vehicles_by_client, methods=["GET"]),
+    Route("/journeys", start_journey, methods=["PUT"]),
+    Route("/journeys/{journey_id}/coordinates", log_coordinates, methods=["POST"]),
+    Route("/journeys/{journey_id}/coordinates:batch", log_coordinates_batch, methods=["POST"]),
+    Route("/journeys/{journey_id}", get_journey_details, methods=["GET"]),
+    Route("/journeys/{journey_id}/end", end_journey, methods=["PUT"]),
+    Route("/journeys/{journey_id}/live", get_journey_live, methods=["GET"]),
+    Route("/vehicles/live", get_vehicles_live, methods=["GET"]),
+    # Kiti maršrutai (eksportas, statistika, paieška, valymas) vykdomi Flask programos
+    Mount("/", app=WSGIMiddleware(wsgi.app))
+]
+
+# Asinchroninių maršrutų trukmė įrašoma į tą pačią histogramą kaip Flask užklausų
+# (Flask programai perduotas užklausas matuoja pati Flask programa). SSE srautų trukmė nematuojama.
+LIVE_ENDPOINTS = (get_journey_live, get_vehicles_live)
+ROUTE_PATHS = {
+    route.endpoint: route.path for route in routes
+    if isinstance(route, Route) and route.endpoint not in LIVE_ENDPOINTS
+}
+request_duration = wsgi.app.extensions["request_duration"]
+
+
+class RequestMetrics:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = ROUTE_PATHS.get(scope.get("endpoint"))
+            if route is not None:
+                request_duration.observe(time.perf_counter() - started, scope["method"], route, str(status["code"]))
+
+
+app = Starlette(routes=routes, middleware=[Middleware(RequestMetrics)], lifespan=lifespan)
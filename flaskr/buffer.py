@@ -0,0 +1,341 @@
+import glob
+import os
+import time
+from collections import deque
+from threading import Condition, Event, Thread
+
+from bson import json_util
+from pymongo.errors import BulkWriteError
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+DURABILITY_MODES = ("ack-after-flush", "ack-on-enqueue")
+
+SPILL_JSON_OPTIONS = json_util.JSONOptions(tz_aware=False)
+
+
+# Išskirtinis failo užraktas (neblokuojantis). Užraktą operacinė sistema atlaisvina
+# pasibaigus procesui, todėl neužrakinamas failas reiškia, kad jo savininkas dar veikia.
+def lock_file(file):
+    try:
+        if fcntl is not None:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+# Buferis pilnas: užklausa atmetama (429), kad eilė neaugtų be ribų
+class BufferFull(Exception):
+    pass
+
+
+# Vieno taško įrašymo būsena. ack-after-flush režimu užklausa laukia, kol taškas įrašytas
+# (sinchroniškai wait arba per add_done_callback, pvz. asyncio programoje).
+class Ticket:
+    __slots__ = ("point", "error", "_done", "_callbacks")
+
+    def __init__(self, point):
+        self.point = point
+        self.error = None
+        self._done = Event()
+        self._callbacks = []
+
+    def done(self):
+        return self._done.is_set()
+
+    def resolve(self, error=None):
+        self.error = error
+        self._done.set()
+        for callback in self._callbacks:
+            callback(self)
+
+    # Callback kviečiamas įrašymo sraute; lenktynių atveju jis gali būti iškviestas du kartus
+    def add_done_callback(self, callback):
+        self._callbacks.append(callback)
+        if self._done.is_set():
+            callback(self)
+
+    def wait(self, timeout=None):
+        if not self._done.wait(timeout):
+            raise TimeoutError("Koordinačių įrašymas užtruko per ilgai!")
+        return self.error
+
+
+# Atidėtas koordinačių įrašymas: taškai kaupiami proceso eilėje, o foninis srautas juos
+# įrašo vienu write(points) kvietimu kas flush_interval sekundžių arba sukaupus max_points.
+#   ack-after-flush - užklausa atsakoma tik įrašius tašką (kaip ir be buferio)
+#   ack-on-enqueue  - užklausa atsakoma iškart, taškas prieš tai pridedamas prie
+#                     vietinio žurnalo (spill) failo, kuris po nesėkmės įrašomas iš naujo
+# Kiekvienas procesas žurnalą rašo savo spill_dir pakatalogyje (process-*), kurio užrakto
+# failą laiko užrakintą, todėl replay įrašo tik pasibaigusių procesų segmentus.
+class IngestBuffer:
+    def __init__(self, write, durability="ack-after-flush", max_points=500, flush_interval=0.02,
+                 max_queue=10000, spill_dir="ingest-spill", spill_fsync=False, retry_interval=1.0):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Nežinomas patvarumo režimas: {durability}")
+        self.write = write
+        self.durability = durability
+        self.max_points = max_points
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.spill_dir = spill_dir
+        self.spill_fsync = spill_fsync
+        self.retry_interval = retry_interval
+
+        self._queue = deque()
+        self._condition = Condition()
+        self._stop = Event()
+        self._thread = None
+        # Žurnalo segmentai, kurių taškai dar eilėje (ištrinami sėkmingai įrašius)
+        self._segments = []
+        self._spill = None
+        self._spill_path = None
+        # Šio proceso žurnalo katalogas ir jo užraktas (sukuriami pirmą kartą rašant į žurnalą)
+        self._process_dir = None
+        self._process_lock = None
+        self._process_pid = None
+
+        self.enqueued = 0
+        self.flushed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.flushes = 0
+        self.flush_errors = 0
+        self.flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self.last_flush_seconds = 0.0
+
+    @property
+    def spills(self):
+        return self.durability == "ack-on-enqueue"
+
+    # Taškas įtraukiamas į eilę. Pilnos eilės atveju keliama BufferFull.
+    def put(self, point):
+        ticket = Ticket(point)
+        with self._condition:
+            if len(self._queue) >= self.max_queue:
+                self.rejected += 1
+                raise BufferFull()
+            if self.spills:
+                self._append_spill(point)
+            self._queue.append(ticket)
+            self.enqueued += 1
+            # Pirmasis taškas pradeda flush_interval laukimą, max_points - įrašymą iškart
+            if len(self._queue) == 1 or len(self._queue) >= self.max_points:
+                self._condition.notify()
+        self.start()
+        return ticket
+
+    # Taškas įrašomas pagal patvarumo režimą; grąžinama True, jei jis jau įrašytas
+    def submit(self, point, timeout=None):
+        ticket = self.put(point)
+        if self.spills:
+            return False
+        error = ticket.wait(timeout)
+        if error is not None:
+            raise error
+        return True
+
+    # Užrakinamas šio proceso užrakto failas ir tik tada sukuriamas katalogas, todėl kiti
+    # procesai katalogą mato tik jau užrakintą
+    def _open_process_dir(self):
+        # Po fork vaikinis procesas kuria savo katalogą (užraktas bendras su tėviniu procesu)
+        if self._process_dir is not None and self._process_pid == os.getpid():
+            return self._process_dir
+        os.makedirs(self.spill_dir, exist_ok=True)
+        name = f"process-{os.getpid()}-{time.time_ns()}"
+        lock = open(os.path.join(self.spill_dir, name + ".lock"), "a")
+        if not lock_file(lock):
+            lock.close()
+            raise OSError(f"Nepavyko užrakinti žurnalo katalogo {name}")
+        self._process_lock = lock
+        self._process_pid = os.getpid()
+        self._process_dir = os.path.join(self.spill_dir, name)
+        os.makedirs(self._process_dir)
+        return self._process_dir
+
+    def _append_spill(self, point):
+        if self._spill is None:
+            self._spill_path = os.path.join(self._open_process_dir(), f"segment-{time.time_ns()}.ndjson")
+            self._spill = open(self._spill_path, "a", encoding="utf-8")
+        self._spill.write(json_util.dumps(point) + "\n")
+        self._spill.flush()
+        if self.spill_fsync:
+            os.fsync(self._spill.fileno())
+
+    # Uždaromas dabartinis žurnalo segmentas; jo taškai perduodami įrašymui
+    def _rotate_spill(self):
+        if self._spill is not None:
+            self._spill.close()
+            self._segments.append(self._spill_path)
+            self._spill = None
+            self._spill_path = None
+        segments, self._segments = self._segments, []
+        return segments
+
+    # Po programos nutrūkimo neįrašyti taškai įrašomi iš pasibaigusių procesų žurnalo
+    # segmentų (ir ankstesnės versijos segmentų spill_dir šaknyje). Veikiančių procesų
+    # katalogai praleidžiami: jų užrakto failo užrakinti nepavyksta.
+    def replay(self):
+        replayed = self._replay_segments(os.path.join(self.spill_dir, "segment-*.ndjson"))
+        for path in sorted(glob.glob(os.path.join(self.spill_dir, "process-*"))):
+            if not os.path.isdir(path) or path == self._process_dir:
+                continue
+            lock_path = path + ".lock"
+            try:
+                lock = open(lock_path, "a")
+            except OSError:
+                continue
+            try:
+                if not lock_file(lock):
+                    continue
+                replayed += self._replay_segments(os.path.join(path, "segment-*.ndjson"))
+                try:
+                    os.rmdir(path)
+                except OSError:  # Katalogas netuščias (pvz., neįrašytas segmentas)
+                    continue
+            finally:
+                lock.close()
+            remove_file(lock_path)
+        return replayed
+
+    def _replay_segments(self, pattern):
+        replayed = 0
+        for path in sorted(glob.glob(pattern)):
+            try:
+                with open(path, encoding="utf-8") as spill:
+                    points = [json_util.loads(line, json_options=SPILL_JSON_OPTIONS) for line in spill if line.strip()]
+            except FileNotFoundError:
+                continue
+            for start in range(0, len(points), self.max_points):
+                try:
+                    self.write(points[start:start + self.max_points])
+                except BulkWriteError as e:
+                    self.failed += len(e.details.get("writeErrors", []))
+            remove_file(path)
+            replayed += len(points)
+        return replayed
+
+    def start(self):
+        with self._condition:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = Thread(target=self._run, name="ingest-buffer", daemon=True)
+            self._thread.start()
+
+    # Sustabdomas foninis srautas, prieš tai įrašius visus eilės taškus
+    def stop(self, timeout=None):
+        self._stop.set()
+        with self._condition:
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    # Laukiama flush_interval nuo pirmojo eilės taško arba kol sukaupiama max_points.
+    # Paimami visi eilės taškai kartu su jų žurnalo segmentais.
+    def _take(self):
+        with self._condition:
+            deadline = None
+            while not self._stop.is_set():
+                if len(self._queue) >= self.max_points:
+                    break
+                if self._queue:
+                    if deadline is None:
+                        deadline = time.monotonic() + self.flush_interval
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                else:
+                    deadline = None
+                    self._condition.wait(self.retry_interval)
+            tickets = list(self._queue)
+            self._queue.clear()
+            segments = self._rotate_spill() if self.spills else []
+            return tickets, segments
+
+    def _flush(self, tickets):
+        for start in range(0, len(tickets), self.max_points):
+            chunk = tickets[start:start + self.max_points]
+            started = time.perf_counter()
+            try:
+                self.write([ticket.point for ticket in chunk])
+            except BulkWriteError as e:
+                # Atmesti taškai nebandomi įrašyti iš naujo; jau įrašyti taškai (dublikatai) laikomi įrašytais
+                errors = {
+                    error["index"]: error.get("errmsg")
+                    for error in e.details.get("writeErrors", []) if error.get("code") != 11000
+                }
+                for index, ticket in enumerate(chunk):
+                    message = errors.get(index)
+                    ticket.resolve(ValueError(message) if message is not None else None)
+                self.failed += len(errors)
+                self.flushed += len(chunk) - len(errors)
+            else:
+                for ticket in chunk:
+                    ticket.resolve()
+                self.flushed += len(chunk)
+            finally:
+                elapsed = time.perf_counter() - started
+                self.flushes += 1
+                self.flush_seconds += elapsed
+                self.last_flush_seconds = elapsed
+                self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+
+    def _run(self):
+        while True:
+            tickets, segments = self._take()
+            if not tickets and self._stop.is_set():
+                return
+            if not tickets:
+                continue
+            try:
+                self._flush(tickets)
+            except Exception as e:
+                self.flush_errors += 1
+                print(f"Klaida įrašant koordinačių buferį: {str(e)}")
+                if not self.spills:
+                    for ticket in tickets:
+                        ticket.resolve(e)
+                    continue
+                # Patvirtinti taškai grąžinami į eilės pradžią ir bandomi įrašyti vėliau
+                with self._condition:
+                    self._queue.extendleft(reversed([ticket for ticket in tickets if not ticket.done()]))
+                    self._segments = segments + self._segments
+                if self._stop.wait(self.retry_interval):
+                    return
+                continue
+            for path in segments:
+                remove_file(path)
+
+    def stats(self):
+        with self._condition:
+            return {
+                "durability": self.durability,
+                "queue_depth": len(self._queue),
+                "max_queue": self.max_queue,
+                "enqueued": self.enqueued,
+                "flushed": self.flushed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "flushes": self.flushes,
+                "flush_errors": self.flush_errors,
+                "last_flush_ms": round(self.last_flush_seconds * 1000, 3),
+                "avg_flush_ms": round(self.flush_seconds / self.flushes * 1000, 3) if self.flushes else 0.0,
+                "max_flush_ms": round(self.max_flush_seconds * 1000, 3)
+            }
@@ -0,0 +1,170 @@
+import pickle
+import time
+from collections import OrderedDict
+from threading import Lock
+
+try:
+    import redis
+except ImportError:  # Bendras Redis podėlis neprivalomas
+    redis = None
+
+
+# Bendro podėlio pakaitalas viename procese: Redis get/set/delete semantika su galiojimo laiku.
+# Naudojamas, kai Redis nepasiekiamas (kūrimo aplinkoje, testuose).
+class LocalSharedCache:
+    def __init__(self):
+        self._values = {}
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._values.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.monotonic():
+                del self._values[key]
+                return None
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._values[key] = (value, time.monotonic() + ttl)
+
+    def delete(self, key):
+        with self._lock:
+            self._values.pop(key, None)
+
+    def clear(self, prefix):
+        with self._lock:
+            for key in [key for key in self._values if key.startswith(prefix)]:
+                del self._values[key]
+
+
+# Bendras podėlis keliems procesams (Redis). Reikšmės serializuojamos pickle.
+class RedisSharedCache:
+    def __init__(self, url):
+        if redis is None:
+            raise RuntimeError("Bendram podėliui reikalingas paketas redis (pip install redis)")
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        value = self.client.get(key)
+        return pickle.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(key, pickle.dumps(value), ex=max(1, int(ttl)))
+
+    def delete(self, key):
+        self.client.delete(key)
+
+    def clear(self, prefix):
+        for key in self.client.scan_iter(match=prefix + "*"):
+            self.client.delete(key)
+
+
+def make_shared_cache(config):
+    if config["CACHE_BACKEND"] == "redis":
+        return RedisSharedCache(config["CACHE_URL"])
+    if config["CACHE_BACKEND"] == "local":
+        return LocalSharedCache()
+    return None
+
+
+# Skaitymo podėlis: proceso LRU su galiojimo laiku, neprivalomai paremtas bendru podėliu.
+# Neradus reikšmės, ji įkeliama loader funkcija (None reikšmės nesaugomos).
+# Įrašai pašalinami aiškiai (invalidate/clear) pasikeitus duomenims.
+class ReadThroughCache:
+    def __init__(self, name, ttl=30, max_entries=10000, shared=None):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.shared = shared
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def _shared_key(self, key):
+        return f"{self.name}:{key}"
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None:
+                value, expires = item
+                if expires >= time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+        if self.shared is not None:
+            value = self.shared.get(self._shared_key(key))
+            if value is not None:
+                self._store(key, value)
+                with self._lock:
+                    self.shared_hits += 1
+                return value
+        return None
+
+    def _store(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def set(self, key, value):
+        self._store(key, value)
+        if self.shared is not None:
+            self.shared.set(self._shared_key(key), value, self.ttl)
+
+    def get_or_load(self, key, loader):
+        value = self.get(key)
+        if value is not None:
+            return value
+        with self._lock:
+            self.misses += 1
+        value = loader(key)
+        if value is not None:
+            self.set(key, value)
+        return value
+
+    # get_or_load asinchroniniam loader (pvz. Motor užklausai ASGI programoje)
+    async def get_or_load_async(self, key, loader):
+        value = self.get(key)
+        if value is not None:
+            return value
+        with self._lock:
+            self.misses += 1
+        value = await loader(key)
+        if value is not None:
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+            self.invalidations += 1
+        if self.shared is not None:
+            self.shared.delete(self._shared_key(key))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+        if self.shared is not None:
+            self.shared.clear(self._shared_key(""))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations
+            }
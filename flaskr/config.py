@@ -0,0 +1,87 @@
+import os
+
+
+# Neprivalomas skaitinis nustatymas (None, jei aplinkos kintamasis nenurodytas)
+def optional_int(name):
+    return int(os.environ[name]) if os.environ.get(name) else None
+
+
+# Programos konfigūracija, skaitoma iš aplinkos kintamųjų
+class Config:
+    # MongoDB prisijungimo adresas ir duomenų bazė
+    MONGO_URI = os.environ.get("MONGO_URI", "mongodb://localhost:27017/")
+    MONGO_DB = os.environ.get("MONGO_DB", "travel_registration_system")
+    # Ryšių telkinys kiekviename procese: didžiausias ir mažiausias ryšių skaičius,
+    # neaktyvaus ryšio laikas milisekundėmis (nenurodžius - tvarkyklės numatytasis)
+    MONGO_MAX_POOL_SIZE = int(os.environ.get("MONGO_MAX_POOL_SIZE", 100))
+    MONGO_MIN_POOL_SIZE = int(os.environ.get("MONGO_MIN_POOL_SIZE", 0))
+    MONGO_MAX_IDLE_TIME_MS = optional_int("MONGO_MAX_IDLE_TIME_MS")
+    # Laiko ribos milisekundėmis: prisijungimas, serverio parinkimas, atsakymo laukimas
+    # ir laisvo ryšio laukimas telkinyje (paskutinės dvi neribojamos, jei nenurodytos)
+    MONGO_CONNECT_TIMEOUT_MS = int(os.environ.get("MONGO_CONNECT_TIMEOUT_MS", 20000))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", 30000))
+    MONGO_SOCKET_TIMEOUT_MS = optional_int("MONGO_SOCKET_TIMEOUT_MS")
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = optional_int("MONGO_WAIT_QUEUE_TIMEOUT_MS")
+    # Skaitymo pirmenybė (primary, primaryPreferred, secondary, secondaryPreferred, nearest)
+    # ir įrašymo patvirtinimas (skaičius arba majority; nenurodžius - serverio numatytasis)
+    MONGO_READ_PREFERENCE = os.environ.get("MONGO_READ_PREFERENCE", "primary")
+    MONGO_WRITE_CONCERN = os.environ.get("MONGO_WRITE_CONCERN") or None
+    # Kelionės taškų saugojimas: "documents" (dokumentas kiekvienam taškui) arba "buckets" (kibirai)
+    POINT_STORAGE = os.environ.get("POINT_STORAGE", "documents")
+    # Didžiausias taškų skaičius ir laiko intervalas (minutėmis) viename kibire
+    POINT_BUCKET_MAX_POINTS = int(os.environ.get("POINT_BUCKET_MAX_POINTS", 200))
+    POINT_BUCKET_MAX_MINUTES = int(os.environ.get("POINT_BUCKET_MAX_MINUTES", 60))
+    # Baigtų kelionių archyvavimas: "background" (foniniu srautu) arba "manual" (tik compact-journeys),
+    # po kiek minučių nuo kelionės pabaigos ir kas kiek sekundžių tikrinama
+    COMPACTION = os.environ.get("COMPACTION", "background")
+    COMPACT_AFTER_MINUTES = float(os.environ.get("COMPACT_AFTER_MINUTES", 10))
+    COMPACT_INTERVAL_SECONDS = float(os.environ.get("COMPACT_INTERVAL_SECONDS", 60))
+    # Archyvo glaudinimas: "auto" (zstd, jei įdiegtas zstandard, kitaip zlib), "zstd" arba "zlib"
+    ARCHIVE_CODEC = os.environ.get("ARCHIVE_CODEC", "auto")
+    # Baigtų kelionių supaprastinimo podėlio dydis (bendras taškų skaičius)
+    SIMPLIFY_CACHE_POINTS = int(os.environ.get("SIMPLIFY_CACHE_POINTS", 5000000))
+    # Skaitymo podėlis: įrašų galiojimo laikas sekundėmis ir didžiausias įrašų skaičius procese
+    CACHE_TTL_SECONDS = float(os.environ.get("CACHE_TTL_SECONDS", 30))
+    CACHE_MAX_ENTRIES = int(os.environ.get("CACHE_MAX_ENTRIES", 10000))
+    # Bendras podėlis: "none", "local" (proceso pakaitalas) arba "redis" (CACHE_URL)
+    CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "none")
+    CACHE_URL = os.environ.get("CACHE_URL", "redis://localhost:6379/0")
+    # Vykstančių kelionių registro sinchronizavimas tarp procesų: "none" arba "changestream" (reikalingas replica set)
+    REGISTRY_SYNC = os.environ.get("REGISTRY_SYNC", "none")
+    # Be sinchronizavimo: po kiek sekundžių registro įrašas tikrinamas duomenų bazėje (kitame
+    # procese baigta kelionė nustoja priimti taškus ne vėliau kaip po tiek laiko)
+    REGISTRY_RECHECK_SECONDS = float(os.environ.get("REGISTRY_RECHECK_SECONDS", 5))
+    # Realaus laiko įvykių (SSE) šaltinis: "local" (taškai, įrašyti šiame procese) arba
+    # "changestream" (visų procesų padėčių pakeitimai, reikalingas replica set)
+    LIVE_SOURCE = os.environ.get("LIVE_SOURCE", "local")
+    # Didžiausia vieno prenumeratoriaus eilė (perpildžius išmetami seniausi įvykiai) ir
+    # kas kiek sekundžių be įvykių siunčiamas ryšio palaikymo komentaras
+    LIVE_QUEUE_MAX = int(os.environ.get("LIVE_QUEUE_MAX", 256))
+    LIVE_HEARTBEAT_SECONDS = float(os.environ.get("LIVE_HEARTBEAT_SECONDS", 15))
+    # Koordinačių įrašymo buferis: "sync" (be buferio), "ack-after-flush" arba "ack-on-enqueue".
+    # Numatytai išjungtas: ack-after-flush režimu kiekviena užklausa laukia INGEST_FLUSH_MS,
+    # todėl buferis naudingas tik esant dideliam pavienių taškų srautui.
+    INGEST_DURABILITY = os.environ.get("INGEST_DURABILITY", "sync")
+    # Buferis įrašomas sukaupus INGEST_FLUSH_POINTS taškų arba praėjus INGEST_FLUSH_MS milisekundžių
+    INGEST_FLUSH_POINTS = int(os.environ.get("INGEST_FLUSH_POINTS", 500))
+    INGEST_FLUSH_MS = float(os.environ.get("INGEST_FLUSH_MS", 20))
+    # Didžiausias eilės dydis (viršijus grąžinama 429) ir laukimo laikas sekundėmis (ack-after-flush)
+    INGEST_QUEUE_MAX = int(os.environ.get("INGEST_QUEUE_MAX", 10000))
+    INGEST_ACK_TIMEOUT = float(os.environ.get("INGEST_ACK_TIMEOUT", 10))
+    # ack-on-enqueue žurnalo katalogas ir ar kiekvienas įrašas sinchronizuojamas į diską (fsync)
+    INGEST_SPILL_DIR = os.environ.get("INGEST_SPILL_DIR", "ingest-spill")
+    INGEST_SPILL_FSYNC = os.environ.get("INGEST_SPILL_FSYNC", "false").lower() in ("1", "true", "yes")
+    # Kiek paskutinių taškų laikų ir Idempotency-Key kiekvienai kelionei laikoma atmintyje
+    # pakartotinai atsiųstiems taškams atpažinti (0 - tik unikalus duomenų bazės indeksas)
+    INGEST_DEDUP_WINDOW = int(os.environ.get("INGEST_DEDUP_WINDOW", 256))
+    # JSON atsakymų variklis: "auto" (orjson, jei įdiegtas), "orjson" arba "json"
+    JSON_ENGINE = os.environ.get("JSON_ENGINE", "auto")
+    # Lėtų MongoDB komandų žurnalas: slenkstis milisekundėmis (neįjungtas, jei nenurodytas)
+    # ir failas (numatytai standartinė klaidų išvestis)
+    SLOW_QUERY_MS = float(os.environ["SLOW_QUERY_MS"]) if os.environ.get("SLOW_QUERY_MS") else None
+    SLOW_QUERY_LOG = os.environ.get("SLOW_QUERY_LOG")
+
+
+# Nustatymai žodynu (kaip Flask app.config): paslaugos kuriamos dar nesukūrus Flask programos
+def load_settings(config_object=Config):
+    return {name: getattr(config_object, name) for name in dir(config_object) if name.isupper()}
@@ -0,0 +1,108 @@
+import os
+from threading import Lock
+
+import pymongo
+from pymongo.read_preferences import read_pref_mode_from_name
+
+
+# MongoClient parametrai iš konfigūracijos: ryšių telkinys, laiko ribos, skaitymo pirmenybė
+# ir įrašymo patvirtinimas (tie patys naudojami ir Motor klientui). Nenurodyti parametrai
+# neperduodami, todėl lieka tvarkyklės ar serverio numatytieji.
+def client_options(config):
+    read_preference = config["MONGO_READ_PREFERENCE"]
+    try:
+        read_pref_mode_from_name(read_preference)
+    except (KeyError, ValueError):
+        raise ValueError(f"Netinkama skaitymo pirmenybė: {read_preference}")
+    write_concern = config["MONGO_WRITE_CONCERN"]
+    if write_concern is not None and write_concern.isdigit():
+        write_concern = int(write_concern)
+
+    options = {
+        "maxPoolSize": config["MONGO_MAX_POOL_SIZE"],
+        "minPoolSize": config["MONGO_MIN_POOL_SIZE"],
+        "maxIdleTimeMS": config["MONGO_MAX_IDLE_TIME_MS"],
+        "connectTimeoutMS": config["MONGO_CONNECT_TIMEOUT_MS"],
+        "serverSelectionTimeoutMS": config["MONGO_SERVER_SELECTION_TIMEOUT_MS"],
+        "socketTimeoutMS": config["MONGO_SOCKET_TIMEOUT_MS"],
+        "waitQueueTimeoutMS": config["MONGO_WAIT_QUEUE_TIMEOUT_MS"],
+        "readPreference": read_preference,
+        "w": write_concern
+    }
+    return {name: value for name, value in options.items() if value is not None}
+
+
+# MongoClient, sukuriamas pirmą kartą jo prireikus, o ne importuojant programą.
+# MongoClient paleidžia stebėjimo srautus ir laiko atvirus lizdus, kurie po fork
+# vaikiniame procese netinkami, todėl kiekvienas procesas (pvz., gunicorn darbininkas)
+# po fork sukuria savo klientą ir savo ryšių telkinį.
+class LazyMongoClient:
+    def __init__(self, uri, **options):
+        self.uri = uri
+        self.options = options
+        self._client = None
+        self._lock = Lock()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._forked)
+
+    def _forked(self):
+        # Tėvinio proceso klientas neuždaromas: jo srautų vaikiniame procese nebėra
+        self._client = None
+        self._lock = Lock()
+
+    def get(self):
+        client = self._client
+        if client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = pymongo.MongoClient(self.uri, **self.options)
+                client = self._client
+        return client
+
+    def close(self):
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+    def __getitem__(self, name):
+        return LazyDatabase(self, name)
+
+    # Kiti atributai (drop_database, admin ir t. t.) - sukurto kliento
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+
+class LazyDatabase:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def get(self):
+        return self.client.get()[self.name]
+
+    def __getitem__(self, name):
+        return LazyCollection(self, name)
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+
+# Kolekcija, kurios metodai kviečiami dabartinio proceso kliento kolekcijai.
+# Kolekcijos objektas laikomas, kol nepasikeičia klientas (po fork ar close).
+class LazyCollection:
+    def __init__(self, database, name):
+        self.database = database
+        self.name = name
+        self._cached = None
+
+    def get(self):
+        client = self.database.client.get()
+        cached = self._cached
+        if cached is None or cached[0] is not client:
+            cached = (client, client[self.database.name][self.name])
+            self._cached = cached
+        return cached[1]
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
@@ -0,0 +1,140 @@
+from array import array
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# Vidutinis Žemės spindulys (km) haversino formulei
+EARTH_RADIUS_KM = 6371.0088
+# WGS-84 elipsoido parametrai Vincenty formulei
+WGS84_A = 6378.137
+WGS84_F = 1 / 298.257223563
+WGS84_B = WGS84_A * (1 - WGS84_F)
+
+EPOCH = datetime(1970, 1, 1)
+
+
+# Kelionės taškai gretimuose float64 masyvuose (laikas sekundėmis nuo epochos)
+class Track:
+    __slots__ = ("timestamps", "latitudes", "longitudes", "first", "last")
+
+    def __init__(self, timestamps, latitudes, longitudes, first=None, last=None):
+        self.timestamps = timestamps
+        self.latitudes = latitudes
+        self.longitudes = longitudes
+        self.first = first
+        self.last = last
+
+    def __len__(self):
+        return len(self.latitudes)
+
+    # Taškai (neprivalomai tik nurodytų indeksų) atgal į saugyklos taškų formatą
+    def points(self, indices=None):
+        for i in range(len(self)) if indices is None else indices:
+            yield {
+                "timestamp": EPOCH + timedelta(seconds=float(self.timestamps[i])),
+                "latitude": float(self.latitudes[i]),
+                "longitude": float(self.longitudes[i])
+            }
+
+
+# Išrikiuotų taškų srautas surenkamas į masyvus nekuriant tarpinių sąrašų
+def load_track(points):
+    timestamps, latitudes, longitudes = array("d"), array("d"), array("d")
+    first = last = None
+    for point in points:
+        if first is None:
+            first = point
+        last = point
+        timestamps.append((point["timestamp"] - EPOCH).total_seconds())
+        latitudes.append(point["latitude"])
+        longitudes.append(point["longitude"])
+    return Track(
+        np.frombuffer(timestamps, dtype=np.float64),
+        np.frombuffer(latitudes, dtype=np.float64),
+        np.frombuffer(longitudes, dtype=np.float64),
+        first,
+        last
+    )
+
+
+# Atkarpų ilgiai (km) tarp gretimų taškų pagal haversino formulę
+def haversine(latitudes, longitudes):
+    lat = np.radians(latitudes)
+    lon = np.radians(longitudes)
+    dlat = np.diff(lat)
+    dlon = np.diff(lon)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+# Atkarpų ilgiai (km) ant WGS-84 elipsoido pagal Vincenty atvirkštinę formulę.
+# Iteruojama visoms atkarpoms kartu; nekonvergavusioms (beveik priešingiems taškams)
+# naudojamas haversino rezultatas.
+def vincenty(latitudes, longitudes, tolerance=1e-12, max_iterations=200):
+    lat = np.radians(latitudes)
+    lon = np.radians(longitudes)
+    u1 = np.arctan((1 - WGS84_F) * np.tan(lat[:-1]))
+    u2 = np.arctan((1 - WGS84_F) * np.tan(lat[1:]))
+    big_l = np.diff(lon)
+    sin_u1, cos_u1 = np.sin(u1), np.cos(u1)
+    sin_u2, cos_u2 = np.sin(u2), np.cos(u2)
+
+    lam = big_l.copy()
+    converged = np.zeros(len(lam), dtype=bool)
+    sin_sigma = cos_sigma = sigma = cos_sq_alpha = cos_2sigma_m = np.zeros(len(lam))
+    for _ in range(max_iterations):
+        sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+        sin_sigma = np.hypot(cos_u2 * sin_lam, cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam)
+        cos_sigma = sin_u1 * sin_u2 + cos_u1 * cos_u2 * cos_lam
+        sigma = np.arctan2(sin_sigma, cos_sigma)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            sin_alpha = np.where(sin_sigma == 0, 0.0, cos_u1 * cos_u2 * sin_lam / sin_sigma)
+            cos_sq_alpha = 1 - sin_alpha ** 2
+            cos_2sigma_m = np.where(cos_sq_alpha == 0, 0.0, cos_sigma - 2 * sin_u1 * sin_u2 / cos_sq_alpha)
+        c = WGS84_F / 16 * cos_sq_alpha * (4 + WGS84_F * (4 - 3 * cos_sq_alpha))
+        previous = lam
+        lam = big_l + (1 - c) * WGS84_F * sin_alpha * (
+            sigma + c * sin_sigma * (cos_2sigma_m + c * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2))
+        )
+        converged = np.abs(lam - previous) < tolerance
+        if converged.all():
+            break
+
+    u_sq = cos_sq_alpha * (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+    big_a = 1 + u_sq / 16384 * (4096 + u_sq * (-768 + u_sq * (320 - 175 * u_sq)))
+    big_b = u_sq / 1024 * (256 + u_sq * (-128 + u_sq * (74 - 47 * u_sq)))
+    delta_sigma = big_b * sin_sigma * (cos_2sigma_m + big_b / 4 * (
+        cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)
+        - big_b / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)
+    ))
+    distances = WGS84_B * big_a * (sigma - delta_sigma)
+    if not converged.all():
+        distances = np.where(converged, distances, haversine(latitudes, longitudes))
+    return distances
+
+
+# Ankstesnis skaičiavimas: Euklido atstumas laipsniais (palyginimui)
+def euclidean(latitudes, longitudes):
+    return np.hypot(np.diff(latitudes), np.diff(longitudes))
+
+
+METHODS = {
+    "haversine": haversine,
+    "vincenty": vincenty,
+    "euclidean": euclidean
+}
+# Metodas, kuriuo skaičiuojamos kelionės dokumente saugomos suvestinės
+DEFAULT_METHOD = "haversine"
+
+
+# Bendras kelio ilgis (atkarpų suma) pasirinktu metodu
+def path_length(latitudes, longitudes, method=DEFAULT_METHOD):
+    if len(latitudes) < 2:
+        return 0.0
+    return float(METHODS[method](np.asarray(latitudes, dtype=np.float64), np.asarray(longitudes, dtype=np.float64)).sum())
+
+
+# Kelionės ilgis iš saugyklos srautu skaitomų (pagal laiką išrikiuotų) taškų
+def journey_distance(point_store, journey_id, method=DEFAULT_METHOD):
+    track = load_track(point_store.iter_points(journey_id))
+    return path_length(track.latitudes, track.longitudes, method)
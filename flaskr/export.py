@@ -0,0 +1,89 @@
+import json
+from xml.sax.saxutils import quoteattr
+
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+# Eksporto formatai: MIME tipas ir failo plėtinys
+FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "geojson": ("application/geo+json", "geojson"),
+    "gpx": ("application/gpx+xml", "gpx")
+}
+
+
+# Taškas atsakyme (laikas tekstu tuo pačiu formatu, kuriuo jis priimamas)
+def point_record(point):
+    return {
+        "timestamp": point["timestamp"].strftime(TIMESTAMP_FORMAT),
+        "latitude": point["latitude"],
+        "longitude": point["longitude"]
+    }
+
+
+# Po vieną JSON objektą eilutėje
+def ndjson_stream(journey_id, points, page_state):
+    for point in points:
+        page_state["last"] = point["timestamp"]
+        yield json.dumps(point_record(point)) + "\n"
+
+
+# GeoJSON FeatureCollection su Point objektais. Objektai rašomi po vieną, o puslapio
+# pabaigoje pridedamas next_after laukas (kito puslapio pradžia), jei jis žinomas.
+def geojson_stream(journey_id, points, page_state):
+    yield '{"type": "FeatureCollection", "journey_id": %s, "features": [' % json.dumps(journey_id)
+    separator = ""
+    for point in points:
+        page_state["last"] = point["timestamp"]
+        feature = {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [point["longitude"], point["latitude"]]},
+            "properties": {"timestamp": point["timestamp"].strftime(TIMESTAMP_FORMAT)}
+        }
+        yield separator + json.dumps(feature)
+        separator = ","
+    yield "]"
+    if page_state.get("full"):
+        yield ', "next_after": %s' % json.dumps(page_state["last"].strftime(TIMESTAMP_FORMAT))
+    yield "}\n"
+
+
+# GPX 1.1 takas su vienu segmentu
+def gpx_stream(journey_id, points, page_state):
+    yield ('<?xml version="1.0" encoding="UTF-8"?>\n'
+           '<gpx version="1.1" creator="NoSQL-Uzd5" xmlns="http://www.topografix.com/GPX/1/1">\n'
+           '<trk><name>%s</name><trkseg>\n' % journey_id)
+    for point in points:
+        page_state["last"] = point["timestamp"]
+        yield '<trkpt lat=%s lon=%s><time>%s</time></trkpt>\n' % (
+            quoteattr(repr(point["latitude"])),
+            quoteattr(repr(point["longitude"])),
+            point["timestamp"].strftime(TIMESTAMP_FORMAT)
+        )
+    yield "</trkseg></trk>\n</gpx>\n"
+
+
+STREAMS = {
+    "ndjson": ndjson_stream,
+    "geojson": geojson_stream,
+    "gpx": gpx_stream
+}
+
+
+# Taškų srautas, ribojamas limit taškų. page_state["full"] nustatomas, kai puslapis
+# užpildytas ir gali būti tęsiamas nuo paskutinio taško laiko (after).
+def limited(points, limit, page_state):
+    if limit is None:
+        yield from points
+        return
+    count = 0
+    for point in points:
+        yield point
+        count += 1
+        if count >= limit:
+            page_state["full"] = True
+            return
+
+
+def export_stream(export_format, journey_id, points, limit=None):
+    page_state = {}
+    return STREAMS[export_format](journey_id, limited(points, limit, page_state), page_state)
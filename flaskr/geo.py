@@ -0,0 +1,213 @@
+import math
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from distance import EARTH_RADIUS_KM
+from indexes import VEHICLE_POSITION_INDEXES, ensure_indexes
+
+EARTH_RADIUS_M = EARTH_RADIUS_KM * 1000
+# Didžiausias paieškos spindulys metrais ir daugiakampio viršūnių skaičius
+MAX_RADIUS_M = 1000000
+MAX_POLYGON_VERTICES = 500
+# Apskritimą gaubiančio daugiakampio kraštinių skaičius (kibirų paieškai)
+CIRCLE_SIDES = 32
+
+
+# Taško vieta GeoJSON formatu (2dsphere indeksui): ilguma, po to platuma
+def point_location(latitude, longitude):
+    return {"type": "Point", "coordinates": [longitude, latitude]}
+
+
+# Taškas, nutolęs distance metrų kryptimi bearing (radianais) nuo pradinio taško
+def destination(latitude, longitude, distance, bearing):
+    lat = math.radians(latitude)
+    angle = distance / EARTH_RADIUS_M
+    lat2 = math.asin(math.sin(lat) * math.cos(angle) + math.cos(lat) * math.sin(angle) * math.cos(bearing))
+    lon2 = math.radians(longitude) + math.atan2(
+        math.sin(bearing) * math.sin(angle) * math.cos(lat), math.cos(angle) - math.sin(lat) * math.sin(lat2)
+    )
+    return math.degrees(lat2), (math.degrees(lon2) + 540) % 360 - 180
+
+
+# Atstumas metrais tarp dviejų taškų haversino formule
+def distance_m(lat1, lon1, lat2, lon2):
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(min(1.0, a)))
+
+
+# Paieškos sritis: apskritimas aplink tašką (spindulys metrais)
+class Circle:
+    def __init__(self, latitude, longitude, radius):
+        self.latitude = latitude
+        self.longitude = longitude
+        self.radius = radius
+
+    def center(self):
+        return point_location(self.latitude, self.longitude)
+
+    # Sąlyga taškams (Point), esantiems srityje
+    def within(self):
+        return {"$geoWithin": {"$centerSphere": [[self.longitude, self.latitude], self.radius / EARTH_RADIUS_M]}}
+
+    # Apskritimą gaubiantis daugiakampis ($geoIntersects nepalaiko $centerSphere)
+    def geometry(self):
+        outer = self.radius / math.cos(math.pi / CIRCLE_SIDES)
+        ring = [
+            list(reversed(destination(self.latitude, self.longitude, outer, 2 * math.pi * i / CIRCLE_SIDES)))
+            for i in range(CIRCLE_SIDES)
+        ]
+        return {"type": "Polygon", "coordinates": [ring + [ring[0]]]}
+
+    def contains(self, latitude, longitude):
+        return distance_m(self.latitude, self.longitude, latitude, longitude) <= self.radius
+
+
+# Paieškos sritis: daugiakampis iš (platuma, ilguma) viršūnių
+class Polygon:
+    def __init__(self, vertices):
+        self.vertices = vertices
+
+    def geometry(self):
+        ring = [[longitude, latitude] for latitude, longitude in self.vertices]
+        return {"type": "Polygon", "coordinates": [ring + [ring[0]]]}
+
+    def within(self):
+        return {"$geoWithin": {"$geometry": self.geometry()}}
+
+    # Spindulio metodas plokštumoje: mažiems daugiakampiams sutampa su MongoDB sferiniu tikrinimu
+    def contains(self, latitude, longitude):
+        inside = False
+        previous = self.vertices[-1]
+        for current in self.vertices:
+            (lat1, lon1), (lat2, lon2) = previous, current
+            if (lat1 > latitude) != (lat2 > latitude):
+                if longitude < lon1 + (latitude - lat1) * (lon2 - lon1) / (lat2 - lat1):
+                    inside = not inside
+            previous = current
+        return inside
+
+
+def _coordinate(value, name, low, high):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Netinkamas {name} formatas!")
+    if not low <= number <= high:
+        raise ValueError("Koordinatės už leistinų ribų!")
+    return number
+
+
+# Paieškos sritis iš užklausos parametrų: lat, lon ir radius (metrais) arba
+# polygon=lat,lon;lat,lon;... (ne mažiau kaip 3 viršūnės, žiedas uždaromas automatiškai)
+def parse_area(args):
+    if args.get("polygon"):
+        vertices = []
+        for pair in args["polygon"].split(";"):
+            latitude, _, longitude = pair.partition(",")
+            vertices.append((_coordinate(latitude, "polygon", -90, 90), _coordinate(longitude, "polygon", -180, 180)))
+        if len(vertices) > 1 and vertices[0] == vertices[-1]:
+            vertices.pop()
+        if not 3 <= len(vertices) <= MAX_POLYGON_VERTICES:
+            raise ValueError(f"Daugiakampis turi turėti nuo 3 iki {MAX_POLYGON_VERTICES} viršūnių!")
+        return Polygon(vertices)
+
+    if args.get("lat") is None or args.get("lon") is None or args.get("radius") is None:
+        raise ValueError("Nurodykite lat, lon ir radius arba polygon!")
+    latitude = _coordinate(args["lat"], "lat", -90, 90)
+    longitude = _coordinate(args["lon"], "lon", -180, 180)
+    try:
+        radius = float(args["radius"])
+    except ValueError:
+        raise ValueError("Netinkamas radius formatas!")
+    if not 0 < radius <= MAX_RADIUS_M:
+        raise ValueError(f"radius turi būti tarp 0 ir {MAX_RADIUS_M} metrų!")
+    return Circle(latitude, longitude, radius)
+
+
+# Paskutinė žinoma kiekvienos transporto priemonės padėtis (vehicle_positions kolekcija,
+# po vieną dokumentą transporto priemonei), kad užklausai "kur dabar yra automobiliai"
+# nereikėtų peržiūrėti visų kelionių taškų
+class VehiclePositions:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def create_indexes(self):
+        ensure_indexes(self.collection, VEHICLE_POSITION_INDEXES)
+
+    # Kiekvienai transporto priemonei įrašomas vėliausias iš pateiktų taškų.
+    # Padėtis keičiama tik vėlesniu tašku: jei žinoma naujesnė, upsert baigiasi
+    # dubliuoto rakto klaida, kuri ignoruojama.
+    def record(self, points, vehicle_of):
+        latest = {}
+        for point in points:
+            vehicle_id = vehicle_of(point["journey_id"])
+            if vehicle_id is None:
+                continue
+            if vehicle_id not in latest or point["timestamp"] >= latest[vehicle_id]["timestamp"]:
+                latest[vehicle_id] = point
+        if not latest:
+            return
+
+        operations = [
+            UpdateOne(
+                {"_id": vehicle_id, "timestamp": {"$lt": point["timestamp"]}},
+                {"$set": {
+                    "journey_id": point["journey_id"],
+                    "timestamp": point["timestamp"],
+                    "location": point_location(point["latitude"], point["longitude"])
+                }},
+                upsert=True
+            )
+            for vehicle_id, point in latest.items()
+        ]
+        try:
+            self.collection.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            if e.details.get("writeConcernErrors") or any(
+                error.get("code") != 11000 for error in e.details.get("writeErrors", [])
+            ):
+                raise
+
+    # Transporto priemonių padėtys srityje (neprivalomai tik ne senesnės nei since).
+    # Apskritimo atveju rezultatai išrikiuoti pagal atstumą nuo centro (distance_m).
+    def find(self, area, since=None, limit=100):
+        query = {}
+        if since is not None:
+            query["timestamp"] = {"$gte": since}
+        if isinstance(area, Circle):
+            return list(self.collection.aggregate([
+                {"$geoNear": {
+                    "near": area.center(),
+                    "distanceField": "distance_m",
+                    "maxDistance": area.radius,
+                    "query": query,
+                    "spherical": True
+                }},
+                {"$limit": limit}
+            ]))
+        return list(self.within_cursor(area, since, limit))
+
+    # Padėtys srityje, naujausios pirmiau
+    def within_cursor(self, area, since=None, limit=100):
+        query = {"location": area.within()}
+        if since is not None:
+            query["timestamp"] = {"$gte": since}
+        return self.collection.find(query).sort("timestamp", -1).limit(limit)
+
+    # Padėtys atkuriamos iš kelionių paskutinių taškų (vienkartinis užpildymas)
+    def rebuild(self, journeys_collection):
+        latest = journeys_collection.aggregate([
+            {"$match": {"last_point": {"$ne": None}}},
+            {"$sort": {"last_point.timestamp": -1}},
+            {"$group": {"_id": "$vehicle_id", "journey_id": {"$first": "$_id"}, "point": {"$first": "$last_point"}}}
+        ], allowDiskUse=True)
+        points = []
+        vehicles = {}
+        for item in latest:
+            points.append(dict(item["point"], journey_id=item["journey_id"]))
+            vehicles[item["journey_id"]] = item["_id"]
+        self.record(points, vehicles.get)
+        return len(vehicles)
@@ -0,0 +1,185 @@
+import csv
+import json
+from itertools import islice
+
+from bson.objectid import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from validation import parse_client, parse_vehicle
+
+# Importo formatai pagal turinio tipą
+IMPORT_FORMATS = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson"
+}
+# Didžiausias atsakyme pateikiamų klaidų skaičius (skaitikliai skaičiuojami visiems įrašams)
+MAX_REPORTED_ERRORS = 1000
+DUPLICATE_KEY = 11000
+
+
+# Įrašai skaitomi srautu po vieną: grąžinamos poros (įrašas, klaida).
+# CSV pirmoje eilutėje - stulpelių pavadinimai, tušti laukai praleidžiami.
+def read_records(lines, import_format):
+    if import_format == "csv":
+        for row in csv.DictReader(lines):
+            yield {key.strip(): value.strip() for key, value in row.items() if key and value not in (None, "")}, None
+        return
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield None, "Netinkama JSON eilutė!"
+            continue
+        yield (record, None) if isinstance(record, dict) else (None, "Netinkamas įrašo formatas!")
+
+
+# Importo rezultatų suvestinė
+class ImportSummary:
+    def __init__(self):
+        self.received = 0
+        self.inserted = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.errors = []
+
+    def error(self, index, message):
+        self.invalid += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"index": index, "error": message})
+
+    def as_dict(self):
+        return {
+            "received": self.received,
+            "inserted": self.inserted,
+            "duplicates": self.duplicates,
+            "invalid": self.invalid,
+            "errors": sorted(self.errors, key=lambda item: item["index"])
+        }
+
+
+# Masinis klientų ir transporto priemonių importas. Įrašai validuojami tais pačiais
+# tikrinimais kaip API, o įrašomi dalimis po chunk_size vienu neišrikiuotu bulk_write:
+# upsert su $setOnInsert pagal unikalų el. paštą arba VIN, todėl jau esantys įrašai
+# nekeičiami ir pažymimi kaip pasikartojantys be atskiros find_one užklausos.
+class BulkImporter:
+    def __init__(self, clients_collection, vehicles_collection, chunk_size=1000, on_inserted=None):
+        self.clients_collection = clients_collection
+        self.vehicles_collection = vehicles_collection
+        self.chunk_size = chunk_size
+        # Kviečiama su kolekcijos pavadinimu ir naujų dokumentų ID (podėlių valymui)
+        self.on_inserted = on_inserted
+
+    @staticmethod
+    def _chunks(records, size):
+        records = enumerate(records)
+        while True:
+            chunk = list(islice(records, size))
+            if not chunk:
+                return
+            yield chunk
+
+    # Dalies įrašymas: upsert'ai, kurie rado esamą dokumentą arba atsitrenkė į
+    # unikalų indeksą (lygiagretus įrašymas), skaičiuojami kaip pasikartojantys
+    def _write(self, collection, operations, indexes, summary):
+        if not operations:
+            return
+        try:
+            result = collection.bulk_write(operations, ordered=False)
+            upserted = result.upserted_ids
+            summary.duplicates += result.matched_count
+        except BulkWriteError as e:
+            upserted = {item["index"]: item["_id"] for item in e.details.get("upserted", [])}
+            summary.duplicates += e.details.get("nMatched", 0)
+            for write_error in e.details.get("writeErrors", []):
+                if write_error.get("code") == DUPLICATE_KEY:
+                    summary.duplicates += 1
+                else:
+                    summary.error(indexes[write_error["index"]], write_error.get("errmsg"))
+        summary.inserted += len(upserted)
+        if upserted and self.on_inserted is not None:
+            self.on_inserted(collection.name, list(upserted.values()))
+
+    def import_clients(self, records):
+        summary = ImportSummary()
+        for chunk in self._chunks(records, self.chunk_size):
+            operations = []
+            indexes = []
+            for index, (record, error) in chunk:
+                summary.received += 1
+                if error is None:
+                    try:
+                        client = parse_client(record)
+                    except ValueError as e:
+                        error = str(e)
+                if error is not None:
+                    summary.error(index, error)
+                    continue
+                operations.append(UpdateOne({"email": client["email"]}, {"$setOnInsert": client}, upsert=True))
+                indexes.append(index)
+            self._write(self.clients_collection, operations, indexes, summary)
+        return summary
+
+    # Dalies klientų nuorodos (client_id arba client_email) patikrinamos dviem užklausomis:
+    # grąžinami klientų ID pagal el. paštą ir visų rastų klientų ID aibė
+    def _resolve_clients(self, chunk):
+        emails = set()
+        ids = set()
+        for _, (record, error) in chunk:
+            if error is not None:
+                continue
+            if isinstance(record.get("client_email"), str):
+                emails.add(record["client_email"])
+            elif ObjectId.is_valid(record.get("client_id")):
+                ids.add(ObjectId(record["client_id"]))
+
+        by_email = {}
+        if emails:
+            for client in self.clients_collection.find({"email": {"$in": list(emails)}}, {"email": 1}):
+                by_email[client["email"]] = client["_id"]
+        known = set(by_email.values())
+        if ids:
+            known.update(client["_id"] for client in self.clients_collection.find({"_id": {"$in": list(ids)}}, {"_id": 1}))
+        return by_email, known
+
+    def import_vehicles(self, records):
+        summary = ImportSummary()
+        for chunk in self._chunks(records, self.chunk_size):
+            by_email, known = self._resolve_clients(chunk)
+            operations = []
+            indexes = []
+            for index, (record, error) in chunk:
+                summary.received += 1
+                if error is None:
+                    try:
+                        vehicle = self._vehicle(record, by_email, known)
+                    except ValueError as e:
+                        error = str(e)
+                if error is not None:
+                    summary.error(index, error)
+                    continue
+                operations.append(UpdateOne({"vin": vehicle["vin"]}, {"$setOnInsert": vehicle}, upsert=True))
+                indexes.append(index)
+            self._write(self.vehicles_collection, operations, indexes, summary)
+        return summary
+
+    @staticmethod
+    def _vehicle(record, by_email, known):
+        record = dict(record)
+        if record.get("client_email"):
+            if record["client_email"] not in by_email:
+                raise ValueError("Klientas nerastas!")
+            record["client_id"] = str(by_email[record.pop("client_email")])
+        # CSV reikšmės yra tekstas: metai paverčiami skaičiumi
+        if isinstance(record.get("year"), str):
+            try:
+                record["year"] = int(record["year"])
+            except ValueError:
+                raise ValueError("Netinkamas metų formatas!")
+        vehicle = parse_vehicle(record)
+        if vehicle["client_id"] not in known:
+            raise ValueError("Klientas nerastas!")
+        return vehicle
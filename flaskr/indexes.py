@@ -0,0 +1,137 @@
+from pymongo import ASCENDING, DESCENDING, GEOSPHERE, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+
+# Kiek daugiau dokumentų nei grąžina užklausa gali peržiūrėti, kad indeksas būtų laikomas tinkamu
+MAX_EXAMINED_RATIO = 10
+
+# Mažiausias indeksų rinkinys: kiekvienas indeksas aptarnauja bent vieną užklausą (nurodyta
+# komentare). Kiekvienas indeksas atnaujinamas įrašant kiekvieną dokumentą, todėl indeksai,
+# kurių nenaudoja jokia užklausa, nekuriami. _id indeksą MongoDB sukuria pati, todėl jis
+# nedeklaruojamas; indeksas, kurio raktas yra kito indekso pradžia, taip pat nereikalingas.
+CLIENT_INDEXES = [
+    IndexModel([("email", ASCENDING)], unique=True),  # Registracija ir importas: el. pašto unikalumas
+    IndexModel(  # Paieška (GET /search)
+        [("first_name", TEXT), ("last_name", TEXT), ("email", TEXT)], default_language="english"
+    )
+]
+
+VEHICLE_INDEXES = [
+    IndexModel([("vin", ASCENDING)], unique=True),  # Registracija: VIN unikalumas
+    IndexModel([("client_id", ASCENDING), ("_id", ASCENDING)]),  # Kliento transporto priemonės (puslapiavimas pagal _id)
+    IndexModel(  # Paieška (GET /search)
+        [("model", TEXT), ("manufacturer", TEXT), ("license_plate", TEXT)], default_language="english"
+    ),
+    IndexModel([("search_keys", ASCENDING)])  # Pasiūlymai pagal numerio ir VIN pradžią
+]
+
+JOURNEY_INDEXES = [
+    # Transporto priemonės kelionės (puslapiavimas), atstumai pagal dienas
+    IndexModel([("vehicle_id", ASCENDING), ("start_time", DESCENDING), ("_id", DESCENDING)]),
+    # Transporto priemonės vykstančios kelionės (statistika): dalinis indeksas turi tik
+    # nebaigtas keliones, todėl užklausa be start_time ribų neperžiūri visos kelionių istorijos
+    IndexModel([("vehicle_id", ASCENDING)], partialFilterExpression={"is_completed": False}),
+    IndexModel([("client_id", ASCENDING), ("start_time", DESCENDING), ("_id", DESCENDING)]),  # Kliento kelionės (puslapiavimas)
+    IndexModel([("is_completed", ASCENDING)], partialFilterExpression={"is_completed": False}),  # Vykstančios kelionės (registrui)
+    IndexModel(  # Baigtos, dar nesuarchyvuotos kelionės (archyvavimui)
+        [("archived", ASCENDING), ("end_time", ASCENDING)], partialFilterExpression={"is_completed": True}
+    )
+]
+
+VEHICLE_POSITION_INDEXES = [
+    IndexModel([("location", GEOSPHERE)])  # Padėtis (paieška spinduliu ir srityje)
+]
+
+VEHICLE_STATS_DAILY_INDEXES = [
+    IndexModel([("vehicle_id", ASCENDING), ("day", ASCENDING)], unique=True)  # Viena suvestinė dienai, statistika pagal laikotarpį
+]
+
+# Kelionės taškai pagal laiką; unikalus, todėl pakartotinai atsiųstas taškas neįrašomas.
+# Taškai pagal kelionės ID ieškomi šiuo indeksu, atskiras journey_id indeksas nereikalingas.
+JOURNEY_POINT_INDEXES = [
+    IndexModel([("journey_id", ASCENDING), ("timestamp", ASCENDING)], unique=True),
+    IndexModel([("location", GEOSPHERE), ("timestamp", ASCENDING)])  # Taškai srityje pagal laiką
+]
+
+JOURNEY_POINT_BUCKET_INDEXES = [
+    IndexModel([("journey_id", ASCENDING), ("start", ASCENDING)]),  # Kelionės kibirai pagal laiką
+    IndexModel([("path", GEOSPHERE), ("start", ASCENDING)])  # Kibirai, kurių taškai kerta sritį
+]
+
+JOURNEY_ARCHIVE_INDEXES = [
+    IndexModel([("bounds", GEOSPHERE), ("start", ASCENDING)])  # Archyvai, kurių sritis kerta paieškos sritį
+]
+
+
+# Deklaruoti indeksai pagal kolekciją (taškų kolekcija - pagal pasirinktą saugojimo būdą)
+def declared_indexes(point_storage):
+    indexes = {
+        "clients": CLIENT_INDEXES,
+        "vehicles": VEHICLE_INDEXES,
+        "journeys": JOURNEY_INDEXES,
+        "vehicle_positions": VEHICLE_POSITION_INDEXES,
+        "vehicle_stats_daily": VEHICLE_STATS_DAILY_INDEXES,
+        "journey_archives": JOURNEY_ARCHIVE_INDEXES
+    }
+    if point_storage == "buckets":
+        indexes["journey_point_buckets"] = JOURNEY_POINT_BUCKET_INDEXES
+    else:
+        indexes["journey_points"] = JOURNEY_POINT_INDEXES
+    return indexes
+
+
+# Sukuriami kolekcijos indeksai. Anksčiau kitaip sukurtas indeksas tuo pačiu raktu ar vardu
+# (pvz., neunikalus (journey_id, timestamp)) pakeičiamas. Grąžinami esami nedeklaruoti
+# indeksai; jei drop_unused, jie pašalinami.
+def ensure_indexes(collection, models, drop_unused=False):
+    for model in models:
+        try:
+            collection.create_indexes([model])
+        except OperationFailure as e:
+            if e.code == 85:  # IndexOptionsConflict: tas pats raktas, kitos parinktys
+                collection.drop_index(list(model.document["key"].items()))
+            elif e.code == 86:  # IndexKeySpecsConflict: tas pats vardas, kitas raktas
+                collection.drop_index(model.document["name"])
+            else:
+                raise
+            collection.create_indexes([model])
+
+    unused = unused_indexes(collection, models)
+    if drop_unused:
+        for name in unused:
+            collection.drop_index(name)
+    return unused
+
+
+# Esami kolekcijos indeksai, kurių nėra tarp deklaruotų (išskyrus _id)
+def unused_indexes(collection, models):
+    declared = {model.document["name"] for model in models}
+    return [name for name in collection.index_information() if name != "_id_" and name not in declared]
+
+
+# Užklausos plano etapai (explain), pvz., IXSCAN, FETCH, COLLSCAN, TEXT_MATCH
+def plan_stages(plan):
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages += plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            stages += plan_stages(item)
+    return stages
+
+
+# Užklausos (neįvykdyto kursoriaus) laimėjusio plano etapai, peržiūrėtų ir grąžintų dokumentų
+# skaičius. Kursorius įvykdomas explain režimu su tuo pačiu filtru, rikiavimu ir limitu.
+def explain_query(cursor):
+    explain = cursor.explain()
+    stats = explain.get("executionStats", {})
+    stages = plan_stages(explain["queryPlanner"]["winningPlan"])
+    return stages, stats.get("totalDocsExamined", 0), stats.get("nReturned", 0)
+
+
+# Užklausa nenaudoja tinkamo indekso, jei peržiūri visą kolekciją (COLLSCAN) arba peržiūri
+# daugiau nei max_ratio kartų daugiau dokumentų, nei grąžina (indeksas nesiaurina filtro)
+def poor_plan(stages, examined, returned, max_ratio=MAX_EXAMINED_RATIO):
+    return "COLLSCAN" in stages or examined > max_ratio * max(returned, 1)
@@ -0,0 +1,190 @@
+from collections import OrderedDict
+from itertools import groupby
+from threading import Lock
+
+from pymongo.errors import BulkWriteError
+
+from distance import load_track, path_length
+
+
+# Taškų grandinės ilgis (km) haversino formule
+def chain_distance(points):
+    return path_length([point["latitude"] for point in points], [point["longitude"] for point in points])
+
+
+# Taško kopija, saugoma kelionės dokumente kaip paskutinis žinomas taškas
+def point_summary(point):
+    return {
+        "timestamp": point["timestamp"],
+        "latitude": point["latitude"],
+        "longitude": point["longitude"]
+    }
+
+
+# Tuščios kelionės suvestinės reikšmės, nustatomos pradedant kelionę.
+# Laiko ribos nenustatomos, nes $min su null reikšme jos niekada nepakeistų.
+def empty_journey_stats():
+    return {
+        "point_count": 0,
+        "total_distance": 0.0,
+        "last_point": None
+    }
+
+
+# Koordinačių įrašymas kartu su kelionės suvestinių (taškų skaičius, atstumas,
+# paskutinis taškas, laiko ribos) palaikymu. Suvestinės atnaujinamos atomiškai
+# su $inc/$set, todėl skaitant kelionę nebereikia pereiti per visus jos taškus.
+class PointIngestor:
+    def __init__(self, point_store, journeys_collection, max_retries=5):
+        self.point_store = point_store
+        self.journeys_collection = journeys_collection
+        self.max_retries = max_retries
+
+    # Taškai (ir kelių kelionių) įrašomi viena saugyklos operacija, po to kiekvienai kelionei
+    # vienu atnaujinimu pridedamos suvestinės. Jau įrašyti taškai (tas pats kelionės laikas)
+    # praleidžiami ir į suvestines neįtraukiami. Grąžinami įrašyti taškai.
+    def ingest(self, points):
+        if not points:
+            return []
+        try:
+            stored = self.point_store.insert(points)
+        except BulkWriteError:
+            # Dalis taškų galėjo būti įrašyta, todėl paliestų kelionių suvestinės perskaičiuojamos vėliau
+            journey_ids = list({point["journey_id"] for point in points})
+            self.journeys_collection.update_many({"_id": {"$in": journey_ids}}, {"$set": {"stats_stale": True}})
+            raise
+        self.update_stats(stored)
+        return stored
+
+    def update_stats(self, points):
+        key = lambda point: point["journey_id"]
+        for journey_id, journey_points in groupby(sorted(points, key=key), key=key):
+            self._update_journey_stats(journey_id, sorted(journey_points, key=lambda point: point["timestamp"]))
+
+    # Optimistinis atnaujinimas: suvestinė keičiama tik jei paskutinis taškas nepasikeitė
+    # nuo jo nuskaitymo, kitaip bandoma iš naujo (lygiagretūs įrašai tai pačiai kelionei)
+    def _update_journey_stats(self, journey_id, points):
+        for _ in range(self.max_retries):
+            journey = self.journeys_collection.find_one({"_id": journey_id}, {"last_point": 1})
+            if journey is None:
+                return
+            last_point = journey.get("last_point")
+
+            update = {
+                "$inc": {"point_count": len(points)},
+                "$min": {"first_timestamp": points[0]["timestamp"]},
+                "$max": {"last_timestamp": points[-1]["timestamp"]}
+            }
+
+            # Taškai, senesni už paskutinį žinomą, įsiterpia į jau suskaičiuotą maršrutą, todėl
+            # jų atstumas nepridedamas: kelionė pažymima perskaičiavimui, o suvestinė perskaičiuojama
+            # iš taškų prieš ją grąžinant ar baigiant kelionę (refresh)
+            if last_point is not None and points[0]["timestamp"] < last_point["timestamp"]:
+                update["$set"] = {"stats_stale": True}
+            else:
+                chain = points if last_point is None else [last_point] + points
+                update["$inc"]["total_distance"] = chain_distance(chain)
+
+            if last_point is None or points[-1]["timestamp"] >= last_point["timestamp"]:
+                update.setdefault("$set", {})["last_point"] = point_summary(points[-1])
+
+            result = self.journeys_collection.update_one({"_id": journey_id, "last_point": last_point}, update)
+            if result.matched_count:
+                return
+
+        # Nepavykus atnaujinti, suvestinė bus perskaičiuota iš taškų
+        self.journeys_collection.update_one({"_id": journey_id}, {"$set": {"stats_stale": True}})
+
+    # Kelionės suvestinė perskaičiuojama iš visų jos taškų, išrikiuotų pagal laiką. Kaip ir
+    # įrašant taškus, suvestinė keičiama tik jei lygiagretus įrašas nepakeitė paskutinio taško
+    # ir taškų skaičiaus nuo jų nuskaitymo (kitaip $inc būtų perrašytas); nepavykus kelionė
+    # lieka pažymėta perskaičiavimui.
+    def rebuild(self, journey_id):
+        for _ in range(self.max_retries):
+            journey = self.journeys_collection.find_one({"_id": journey_id}, {"last_point": 1, "point_count": 1})
+            stats, unset = self._recount(journey_id)
+            if journey is None:
+                return stats
+            result = self.journeys_collection.update_one(
+                {"_id": journey_id, "last_point": journey.get("last_point"), "point_count": journey.get("point_count")},
+                {"$set": stats, "$unset": unset}
+            )
+            if result.matched_count:
+                return stats
+
+        self.journeys_collection.update_one({"_id": journey_id}, {"$set": {"stats_stale": True}})
+        return stats
+
+    def _recount(self, journey_id):
+        track = load_track(self.point_store.iter_points(journey_id))
+        stats = empty_journey_stats()
+        stats["point_count"] = len(track)
+        stats["total_distance"] = path_length(track.latitudes, track.longitudes)
+
+        unset = {"stats_stale": ""}
+        if len(track):
+            stats["last_point"] = point_summary(track.last)
+            stats["first_timestamp"] = track.first["timestamp"]
+            stats["last_timestamp"] = track.last["timestamp"]
+        else:
+            unset.update({"first_timestamp": "", "last_timestamp": ""})
+        return stats, unset
+
+    # Pažymėtos perskaičiavimui (stats_stale) kelionės suvestinės perskaičiuojamos iš taškų.
+    # Kelionės dokumente atnaujinami tik jame esantys laukai (pvz., pagal projekciją).
+    def refresh(self, journey):
+        if journey.pop("stats_stale", False):
+            stats = self.rebuild(journey["_id"])
+            journey.update({key: value for key, value in stats.items() if key in journey})
+            return True
+        return False
+
+
+# Neseniai įrašytų taškų raktų langas vykstančioms kelionėms: pakartotinai atsiųsti taškai
+# (tas pats laikas) ir užklausos (tas pats Idempotency-Key) atpažįstami nesikreipiant į
+# duomenų bazę. Kelionei laikoma ne daugiau kaip size raktų, iš viso - max_journeys kelionių.
+# Kituose procesuose įrašytus pasikartojimus atmeta unikalus (journey_id, timestamp) indeksas.
+class RecentKeys:
+    def __init__(self, size=256, max_journeys=10000):
+        self.size = size
+        self.max_journeys = max_journeys
+        self._journeys = OrderedDict()
+        self._lock = Lock()
+
+    # Rakto reikšmė (pvz., ankstesnis atsakymas) arba None, jei raktas lange nežinomas
+    def get(self, journey_id, key):
+        with self._lock:
+            keys = self._journeys.get(journey_id)
+            return keys.get(key) if keys is not None else None
+
+    def seen(self, journey_id, key):
+        return self.get(journey_id, key) is not None
+
+    def add(self, journey_id, key, value=True):
+        if self.size <= 0:
+            return
+        with self._lock:
+            keys = self._journeys.get(journey_id)
+            if keys is None:
+                keys = self._journeys[journey_id] = OrderedDict()
+                if len(self._journeys) > self.max_journeys:
+                    self._journeys.popitem(last=False)
+            else:
+                self._journeys.move_to_end(journey_id)
+            keys[key] = value
+            keys.move_to_end(key)
+            if len(keys) > self.size:
+                keys.popitem(last=False)
+
+    # Įrašytų taškų laikai įtraukiami į jų kelionių langus
+    def remember(self, points):
+        for point in points:
+            self.add(point["journey_id"], point["timestamp"])
+
+    def forget(self, journey_id):
+        with self._lock:
+            self._journeys.pop(journey_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._journeys.clear()
@@ -0,0 +1,53 @@
+from datetime import date
+
+from bson.objectid import ObjectId
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+
+try:
+    import orjson
+except ImportError:  # orjson neprivalomas, naudojamas standartinis json
+    orjson = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# Reikšmės, kurių JSON nepalaiko: ObjectId - tekstu, laikas - HTTP datos formatu
+# (kaip Flask jsonify), NumPy skaičiai - Python skaičiais
+def encode_value(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, date):
+        return http_date(value)
+    if np is not None and isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Objektas {type(value).__name__} negali būti serializuotas į JSON")
+
+
+# JSON atsakymai su MongoDB tipais: dokumentai serializuojami tiesiogiai, be ObjectId
+# konvertavimo ir kopijavimo maršrutuose. Jei įdiegtas orjson (JSON_ENGINE=auto arba orjson),
+# naudojamas jis, kitaip - standartinis json. Abiem atvejais ne ASCII simboliai nekoduojami.
+class MongoJSONProvider(DefaultJSONProvider):
+    ensure_ascii = False
+    default = staticmethod(encode_value)
+    engine = "json"
+
+    def __init__(self, app):
+        super().__init__(app)
+        engine = app.config.get("JSON_ENGINE", "auto")
+        if engine == "orjson" and orjson is None:
+            raise RuntimeError("JSON_ENGINE=orjson, tačiau paketas orjson neįdiegtas")
+        if engine in ("auto", "orjson") and orjson is not None:
+            self.engine = "orjson"
+
+    def dumps(self, obj, **kwargs):
+        if self.engine != "orjson" or kwargs.get("indent") or kwargs.get("cls"):
+            return super().dumps(obj, **kwargs)
+        # Laikas perduodamas encode_value, kad formatas nepriklausytų nuo variklio
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if kwargs.get("sort_keys", self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=encode_value, option=option).decode("utf-8")
@@ -0,0 +1,231 @@
+import json
+import time
+from collections import defaultdict, deque
+from threading import Condition, Lock, Thread
+
+from pymongo.errors import PyMongoError
+
+from serializers import coordinates_record
+
+# Temos: visų transporto priemonių padėtys, vienos transporto priemonės padėtys, kelionės taškai
+VEHICLES_TOPIC = "vehicles"
+
+
+def vehicle_topic(vehicle_id):
+    return f"vehicle:{vehicle_id}"
+
+
+def journey_topic(journey_id):
+    return f"journey:{journey_id}"
+
+
+# Server-Sent Events įvykis (data - vienos eilutės JSON)
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+# Prenumeratoriaus eilė: ne daugiau kaip max_queue įvykių. Lėtam prenumeratoriui perpildžius
+# eilę seniausi įvykiai išmetami, o prenumeratorius apie praleistus įvykius informuojamas
+# įvykiu "lagged", todėl publikuojantis srautas niekada nelaukia prenumeratoriaus.
+class Subscription:
+    def __init__(self, topics, max_queue, on_dropped=None):
+        self.topics = tuple(topics)
+        self.max_queue = max_queue
+        self.on_dropped = on_dropped
+        # Pranešimas asinchroniniam prenumeratoriui (pvz., loop.call_soon_threadsafe), kviečiamas įdėjus įvykį
+        self.waker = None
+        self.dropped = 0
+        self.closed = False
+        self._events = deque()
+        self._lagged = 0
+        self._condition = Condition()
+
+    def put(self, frame):
+        with self._condition:
+            if self.closed:
+                return
+            if len(self._events) >= self.max_queue:
+                self._events.popleft()
+                self._lagged += 1
+                self.dropped += 1
+                if self.on_dropped is not None:
+                    self.on_dropped()
+            self._events.append(frame)
+            self._condition.notify()
+            waker = self.waker
+        if waker is not None:
+            waker()
+
+    def close(self):
+        with self._condition:
+            self.closed = True
+            self._condition.notify()
+            waker = self.waker
+        if waker is not None:
+            waker()
+
+    # Visi laukiantys įvykiai (tuščias sąrašas - nieko naujo, None - prenumerata uždaryta ir ištuštinta)
+    def drain(self):
+        with self._condition:
+            return self._take()
+
+    # Laukiama įvykių ne ilgiau kaip timeout sekundžių
+    def wait(self, timeout):
+        with self._condition:
+            self._condition.wait_for(lambda: self._events or self.closed, timeout)
+            return self._take()
+
+    def _take(self):
+        if not self._events and self.closed:
+            return None
+        frames = list(self._events)
+        self._events.clear()
+        if self._lagged:
+            frames.insert(0, sse_event("lagged", {"dropped": self._lagged}))
+            self._lagged = 0
+        return frames
+
+
+# Naujų kelionės taškų ir transporto priemonių padėčių tarpininkas viename procese (SSE
+# maršrutams). Įvykis užkoduojamas vieną kartą ir įdedamas į kiekvieno prenumeratoriaus eilę.
+# Keliuose procesuose įvykiai gaunami iš MongoDB change stream (watch), nes kitame procese
+# įrašyti taškai šio proceso tarpininko nepasiekia.
+class LiveBroker:
+    def __init__(self, max_queue=256, on_dropped=None):
+        self.max_queue = max_queue
+        self.on_dropped = on_dropped
+        self._subscriptions = defaultdict(set)
+        self._lock = Lock()
+        self._thread = None
+
+    def subscribe(self, topics):
+        subscription = Subscription(topics, self.max_queue, self.on_dropped)
+        with self._lock:
+            for topic in subscription.topics:
+                self._subscriptions[topic].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscription.close()
+        with self._lock:
+            for topic in subscription.topics:
+                subscribers = self._subscriptions.get(topic)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscriptions[topic]
+
+    def __len__(self):
+        with self._lock:
+            return len({subscription for subscribers in self._subscriptions.values() for subscription in subscribers})
+
+    def _subscribers(self, topic):
+        with self._lock:
+            return list(self._subscriptions.get(topic, ()))
+
+    def publish(self, topic, frame):
+        for subscription in self._subscribers(topic):
+            subscription.put(frame)
+
+    # Įrašyti taškai: kiekvienas taškas - kelionės prenumeratoriams, vėliausias transporto
+    # priemonės taškas - padėčių prenumeratoriams. Be prenumeratorių įvykiai nekuriami.
+    def publish_points(self, points, vehicle_of):
+        with self._lock:
+            if not self._subscriptions:
+                return
+            topics = set(self._subscriptions)
+        latest = {}
+        for point in points:
+            if journey_topic(point["journey_id"]) in topics:
+                self.publish(journey_topic(point["journey_id"]), sse_event("point", coordinates_record(point["journey_id"], point)))
+            vehicle_id = vehicle_of(point["journey_id"])
+            if vehicle_id is not None and (vehicle_id not in latest or point["timestamp"] >= latest[vehicle_id]["timestamp"]):
+                latest[vehicle_id] = point
+        for vehicle_id, point in latest.items():
+            if VEHICLES_TOPIC not in topics and vehicle_topic(vehicle_id) not in topics:
+                continue
+            frame = sse_event("position", dict(coordinates_record(point["journey_id"], point), vehicle_id=str(vehicle_id)))
+            self.publish(VEHICLES_TOPIC, frame)
+            self.publish(vehicle_topic(vehicle_id), frame)
+
+    # Baigta kelionė: prenumeratoriams išsiunčiamas įvykis "end" ir prenumeratos uždaromos
+    def publish_end(self, journey_id):
+        topic = journey_topic(journey_id)
+        frame = sse_event("end", {"journey_id": str(journey_id)})
+        for subscription in self._subscribers(topic):
+            subscription.put(frame)
+            self.unsubscribe(subscription)
+
+    # Uždaromos visos prenumeratos (pvz., išvalius duomenų bazę)
+    def close_all(self):
+        with self._lock:
+            subscriptions = {subscription for subscribers in self._subscriptions.values() for subscription in subscribers}
+        for subscription in subscriptions:
+            self.unsubscribe(subscription)
+
+    # SSE atsakymo turinys: įvykiai, o be jų kas heartbeat sekundžių komentaras, kad
+    # tarpiniai serveriai nenutrauktų ryšio. Baigiama uždarius prenumeratą.
+    def stream(self, subscription, heartbeat):
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                frames = subscription.wait(heartbeat)
+                if frames is None:
+                    return
+                if not frames:
+                    yield ": keepalive\n\n"
+                for frame in frames:
+                    yield frame
+        finally:
+            self.unsubscribe(subscription)
+
+    # Įvykiai iš MongoDB change stream (reikalingas replica set): transporto priemonių
+    # padėčių pakeitimai (vėliausias kiekvieno įrašymo taškas) ir baigtos kelionės
+    def watch(self, db, positions_collection, journeys_collection, stop_signal):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = Thread(
+            target=self._watch, args=(db, positions_collection, journeys_collection, stop_signal),
+            name="live-watch", daemon=True
+        )
+        self._thread.start()
+
+    def _watch(self, db, positions_collection, journeys_collection, stop_signal):
+        pipeline = [{"$match": {"$or": [
+            {"ns.coll": positions_collection, "operationType": {"$in": ["insert", "update", "replace"]}},
+            {"ns.coll": journeys_collection, "operationType": "update",
+             "updateDescription.updatedFields.is_completed": True},
+            {"operationType": {"$in": ["drop", "dropDatabase"]}}
+        ]}}]
+        resume_token = None
+        while not stop_signal.is_set():
+            try:
+                with db.watch(pipeline, full_document="updateLookup",
+                              resume_after=resume_token, max_await_time_ms=1000) as stream:
+                    while not stop_signal.is_set():
+                        change = stream.try_next()
+                        if change is None:
+                            continue
+                        resume_token = stream.resume_token
+                        self._apply_change(change, journeys_collection)
+            except PyMongoError as e:
+                print(f"Realaus laiko įvykių srauto klaida: {str(e)}")
+                resume_token = None
+                time.sleep(1)
+
+    def _apply_change(self, change, journeys_collection):
+        operation = change["operationType"]
+        if operation in ("drop", "dropDatabase"):
+            self.close_all()
+        elif change["ns"]["coll"] == journeys_collection:
+            self.publish_end(change["documentKey"]["_id"])
+        elif change.get("fullDocument") is not None:
+            position = change["fullDocument"]
+            longitude, latitude = position["location"]["coordinates"]
+            point = {
+                "journey_id": position["journey_id"],
+                "timestamp": position["timestamp"],
+                "latitude": latitude,
+                "longitude": longitude
+            }
+            self.publish_points([point], lambda journey_id: position["_id"])
@@ -0,0 +1,238 @@
+import re
+import sys
+import time
+from bisect import bisect_left
+from threading import Lock
+
+from bson import json_util
+from flask import g, request
+from pymongo import monitoring
+
+# Vėlinimo histogramų ribos sekundėmis
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = Lock()
+
+    def inc(self, amount=1, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            yield self.name, _labels(self.label_names, labels), value
+
+
+# Matuoklis, kurio reikšmė nuskaitoma metrikų užklausos metu (pvz. eilės dydis)
+class Gauge:
+    kind = "gauge"
+
+    def __init__(self, name, help_text, read):
+        self.name = name
+        self.help = help_text
+        self.read = read
+
+    def samples(self):
+        yield self.name, "", self.read()
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self.buckets = tuple(buckets)
+        # Žymėms: [skaičiai pagal ribą (+Inf paskutinis), suma, kiekis]
+        self._series = {}
+        self._lock = Lock()
+
+    def observe(self, seconds, *labels):
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += seconds
+            series[2] += 1
+
+    def samples(self):
+        with self._lock:
+            series = {labels: (list(counts), total, count) for labels, (counts, total, count) in self._series.items()}
+        for labels, (counts, total, count) in sorted(series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                yield self.name + "_bucket", _labels(self.label_names, labels, ("le", _number(bound))), cumulative
+            yield self.name + "_sum", _labels(self.label_names, labels), total
+            yield self.name + "_count", _labels(self.label_names, labels), count
+
+
+# Metrikų rinkinys, pateikiamas Prometheus tekstiniu formatu
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    # Metrika tuo pačiu pavadinimu registruojama vieną kartą (pvz., kelioms Flask programoms procese)
+    def register(self, metric):
+        for registered in self._metrics:
+            if registered.name == metric.name:
+                return registered
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self.register(Counter(name, help_text, labels))
+
+    def gauge(self, name, help_text, read):
+        return self.register(Gauge(name, help_text, read))
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help_text, labels, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# Lėtų užklausų žurnalas: po vieną JSON įrašą eilutėje (į failą arba standartinę išvestį)
+class SlowQueryLog:
+    def __init__(self, threshold_ms, path=None):
+        self.threshold_ms = threshold_ms
+        self.path = path
+        self._lock = Lock()
+
+    def write(self, record):
+        line = json_util.dumps(record)
+        with self._lock:
+            if self.path is None:
+                print(line, file=sys.stderr)
+                return
+            with open(self.path, "a", encoding="utf-8") as log:
+                log.write(line + "\n")
+
+
+def _collection(event):
+    if event.command_name == "getMore":
+        return event.command.get("collection", "")
+    target = event.command.get(event.command_name)
+    return target if isinstance(target, str) else ""
+
+
+# MongoDB komandų trukmė pagal kolekciją ir komandą (pymongo CommandListener).
+# Įjungus lėtų užklausų žurnalą, ilgiau nei slow_log.threshold_ms trukusios komandos
+# įrašomos kartu su agregavimo pipeline arba užklausos filtru.
+class CommandMetrics(monitoring.CommandListener):
+    def __init__(self, registry, slow_log=None):
+        self.duration = registry.histogram(
+            "mongo_command_duration_seconds", "MongoDB komandų trukmė", ("collection", "command")
+        )
+        self.failures = registry.counter(
+            "mongo_command_failures_total", "Nepavykusios MongoDB komandos", ("collection", "command")
+        )
+        self.slow_log = slow_log
+        self._started = {}
+        self._lock = Lock()
+
+    def started(self, event):
+        details = None
+        if self.slow_log is not None:
+            command = event.command
+            details = {key: command[key] for key in ("pipeline", "filter", "sort", "updates", "q") if key in command}
+        with self._lock:
+            self._started[(event.connection_id, event.request_id)] = (_collection(event), details)
+
+    def _finish(self, event):
+        with self._lock:
+            collection, details = self._started.pop((event.connection_id, event.request_id), ("", None))
+        seconds = event.duration_micros / 1e6
+        self.duration.observe(seconds, collection, event.command_name)
+        if self.slow_log is not None and seconds * 1000 >= self.slow_log.threshold_ms:
+            self.slow_log.write({
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "database": event.database_name,
+                "collection": collection,
+                "command": event.command_name,
+                "duration_ms": round(seconds * 1000, 3),
+                **(details or {})
+            })
+        return collection
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        collection = self._finish(event)
+        self.failures.inc(1, collection, event.command_name)
+
+
+# Flask maršrutas tuo pačiu formatu kaip ASGI programoje: /journeys/{journey_id}
+def route_template(rule):
+    return re.sub(r"<(?:[^:<>]+:)?([^<>]+)>", r"{\1}", rule)
+
+
+# Flask užklausų trukmė pagal maršrutą ir JSON serializavimo trukmė
+def instrument_flask(app, registry):
+    request_duration = registry.histogram(
+        "http_request_duration_seconds", "HTTP užklausų trukmė", ("method", "route", "status")
+    )
+    json_duration = registry.histogram("json_encode_duration_seconds", "JSON atsakymų serializavimo trukmė")
+
+    @app.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_duration(response):
+        started = g.pop("request_started", None)
+        if started is not None:
+            route = route_template(request.url_rule.rule) if request.url_rule is not None else "unmatched"
+            request_duration.observe(time.perf_counter() - started, request.method, route, str(response.status_code))
+        return response
+
+    provider = app.json
+    dumps = provider.dumps
+
+    def timed_dumps(obj, **kwargs):
+        started = time.perf_counter()
+        try:
+            return dumps(obj, **kwargs)
+        finally:
+            json_duration.observe(time.perf_counter() - started)
+
+    provider.dumps = timed_dumps
+    return request_duration
@@ -0,0 +1,81 @@
+import base64
+
+from bson import json_util
+
+# Įrašų skaičius viename sąrašo puslapyje (numatytasis ir didžiausias)
+DEFAULT_PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 500
+# Laikas žymeklyje grąžinamas be laiko juostos, kaip ir saugomas duomenų bazėje
+CURSOR_JSON_OPTIONS = json_util.JSONOptions(tz_aware=False)
+
+
+# Puslapio žymeklis: paskutinio grąžinto įrašo rikiavimo laukų reikšmės (base64 JSON)
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json_util.dumps(values).encode()).decode().rstrip("=")
+
+
+def decode_cursor(value, size):
+    try:
+        values = json_util.loads(
+            base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)), json_options=CURSOR_JSON_OPTIONS
+        )
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise ValueError("Netinkamas cursor!")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Netinkamas cursor!")
+    return values
+
+
+def parse_limit(value, default=DEFAULT_PAGE_LIMIT, maximum=MAX_PAGE_LIMIT):
+    if value is None or value == "":
+        return default
+    try:
+        limit = int(value)
+    except ValueError:
+        limit = 0
+    if not 0 < limit <= maximum:
+        raise ValueError(f"limit turi būti tarp 1 ir {maximum}!")
+    return limit
+
+
+# Grąžinamų laukų projekcija (?fields=a,b): leidžiami tik allowed laukai,
+# rikiavimo laukai įtraukiami visada, nes iš jų sudaromas kito puslapio žymeklis
+def parse_fields(value, allowed, required=()):
+    fields = [field.strip() for field in value.split(",") if field.strip()] if value else list(allowed)
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ValueError(f"Nežinomi laukai: {', '.join(unknown)}. Galimi: {', '.join(allowed)}")
+    return {field: 1 for field in list(required) + fields}
+
+
+# Puslapiavimas pagal raktą (keyset): vietoje skip kitas puslapis pradedamas po paskutinio
+# grąžinto įrašo rikiavimo reikšmių, todėl užklausa naudoja indekso ribas ir jos kaina
+# nepriklauso nuo puslapio numerio. sort - [(laukas, 1 | -1), ...], paskutinis laukas unikalus.
+class KeysetPage:
+    def __init__(self, sort, limit, cursor=None):
+        self.sort = sort
+        self.limit = limit
+        self.after = decode_cursor(cursor, len(sort)) if cursor else None
+
+    # Pradinė užklausa papildoma sąlyga "po žymeklio":
+    # (a < x) arba (a = x ir b < y) ... pagal kiekvieno lauko rikiavimo kryptį
+    def query(self, base):
+        if self.after is None:
+            return base
+        branches = []
+        for index, (field, direction) in enumerate(self.sort):
+            branch = {name: value for (name, _), value in zip(self.sort[:index], self.after)}
+            branch[field] = {"$gt" if direction > 0 else "$lt": self.after[index]}
+            branches.append(branch)
+        return {"$and": [base, {"$or": branches}]}
+
+    # Užklausos kursorius (limit + 1 įrašas, kad būtų žinoma, ar yra kitas puslapis)
+    def find(self, collection, base, projection):
+        return collection.find(self.query(base), projection).sort(self.sort).limit(self.limit + 1)
+
+    # Puslapio įrašai ir kito puslapio žymeklis (None, jei tai paskutinis puslapis)
+    def result(self, items):
+        page = items[:self.limit]
+        if len(items) <= self.limit:
+            return page, None
+        return page, encode_cursor([page[-1].get(field) for field, _ in self.sort])
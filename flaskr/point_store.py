@@ -0,0 +1,314 @@
+import heapq
+from datetime import timedelta
+from itertools import groupby
+
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from geo import point_location
+from indexes import JOURNEY_POINT_INDEXES, JOURNEY_POINT_BUCKET_INDEXES, ensure_indexes
+
+
+# Kelionės taškų saugykla: kiekvienas taškas atskirame journey_points dokumente
+class DocumentPointStore:
+    name = "documents"
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def create_indexes(self):
+        # Anksčiau sukurtas neunikalus (journey_id, timestamp) indeksas pakeičiamas unikaliu
+        # (pasikartojančius taškus prieš tai pašalina komanda dedupe-points)
+        ensure_indexes(self.collection, JOURNEY_POINT_INDEXES)
+
+    # Kiekvienam taškui pridedama GeoJSON vieta (location) 2dsphere indeksui.
+    # Jau įrašyti taškai atmetami unikaliu indeksu; grąžinami įrašyti taškai.
+    def insert(self, points):
+        if not points:
+            return []
+        try:
+            self.collection.insert_many(
+                [dict(point, location=point_location(point["latitude"], point["longitude"])) for point in points],
+                ordered=False
+            )
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            duplicates = {error["index"] for error in errors if error.get("code") == 11000}
+            if e.details.get("writeConcernErrors") or len(duplicates) < len(errors):
+                raise
+            return [point for index, point in enumerate(points) if index not in duplicates]
+        return points
+
+    # Kelionės taškai išrikiuoti pagal laiką (neprivalomai tik vėlesni nei after)
+    def points_cursor(self, journey_id, after=None):
+        query = {"journey_id": journey_id}
+        if after is not None:
+            query["timestamp"] = {"$gt": after}
+        return self.collection.find(
+            query, {"_id": 0, "timestamp": 1, "latitude": 1, "longitude": 1}
+        ).sort("timestamp", ASCENDING)
+
+    def iter_points(self, journey_id, after=None):
+        for point in self.points_cursor(journey_id, after):
+            yield point
+
+    # Taškai srityje laikotarpyje [since, until)
+    def area_cursor(self, area, since=None, until=None):
+        return self.collection.find(self._area_query(area, since, until))
+
+    @staticmethod
+    def _area_query(area, since, until):
+        query = {"location": area.within()}
+        if since is not None or until is not None:
+            query["timestamp"] = {}
+            if since is not None:
+                query["timestamp"]["$gte"] = since
+            if until is not None:
+                query["timestamp"]["$lt"] = until
+        return query
+
+    # Kelionės, kurių taškai pateko į sritį laikotarpyje [since, until): kiekvienai
+    # kelionei pirmas ir paskutinis taško srityje laikas bei taškų skaičius
+    def journeys_in_area(self, area, since=None, until=None, limit=100):
+        return list(self.collection.aggregate([
+            {"$match": self._area_query(area, since, until)},
+            {"$group": {
+                "_id": "$journey_id",
+                "first_timestamp": {"$min": "$timestamp"},
+                "last_timestamp": {"$max": "$timestamp"},
+                "point_count": {"$sum": 1}
+            }},
+            {"$sort": {"first_timestamp": 1}},
+            {"$limit": limit}
+        ], allowDiskUse=True))
+
+    # Vieta (location) pridedama anksčiau įrašytiems taškams
+    def backfill_locations(self):
+        return self.collection.update_many(
+            {"location": {"$exists": False}},
+            [{"$set": {"location": {"type": "Point", "coordinates": ["$longitude", "$latitude"]}}}]
+        ).modified_count
+
+    def delete(self, journey_id):
+        self.collection.delete_many({"journey_id": journey_id})
+
+    # Pasikartojantys taškai (ta pati kelionė ir laikas) pašalinami, paliekant vieną.
+    # Grąžinamas pašalintų taškų skaičius pagal kelionę.
+    def remove_duplicates(self):
+        removed = {}
+        cursor = self.collection.aggregate([
+            {"$group": {
+                "_id": {"journey_id": "$journey_id", "timestamp": "$timestamp"},
+                "ids": {"$push": "$_id"},
+                "count": {"$sum": 1}
+            }},
+            {"$match": {"count": {"$gt": 1}}}
+        ], allowDiskUse=True)
+        for group in cursor:
+            journey_id = group["_id"]["journey_id"]
+            self.collection.delete_many({"_id": {"$in": group["ids"][1:]}})
+            removed[journey_id] = removed.get(journey_id, 0) + len(group["ids"]) - 1
+        return removed
+
+
+# Kelionės taškų saugykla kibirais: viename dokumente iki max_points vienos kelionės
+# taškų, apimančių ne daugiau kaip max_span laiko, saugomų lygiagrečiais masyvais:
+# {journey_id, start, end, count, t: [...], lat: [...], lon: [...], path: MultiPoint}
+class BucketedPointStore:
+    name = "buckets"
+
+    def __init__(self, collection, max_points=200, max_span=timedelta(minutes=60)):
+        self.collection = collection
+        self.max_points = max_points
+        self.max_span = max_span
+
+    def create_indexes(self):
+        ensure_indexes(self.collection, JOURNEY_POINT_BUCKET_INDEXES)
+
+    # Išrikiuoti vienos kelionės taškai suskaidomi į dalis, telpančias į vieną kibirą
+    def _chunks(self, points):
+        chunk = []
+        for point in points:
+            if chunk and (len(chunk) >= self.max_points or point["timestamp"] - chunk[0]["timestamp"] > self.max_span):
+                yield chunk
+                chunk = []
+            chunk.append(point)
+        if chunk:
+            yield chunk
+
+    # Taškai, kurių laikas jau yra kelionės kibiruose, apimančiuose pateiktų taškų
+    # laikotarpį, arba pasikartoja tarp pateiktų, praleidžiami
+    def _new_points(self, journey_id, ordered):
+        first, last = ordered[0]["timestamp"], ordered[-1]["timestamp"]
+        known = set()
+        buckets = self.collection.find(
+            {"journey_id": journey_id, "start": {"$lte": last}, "end": {"$gte": first}}, {"_id": 0, "t": 1}
+        )
+        for bucket in buckets:
+            known.update(bucket["t"])
+        points = []
+        for point in ordered:
+            if point["timestamp"] not in known:
+                known.add(point["timestamp"])
+                points.append(point)
+        return points
+
+    # Kiekviena dalis pridedama prie atviro kelionės kibiro, kuriame dar yra vietos ir kurio
+    # intervalas kartu su dalies intervalu neviršija max_span (taip pat ir taškams, atėjusiems
+    # ne iš eilės), o jei tokio nėra - sukuriamas naujas kibiras.
+    # Grąžinami įrašyti taškai (be jau įrašytų). Kaip ir DocumentPointStore, BulkWriteError
+    # klaidų indeksai - pateiktų taškų pozicijos (nepavykusios operacijos visi taškai).
+    def insert(self, points):
+        if not points:
+            return []
+        positions = {id(point): index for index, point in enumerate(points)}
+        operations = []
+        chunks = []
+        stored = []
+        key = lambda point: point["journey_id"]
+        max_span_ms = self.max_span // timedelta(milliseconds=1)
+        for journey_id, journey_points in groupby(sorted(points, key=key), key=key):
+            ordered = self._new_points(journey_id, sorted(journey_points, key=lambda point: point["timestamp"]))
+            stored += ordered
+            for chunk in self._chunks(ordered):
+                chunks.append(chunk)
+                first, last = chunk[0]["timestamp"], chunk[-1]["timestamp"]
+                operations.append(UpdateOne(
+                    {
+                        "journey_id": journey_id,
+                        "count": {"$lte": self.max_points - len(chunk)},
+                        "start": {"$gte": last - self.max_span},
+                        # Kibiro ir dalies sujungtas intervalas neilgesnis nei max_span
+                        "$expr": {"$lte": [
+                            {"$subtract": [{"$max": ["$end", last]}, {"$min": ["$start", first]}]}, max_span_ms
+                        ]}
+                    },
+                    {
+                        "$push": {
+                            "t": {"$each": [point["timestamp"] for point in chunk]},
+                            "lat": {"$each": [point["latitude"] for point in chunk]},
+                            "lon": {"$each": [point["longitude"] for point in chunk]},
+                            "path.coordinates": {"$each": [[point["longitude"], point["latitude"]] for point in chunk]}
+                        },
+                        "$setOnInsert": {"path.type": "MultiPoint"},
+                        "$inc": {"count": len(chunk)},
+                        "$min": {"start": first},
+                        "$max": {"end": last}
+                    },
+                    upsert=True
+                ))
+        if operations:
+            try:
+                self.collection.bulk_write(operations, ordered=False)
+            except BulkWriteError as e:
+                errors = [
+                    dict(error, index=positions[id(point)])
+                    for error in e.details.get("writeErrors", []) for point in chunks[error["index"]]
+                ]
+                raise BulkWriteError(dict(e.details, writeErrors=errors))
+        return stored
+
+    # Kelionės kibirai pagal pradžios laiką (neprivalomai tik turintys vėlesnių nei after taškų)
+    def points_cursor(self, journey_id, after=None):
+        query = {"journey_id": journey_id}
+        if after is not None:
+            query["end"] = {"$gt": after}
+        return self.collection.find(query, {"_id": 0, "start": 1, "t": 1, "lat": 1, "lon": 1}).sort("start", ASCENDING)
+
+    # Jei taškai atėjo ne iš eilės, kibirų intervalai gali persidengti, todėl taškai
+    # išleidžiami tik tada, kai joks vėlesnis kibiras (prasidedantis ne anksčiau nei
+    # dabartinis) nebegali turėti ankstesnio taško.
+    def iter_points(self, journey_id, after=None):
+        pending = []
+        for bucket in self.points_cursor(journey_id, after):
+            while pending and pending[0][0] < bucket["start"]:
+                yield self._point(heapq.heappop(pending))
+            for item in zip(bucket["t"], bucket["lat"], bucket["lon"]):
+                if after is None or item[0] > after:
+                    heapq.heappush(pending, item)
+        while pending:
+            yield self._point(heapq.heappop(pending))
+
+    @staticmethod
+    def _point(item):
+        return {"timestamp": item[0], "latitude": item[1], "longitude": item[2]}
+
+    # Kibirai atrenkami pagal 2dsphere indeksą (bent vienas taškas srityje) ir laiko intervalą
+    def area_cursor(self, area, since=None, until=None):
+        query = {"path": {"$geoIntersects": {"$geometry": area.geometry()}}}
+        if since is not None:
+            query["end"] = {"$gte": since}
+        if until is not None:
+            query["start"] = {"$lt": until}
+        return self.collection.find(query, {"_id": 0, "journey_id": 1, "t": 1, "lat": 1, "lon": 1})
+
+    # Atrinktų kibirų taškai srityje ir laikotarpyje tikrinami atskirai
+    def journeys_in_area(self, area, since=None, until=None, limit=100):
+        journeys = {}
+        for bucket in self.area_cursor(area, since, until):
+            for timestamp, latitude, longitude in zip(bucket["t"], bucket["lat"], bucket["lon"]):
+                if (since is not None and timestamp < since) or (until is not None and timestamp >= until):
+                    continue
+                if not area.contains(latitude, longitude):
+                    continue
+                journey = journeys.setdefault(bucket["journey_id"], {
+                    "_id": bucket["journey_id"], "first_timestamp": timestamp, "last_timestamp": timestamp, "point_count": 0
+                })
+                journey["first_timestamp"] = min(journey["first_timestamp"], timestamp)
+                journey["last_timestamp"] = max(journey["last_timestamp"], timestamp)
+                journey["point_count"] += 1
+        return sorted(journeys.values(), key=lambda journey: journey["first_timestamp"])[:limit]
+
+    # Taškų vietos (path) pridedamos anksčiau įrašytiems kibirams
+    def backfill_locations(self):
+        return self.collection.update_many(
+            {"path": {"$exists": False}},
+            [{"$set": {"path": {"type": "MultiPoint", "coordinates": {"$zip": {"inputs": ["$lon", "$lat"]}}}}}]
+        ).modified_count
+
+    def delete(self, journey_id):
+        self.collection.delete_many({"journey_id": journey_id})
+
+    # Kelionės, kurių kibiruose pasikartoja taškų laikai, perrašomos iš naujo be pasikartojimų.
+    # Grąžinamas pašalintų taškų skaičius pagal kelionę.
+    def remove_duplicates(self):
+        removed = {}
+        for journey_id in self.collection.distinct("journey_id"):
+            points = list(self.iter_points(journey_id))
+            unique = [point for index, point in enumerate(points)
+                      if index == 0 or point["timestamp"] != points[index - 1]["timestamp"]]
+            if len(unique) < len(points):
+                self.delete(journey_id)
+                self.insert([dict(point, journey_id=journey_id) for point in unique])
+                removed[journey_id] = len(points) - len(unique)
+        return removed
+
+
+# Saugyklos pasirinkimas pagal konfigūraciją (POINT_STORAGE = documents | buckets)
+def make_point_store(db, config):
+    if config["POINT_STORAGE"] == BucketedPointStore.name:
+        return BucketedPointStore(
+            db["journey_point_buckets"],
+            max_points=config["POINT_BUCKET_MAX_POINTS"],
+            max_span=timedelta(minutes=config["POINT_BUCKET_MAX_MINUTES"])
+        )
+    if config["POINT_STORAGE"] == DocumentPointStore.name:
+        return DocumentPointStore(db["journey_points"])
+    raise ValueError(f"Nežinomas taškų saugojimo būdas: {config['POINT_STORAGE']}")
+
+
+# Vienos kelionės taškų perkėlimas iš vienos saugyklos į kitą dalimis po batch_size taškų
+def migrate_journey(source, target, journey_id, batch_size=5000):
+    moved = 0
+    batch = []
+    for point in source.iter_points(journey_id):
+        batch.append(dict(point, journey_id=journey_id))
+        if len(batch) >= batch_size:
+            target.insert(batch)
+            moved += len(batch)
+            batch = []
+    if batch:
+        target.insert(batch)
+        moved += len(batch)
+    source.delete(journey_id)
+    return moved
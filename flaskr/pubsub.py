@@ -0,0 +1,26 @@
+from collections import defaultdict
+from threading import Lock
+
+
+# Pranešimų tarpininkas viename procese (bendros pub/sub sistemos pakaitalas).
+# Prenumeratoriai kviečiami sinchroniškai publikuojančiame sraute.
+class LocalPubSub:
+    def __init__(self):
+        self._subscribers = defaultdict(list)
+        self._lock = Lock()
+
+    def subscribe(self, topic, callback):
+        with self._lock:
+            self._subscribers[topic].append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                if callback in self._subscribers[topic]:
+                    self._subscribers[topic].remove(callback)
+        return unsubscribe
+
+    def publish(self, topic, message):
+        with self._lock:
+            callbacks = list(self._subscribers[topic])
+        for callback in callbacks:
+            callback(message)
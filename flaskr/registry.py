@@ -0,0 +1,188 @@
+import time
+from threading import Lock, Thread
+
+from pymongo.errors import PyMongoError
+
+# Daugiausia įsimenamų nerastų kelionių
+MAX_MISSING = 10000
+
+
+# Vykstančių kelionių registras atmintyje. Užkraunamas paleidžiant programą iš
+# journeys kolekcijos (pagal is_completed indeksą) ir atnaujinamas pradedant bei
+# baigiant keliones, todėl koordinačių registravimui nereikia skaityti kelionės
+# dokumento. Keli procesai sinchronizuojami per pub/sub arba MongoDB change stream.
+# Be sinchronizavimo (keli darbininkai) kitame procese pradėta kelionė, kurios registre nėra,
+# skaitoma iš duomenų bazės, o įrašai tikrinami iš naujo kas recheck_seconds sekundžių,
+# todėl kitame procese baigta kelionė nustoja priimti taškus ne vėliau kaip po tiek laiko.
+# Nerasta kelionė tiek pat laiko įsimenama kaip nerasta. Kai procesai sinchronizuojami
+# (recheck_seconds nenurodytas), užkrautas registras laikomas pilnu ir duomenų bazė neskaitoma.
+class ActiveJourneyRegistry:
+    topic = "journeys"
+
+    def __init__(self, journeys_collection, pubsub=None, recheck_seconds=None):
+        self.journeys_collection = journeys_collection
+        self.pubsub = pubsub
+        self.recheck_seconds = recheck_seconds
+        self._journeys = {}
+        # Kada įrašas paskutinį kartą patikrintas duomenų bazėje (time.monotonic)
+        self._checked = {}
+        # Duomenų bazėje nerastos kelionės (journey_id -> time.monotonic)
+        self._missing = {}
+        self._loaded = False
+        # Didinamas šalinant įrašus: lygiagrečiai perskaitytas dokumentas neįrašomas atgal
+        self._generation = 0
+        self._lock = Lock()
+        self._thread = None
+        if pubsub is not None:
+            pubsub.subscribe(self.topic, self._apply)
+
+    @staticmethod
+    def _entry(journey):
+        return {"_id": journey["_id"], "vehicle_id": journey.get("vehicle_id"), "interval": journey.get("interval")}
+
+    # Visų vykstančių kelionių kursorius
+    def open_cursor(self):
+        return self.journeys_collection.find({"is_completed": False}, {"vehicle_id": 1, "interval": 1})
+
+    def load(self):
+        journeys = {}
+        for journey in self.open_cursor():
+            journeys[journey["_id"]] = self._entry(journey)
+        now = time.monotonic()
+        with self._lock:
+            self._journeys = journeys
+            self._checked = dict.fromkeys(journeys, now)
+            self._missing.clear()
+            self._loaded = True
+            self._generation += 1
+        return len(journeys)
+
+    # Registro įrašas be kreipimosi į duomenų bazę (None, jei jo nėra arba jį reikia patikrinti)
+    def cached(self, journey_id):
+        with self._lock:
+            entry = self._journeys.get(journey_id)
+            if entry is not None and (
+                self.recheck_seconds is None or time.monotonic() - self._checked[journey_id] < self.recheck_seconds
+            ):
+                return entry
+            return None
+
+    # Ar kelionė neseniai nerasta duomenų bazėje (tada jos nereikia skaityti iš naujo)
+    def _known_missing(self, journey_id):
+        checked = self._missing.get(journey_id)
+        return checked is not None and time.monotonic() - checked < self.recheck_seconds
+
+    # Nerasta kelionė įsimenama; pasenę įrašai išmetami, kad nežinomi ID neaugintų atminties
+    def _remember_missing(self, journey_id):
+        now = time.monotonic()
+        if len(self._missing) >= MAX_MISSING:
+            self._missing = {key: checked for key, checked in self._missing.items() if now - checked < self.recheck_seconds}
+            if len(self._missing) >= MAX_MISSING:
+                self._missing.clear()
+        self._missing[journey_id] = now
+
+    # Vykstančios kelionės įrašas arba None, jei kelionė nerasta ar jau baigta. Registre
+    # nerasta (arba seniai tikrinta) kelionė skaitoma iš duomenų bazės ir įsimenama.
+    def get(self, journey_id):
+        entry = self.cached(journey_id)
+        if entry is not None:
+            return entry
+        with self._lock:
+            if self.recheck_seconds is None and self._loaded:
+                return None
+            if self.recheck_seconds is not None and self._known_missing(journey_id):
+                return None
+            generation = self._generation
+        journey = self.journeys_collection.find_one({"_id": journey_id, "is_completed": False}, {"vehicle_id": 1, "interval": 1})
+        with self._lock:
+            if journey is None:
+                self._journeys.pop(journey_id, None)
+                self._checked.pop(journey_id, None)
+                if self.recheck_seconds is not None:
+                    self._remember_missing(journey_id)
+                return None
+            entry = self._entry(journey)
+            if generation == self._generation:
+                self._journeys[journey_id] = entry
+                self._checked[journey_id] = time.monotonic()
+            return entry
+
+    def is_open(self, journey_id):
+        return self.get(journey_id) is not None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._journeys)
+
+    def add(self, journey):
+        self._emit({"event": "started", "journey": self._entry(journey)})
+
+    def remove(self, journey_id):
+        self._emit({"event": "completed", "journey_id": journey_id})
+
+    def clear(self):
+        self._emit({"event": "cleared"})
+
+    # Įvykis paskelbiamas visiems registrams (įskaitant šį) arba pritaikomas tiesiogiai
+    def _emit(self, message):
+        if self.pubsub is not None:
+            self.pubsub.publish(self.topic, message)
+        else:
+            self._apply(message)
+
+    def _apply(self, message):
+        with self._lock:
+            if message["event"] == "started":
+                self._journeys[message["journey"]["_id"]] = message["journey"]
+                self._checked[message["journey"]["_id"]] = time.monotonic()
+                self._missing.pop(message["journey"]["_id"], None)
+            elif message["event"] == "completed":
+                self._journeys.pop(message["journey_id"], None)
+                self._checked.pop(message["journey_id"], None)
+                self._generation += 1
+            elif message["event"] == "cleared":
+                self._journeys.clear()
+                self._checked.clear()
+                self._generation += 1
+
+    # Kelionių pakeitimai iš kitų procesų gaunami per change stream (reikalingas replica set)
+    def watch(self, stop_signal):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = Thread(target=self._watch, args=(stop_signal,), name="journey-registry-watch", daemon=True)
+        self._thread.start()
+
+    def _watch(self, stop_signal):
+        pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace", "delete", "drop"]}}}]
+        resume_token = None
+        while not stop_signal.is_set():
+            try:
+                with self.journeys_collection.watch(pipeline, full_document="updateLookup",
+                                                    resume_after=resume_token, max_await_time_ms=1000) as stream:
+                    # Registras perkraunamas jau atidarius srautą: tarp užkrovimo ir srauto
+                    # pradžios pradėtos kelionės nepraleidžiamos
+                    if resume_token is None:
+                        self.load()
+                    while not stop_signal.is_set():
+                        change = stream.try_next()
+                        if change is None:
+                            continue
+                        resume_token = stream.resume_token
+                        self._apply_change(change)
+            except PyMongoError as e:
+                print(f"Kelionių registro sinchronizavimo klaida: {str(e)}")
+                resume_token = None
+                time.sleep(1)
+
+    def _apply_change(self, change):
+        operation = change["operationType"]
+        if operation == "drop":
+            self._apply({"event": "cleared"})
+        elif operation == "delete":
+            self._apply({"event": "completed", "journey_id": change["documentKey"]["_id"]})
+        else:
+            journey = change.get("fullDocument")
+            if journey is None or journey.get("is_completed"):
+                self._apply({"event": "completed", "journey_id": change["documentKey"]["_id"]})
+            else:
+                self._apply({"event": "started", "journey": self._entry(journey)})
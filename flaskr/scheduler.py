@@ -0,0 +1,117 @@
+import heapq
+import time
+from threading import Condition, Thread
+
+
+# Vienas foninis srautas, valdantis periodinį koordinačių registravimą visoms aktyvioms kelionėms.
+# Kelionės laikomos prioritetinėje eilėje pagal kito registravimo laiką. Visos kelionės,
+# kurių laikas sutampa (coalesce_window ribose), apdorojamos kartu ir įrašomos vienu paketu.
+class CoordinateScheduler:
+    def __init__(self, stop_signal, is_active, generate, write, coalesce_window=0.5, max_wait=1.0):
+        # stop_signal - threading.Event, kurį nustačius planuoklis sustoja
+        # is_active(journey_ids) - grąžina aibę vis dar vykstančių kelionių ID
+        # generate(journey_id) - sukuria vieną koordinačių tašką kelionei
+        # write(points) - įrašo taškų sąrašą viena operacija
+        self.stop_signal = stop_signal
+        self.is_active = is_active
+        self.generate = generate
+        self.write = write
+        self.coalesce_window = coalesce_window
+        self.max_wait = max_wait
+
+        self._queue = []
+        self._intervals = {}
+        self._condition = Condition()
+        self._thread = None
+
+    # Užregistruojama kelionė periodiniam koordinačių registravimui
+    def schedule(self, journey_id, interval):
+        with self._condition:
+            self._intervals[journey_id] = interval
+            heapq.heappush(self._queue, (time.monotonic(), journey_id))
+            self._condition.notify()
+        self.start()
+
+    # Kelionė pašalinama iš planuoklio (eilės įrašas atmetamas jį ištraukus)
+    def cancel(self, journey_id):
+        with self._condition:
+            self._intervals.pop(journey_id, None)
+
+    def active_count(self):
+        with self._condition:
+            return len(self._intervals)
+
+    def start(self):
+        with self._condition:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = Thread(target=self._run, name="coordinate-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        self.stop_signal.set()
+        with self._condition:
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    # Laukiama, kol ateis artimiausias terminas, ir ištraukiamos visos tuo metu suėjusios kelionės
+    def _next_due(self):
+        with self._condition:
+            while not self.stop_signal.is_set():
+                now = time.monotonic()
+                if self._queue and self._queue[0][0] <= now + self.coalesce_window:
+                    break
+                timeout = self.max_wait
+                if self._queue:
+                    timeout = min(timeout, self._queue[0][0] - now)
+                self._condition.wait(timeout)
+            else:
+                return []
+
+            limit = time.monotonic() + self.coalesce_window
+            due = []
+            while self._queue and self._queue[0][0] <= limit:
+                due_time, journey_id = heapq.heappop(self._queue)
+                if journey_id in self._intervals:
+                    due.append((due_time, journey_id))
+            return due
+
+    def _reschedule(self, due, active):
+        now = time.monotonic()
+        with self._condition:
+            for due_time, journey_id in due:
+                interval = self._intervals.get(journey_id)
+                if interval is None:
+                    continue
+                if journey_id not in active:
+                    del self._intervals[journey_id]
+                    continue
+                # Kitas terminas skaičiuojamas nuo ankstesnio, kad intervalas nesislinktų
+                next_time = due_time + interval
+                if next_time < now:
+                    next_time = now + interval
+                heapq.heappush(self._queue, (next_time, journey_id))
+
+    def _run(self):
+        print("Koordinačių planuoklis paleistas.")
+        while not self.stop_signal.is_set():
+            due = self._next_due()
+            if not due:
+                continue
+            try:
+                # Vienu užklausimu patikrinama, kurios kelionės dar vyksta
+                active = self.is_active([journey_id for _, journey_id in due])
+                for _, journey_id in due:
+                    if journey_id not in active:
+                        print(f"Kelionė {journey_id} baigta. Periodinis užkrovimas sustabdytas.")
+
+                points = [self.generate(journey_id) for _, journey_id in due if journey_id in active]
+                if points:
+                    self.write(points)
+                    print(f"Koordinatės įkeltos {len(points)} kelionėms.")
+            except Exception as e:
+                print(f"Klaida periodinio užkrovimo metu: {str(e)}")
+                active = {journey_id for _, journey_id in due}
+            self._reschedule(due, active)
+        print("Koordinačių planuoklis sustabdytas.")
@@ -0,0 +1,150 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from bson.objectid import ObjectId
+from pymongo import UpdateOne
+
+from pagination import encode_cursor, decode_cursor
+
+# Rezultatų skaičius viename puslapyje (numatytasis ir didžiausias)
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+# Rezultatams, rastiems pagal ObjectId, suteikiamas už teksto paieškos įvertį didesnis įvertis
+ID_MATCH_SCORE = 1000.0
+# Trumpiausia valstybinio numerio arba VIN pradžia pasiūlymams
+MIN_PREFIX_LENGTH = 2
+
+
+# Valstybinio numerio ar VIN paieškos raktas: didžiosios raidės ir skaitmenys be tarpų ir brūkšnelių
+def search_key(value):
+    return re.sub(r"[^0-9A-Z]", "", str(value).upper())
+
+
+# Transporto priemonės paieškos raktai (multikey indeksas pasiūlymams pagal pradžią)
+def vehicle_search_keys(license_plate, vin):
+    return sorted({key for key in (search_key(license_plate), search_key(vin)) if key})
+
+
+# Paieškos puslapio žymeklis: paskutinio grąžinto rezultato (įvertis, tipas, _id)
+def decode_search_cursor(value):
+    score, kind, item_id = decode_cursor(value, 3)
+    if not isinstance(score, (int, float)) or not isinstance(kind, str) or not isinstance(item_id, ObjectId):
+        raise ValueError("Netinkamas cursor!")
+    return float(score), kind, item_id
+
+
+# Paieškos šaltinis: vienos kolekcijos užklausa, grąžinanti rezultatus su įverčiu
+class Source:
+    def __init__(self, kind, collection, match, score, projection):
+        self.kind = kind
+        self.collection = collection
+        self.match = match
+        self.score = score
+        self.projection = projection
+
+    # Rezultatai išrikiuoti taip pat kaip bendras sąrašas: įvertis mažėjančiai, tipas, _id.
+    # Po žymeklio grąžinami tik rezultatai, einantys po jo bendroje tvarkoje.
+    def pipeline(self, cursor, limit):
+        pipeline = [{"$match": self.match}, {"$addFields": {"score": self.score}}]
+        if cursor is not None:
+            score, kind, item_id = cursor
+            after = [{"score": {"$lt": score}}]
+            if self.kind > kind:
+                after.append({"score": score})
+            elif self.kind == kind:
+                after.append({"score": score, "_id": {"$gt": item_id}})
+            pipeline.append({"$match": {"$or": after}})
+        pipeline += [{"$sort": {"score": -1, "_id": 1}}, {"$limit": limit}, {"$project": self.projection}]
+        return pipeline
+
+    def run(self, cursor, limit):
+        items = list(self.collection.aggregate(self.pipeline(cursor, limit)))
+        for item in items:
+            item["type"] = self.kind
+        return items
+
+
+# Paieška klientuose, transporto priemonėse ir kelionėse: kolekcijų užklausos vykdomos
+# lygiagrečiai, rezultatai sujungiami pagal įvertį ir puslapiuojami žymekliu
+class SearchEngine:
+    def __init__(self, clients_collection, vehicles_collection, journeys_collection, workers=4):
+        self.clients_collection = clients_collection
+        self.vehicles_collection = vehicles_collection
+        self.journeys_collection = journeys_collection
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="search")
+
+    def sources(self, query):
+        text = {"$text": {"$search": query}}
+        text_score = {"$meta": "textScore"}
+        sources = [
+            Source("clients", self.clients_collection, text, text_score,
+                   {"_id": 1, "first_name": 1, "last_name": 1, "email": 1, "score": 1}),
+            Source("vehicles", self.vehicles_collection, text, text_score,
+                   {"_id": 1, "model": 1, "manufacturer": 1, "license_plate": 1, "client_id": 1, "score": 1})
+        ]
+        # Užklausa, kuri yra ObjectId: kelionė pagal journey_id arba transporto priemonės kelionės
+        if ObjectId.is_valid(query):
+            object_id = ObjectId(query)
+            sources.append(Source(
+                "journeys", self.journeys_collection, {"$or": [{"_id": object_id}, {"vehicle_id": object_id}]},
+                {"$literal": ID_MATCH_SCORE}, {"_id": 1, "vehicle_id": 1, "score": 1}
+            ))
+        return sources
+
+    # Vienas rezultatų puslapis ir kito puslapio žymeklis (None, jei daugiau rezultatų nėra)
+    def search(self, query, limit=DEFAULT_LIMIT, cursor=None):
+        futures = [self.executor.submit(source.run, cursor, limit + 1) for source in self.sources(query)]
+        # Tas pats dokumentas, rastas keliais šaltiniais, paliekamas su didžiausiu įverčiu
+        best = {}
+        for future in futures:
+            for item in future.result():
+                key = (item["type"], item["_id"])
+                if key not in best or item["score"] > best[key]["score"]:
+                    best[key] = item
+        items = list(best.values())
+        items.sort(key=lambda item: (-item["score"], item["type"], item["_id"]))
+        page = items[:limit]
+        next_cursor = None
+        if len(items) > limit:
+            next_cursor = encode_cursor([page[-1]["score"], page[-1]["type"], page[-1]["_id"]])
+        return page, next_cursor
+
+    # Užklausa su ^ pradžios reguliariąja išraiška naudoja search_keys indekso ribas
+    def suggest_cursor(self, key, limit=10):
+        return self.vehicles_collection.find(
+            {"search_keys": {"$regex": "^" + key}},
+            {"license_plate": 1, "vin": 1, "model": 1, "manufacturer": 1, "client_id": 1}
+        ).limit(limit)
+
+    # Transporto priemonės, kurių valstybinis numeris arba VIN prasideda nurodyta pradžia
+    def suggest(self, prefix, limit=10):
+        key = search_key(prefix)
+        if len(key) < MIN_PREFIX_LENGTH:
+            raise ValueError(f"Nurodykite bent {MIN_PREFIX_LENGTH} numerio arba VIN simbolius!")
+        vehicles = []
+        for vehicle in self.suggest_cursor(key, limit):
+            plate = search_key(vehicle.get("license_plate", ""))
+            vehicle["match"] = "license_plate" if plate.startswith(key) else "vin"
+            vehicles.append(vehicle)
+        # Tikslūs ir trumpesni atitikmenys pirmiau
+        def rank(vehicle):
+            matched = search_key(vehicle.get(vehicle["match"], ""))
+            return len(matched), matched
+
+        return sorted(vehicles, key=rank)
+
+    # Paieškos raktai papildomi anksčiau užregistruotoms transporto priemonėms
+    def rebuild_keys(self, batch_size=1000):
+        count = 0
+        operations = []
+        for vehicle in self.vehicles_collection.find({}, {"license_plate": 1, "vin": 1}):
+            keys = vehicle_search_keys(vehicle.get("license_plate", ""), vehicle.get("vin", ""))
+            operations.append(UpdateOne({"_id": vehicle["_id"]}, {"$set": {"search_keys": keys}}))
+            if len(operations) >= batch_size:
+                self.vehicles_collection.bulk_write(operations, ordered=False)
+                count += len(operations)
+                operations = []
+        if operations:
+            self.vehicles_collection.bulk_write(operations, ordered=False)
+            count += len(operations)
+        return count
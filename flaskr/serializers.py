@@ -0,0 +1,149 @@
+from analytics import SPEED_BIN_KMH, SPEED_BINS, IDLE_SPEED_KMH, to_datetime
+from export import TIMESTAMP_FORMAT
+
+
+# Atsakymų duomenų formavimas, bendras Flask ir ASGI programoms
+
+def client_record(client):
+    return {
+        "id": str(client["_id"]),
+        "first_name": client["first_name"],
+        "last_name": client["last_name"],
+        "email": client["email"],
+        "birth_date": client["birth_date"].strftime("%Y-%m-%d")
+    }
+
+
+# Įrašytas koordinačių taškas (laikas tekstu tuo pačiu formatu, kuriuo jis priimamas)
+def coordinates_record(journey_id, point):
+    return {
+        "journey_id": str(journey_id),
+        "timestamp": point["timestamp"].strftime(TIMESTAMP_FORMAT),
+        "latitude": point["latitude"],
+        "longitude": point["longitude"]
+    }
+
+
+# Kelionės trukmė minutėmis (baigtoms kelionėms)
+def journey_duration(journey):
+    if journey.get("start_time") and journey.get("end_time"):
+        return (journey["end_time"] - journey["start_time"]).total_seconds() / 60
+    return None
+
+
+# Kelionės informacija iš kelionės dokumente palaikomų suvestinių
+def journey_record(journey, method):
+    result = {
+        "journey_id": str(journey["_id"]),
+        "vehicle_id": str(journey["vehicle_id"]),
+        "start_time": journey["start_time"],
+        "total_duration": journey_duration(journey),
+        "total_distance": journey.get("total_distance", 0),
+        "distance_method": method,
+        "point_count": journey.get("point_count", 0)
+    }
+    if "end_time" in journey:
+        result["end_time"] = journey["end_time"]
+    return result
+
+
+# Kelionė sąraše: tik užklausoje pasirinkti laukai (_id pateikiamas kaip journey_id)
+def journey_list_record(journey):
+    record = {"journey_id": journey.pop("_id")}
+    record.update(journey)
+    return record
+
+
+# Transporto priemonės paskutinė padėtis (vehicle_positions dokumentas)
+def position_record(position):
+    longitude, latitude = position["location"]["coordinates"]
+    result = {
+        "vehicle_id": str(position["_id"]),
+        "journey_id": str(position["journey_id"]),
+        "timestamp": position["timestamp"].strftime(TIMESTAMP_FORMAT),
+        "latitude": latitude,
+        "longitude": longitude
+    }
+    if "distance_m" in position:
+        result["distance_m"] = round(position["distance_m"], 1)
+    return result
+
+
+# Kelionė, kurios taškai pateko į paieškos sritį
+def area_journey_record(item, vehicle_id):
+    return {
+        "journey_id": str(item["_id"]),
+        "vehicle_id": str(vehicle_id) if vehicle_id is not None else None,
+        "first_timestamp": item["first_timestamp"].strftime(TIMESTAMP_FORMAT),
+        "last_timestamp": item["last_timestamp"].strftime(TIMESTAMP_FORMAT),
+        "point_count": item["point_count"]
+    }
+
+
+# Pasiūlymas pagal valstybinio numerio arba VIN pradžią
+def suggestion_record(vehicle):
+    return {
+        "id": str(vehicle["_id"]),
+        "license_plate": vehicle.get("license_plate"),
+        "vin": vehicle.get("vin"),
+        "model": vehicle.get("model"),
+        "manufacturer": vehicle.get("manufacturer"),
+        "client_id": str(vehicle.get("client_id", "")),
+        "match": vehicle["match"]
+    }
+
+
+def stop_record(start, end, latitude, longitude, ongoing=False):
+    return {
+        "start": start.strftime(TIMESTAMP_FORMAT),
+        "end": end.strftime(TIMESTAMP_FORMAT),
+        "duration_minutes": round((end - start).total_seconds() / 60, 2),
+        "latitude": latitude,
+        "longitude": longitude,
+        "ongoing": ongoing
+    }
+
+
+# Kelionės analitika: greičiai km/h, laikas minutėmis, sustojimai ne trumpesni kaip stop_minutes.
+# Vykstančios kelionės sustojimas, besitęsiantis paskutiniame taške, pažymimas ongoing.
+def analytics_record(analytics, stop_minutes):
+    moving_seconds = analytics["moving_seconds"]
+    total_seconds = moving_seconds + analytics["idle_seconds"]
+    stops = [
+        stop_record(stop["start"], stop["end"], stop["latitude"], stop["longitude"])
+        for stop in analytics["stops"]
+    ]
+    open_stop = analytics["open_stop"]
+    if open_stop is not None:
+        stops.append(stop_record(
+            to_datetime(open_stop["start"]), analytics["last_point"]["timestamp"],
+            open_stop["latitude"], open_stop["longitude"], ongoing=True
+        ))
+    first_timestamp = analytics["first_timestamp"]
+    last_point = analytics["last_point"]
+    return {
+        "journey_id": str(analytics["_id"]),
+        "is_completed": analytics["is_completed"],
+        "point_count": analytics["point_count"],
+        "first_timestamp": first_timestamp.strftime(TIMESTAMP_FORMAT) if first_timestamp else None,
+        "last_timestamp": last_point["timestamp"].strftime(TIMESTAMP_FORMAT) if last_point else None,
+        "total_distance_km": round(analytics["distance_km"], 3),
+        "duration_minutes": round(total_seconds / 60, 2),
+        "moving_minutes": round(moving_seconds / 60, 2),
+        "idle_minutes": round(analytics["idle_seconds"] / 60, 2),
+        "average_speed_kmh": round(analytics["distance_km"] * 3600 / total_seconds, 2) if total_seconds else 0.0,
+        "moving_average_speed_kmh":
+            round(analytics["moving_distance_km"] * 3600 / moving_seconds, 2) if moving_seconds else 0.0,
+        "max_speed_kmh": round(analytics["max_speed_kmh"], 2),
+        "idle_speed_kmh": IDLE_SPEED_KMH,
+        "stop_minutes": stop_minutes,
+        "stops": [stop for stop in stops if stop["duration_minutes"] >= stop_minutes],
+        "speed_histogram": [
+            {
+                "from_kmh": index * SPEED_BIN_KMH,
+                "to_kmh": (index + 1) * SPEED_BIN_KMH if index < SPEED_BINS else None,
+                "minutes": round(seconds / 60, 2)
+            }
+            for index, seconds in enumerate(analytics["speed_histogram"])
+        ]
+    }
@@ -0,0 +1,77 @@
+"""API serverio paleidimas.
+
+    python serve.py --mode asgi --workers 4 --port 5000   # Starlette + Motor (uvicorn)
+    python serve.py --mode wsgi --port 5000               # Flask su srautais (kaip app.py)
+
+Keliems asgi procesams (--workers > 1) vykstančių kelionių registras sinchronizuojamas
+per change stream (REGISTRY_SYNC=changestream), o podėlis gali būti bendras (CACHE_BACKEND=redis).
+"""
+import argparse
+import os
+import sys
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+# Motor 2.5 (vienintelė su pymongo 3.12 suderinama versija) naudoja asyncio.coroutine,
+# kurio Python 3.11 nebeturi
+ASGI_MAX_PYTHON = (3, 11)
+
+
+def check_asgi_python():
+    if sys.version_info >= ASGI_MAX_PYTHON:
+        sys.exit(
+            f"asgi režimui reikalingas Python {ASGI_MAX_PYTHON[0]}.{ASGI_MAX_PYTHON[1] - 1} arba senesnis "
+            f"(Motor 2.5 su pymongo 3.12), dabar Python {sys.version_info[0]}.{sys.version_info[1]}. "
+            "Naudokite --mode wsgi."
+        )
+
+
+def serve_asgi(args):
+    import uvicorn
+
+    uvicorn.run(
+        "asgi:app",
+        app_dir=APP_DIR,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        backlog=args.backlog,
+        log_level=args.log_level,
+        access_log=False,
+        timeout_keep_alive=args.keep_alive
+    )
+
+
+def serve_wsgi(args):
+    sys.path.insert(0, APP_DIR)
+    import app as wsgi
+
+    try:
+        wsgi.app.run(host=args.host, port=args.port, threaded=True, use_reloader=False)
+    finally:
+        wsgi.coordinate_scheduler.stop(timeout=5)
+        if wsgi.ingest_buffer is not None:
+            wsgi.ingest_buffer.stop(timeout=5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=["asgi", "wsgi"], default="asgi")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=1, help="asgi procesų skaičius")
+    parser.add_argument("--backlog", type=int, default=4096, help="Laukiančių prisijungimų eilės dydis (asgi)")
+    parser.add_argument("--keep-alive", type=int, default=30, help="Neaktyvaus prisijungimo laikas sekundėmis (asgi)")
+    parser.add_argument("--log-level", default="warning")
+    args = parser.parse_args()
+
+    if args.mode == "asgi":
+        check_asgi_python()
+    print(f"Serveris paleistas ({args.mode}, {args.host}:{args.port})...")
+    if args.mode == "asgi":
+        serve_asgi(args)
+    else:
+        serve_wsgi(args)
+
+
+if __name__ == "__main__":
+    main()
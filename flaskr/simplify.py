@@ -0,0 +1,150 @@
+import heapq
+from collections import OrderedDict
+from threading import Lock
+
+import numpy as np
+
+from distance import EARTH_RADIUS_KM
+
+EARTH_RADIUS_M = EARTH_RADIUS_KM * 1000
+
+
+# Taškai projektuojami į plokštumą metrais (lygiakampė projekcija aplink vidutinę platumą)
+def project(latitudes, longitudes):
+    lat = np.radians(latitudes)
+    lon = np.radians(longitudes)
+    x = EARTH_RADIUS_M * lon * np.cos(lat.mean() if len(lat) else 0.0)
+    y = EARTH_RADIUS_M * lat
+    return x, y
+
+
+# Taškų atstumai iki atkarpos (a, b)
+def _segment_distances(x, y, ax, ay, bx, by):
+    dx, dy = bx - ax, by - ay
+    length_sq = dx * dx + dy * dy
+    if length_sq == 0:
+        return np.hypot(x - ax, y - ay)
+    t = np.clip(((x - ax) * dx + (y - ay) * dy) / length_sq, 0, 1)
+    return np.hypot(x - (ax + t * dx), y - (ay + t * dy))
+
+
+# Douglas-Peucker reikšmingumas: atstumas (m), kuriam esant taškas dar išlieka.
+# Kiekvieno taško reikšmė neviršija jį išskyrusio "tėvinio" taško reikšmės, todėl
+# taškai, kurių reikšmė didesnė už tolerance, sutampa su DP rezultatu tai tolerancijai.
+def dp_significance(x, y):
+    n = len(x)
+    significance = np.zeros(n)
+    if n == 0:
+        return significance
+    significance[0] = significance[-1] = np.inf
+    stack = [(0, n - 1, np.inf)]
+    while stack:
+        start, end, parent = stack.pop()
+        if end - start < 2:
+            continue
+        distances = _segment_distances(x[start + 1:end], y[start + 1:end], x[start], y[start], x[end], y[end])
+        index = int(np.argmax(distances))
+        value = min(float(distances[index]), parent)
+        split = start + 1 + index
+        significance[split] = value
+        stack.append((start, split, value))
+        stack.append((split, end, value))
+    return significance
+
+
+# Visvalingam-Whyatt reikšmingumas: efektyvaus trikampio ploto šaknis (m), kai taškas
+# pašalinamas. Reikšmės nemažėja šalinimo eigoje, todėl slenkstis ir taškų skaičius
+# atitinka VW rezultatą.
+def vw_significance(x, y):
+    n = len(x)
+    significance = np.full(n, np.inf)
+    if n < 3:
+        return significance
+    x, y = x.tolist(), y.tolist()
+
+    def area(a, b, c):
+        return abs((x[b] - x[a]) * (y[c] - y[a]) - (x[c] - x[a]) * (y[b] - y[a])) / 2
+
+    previous = list(range(-1, n - 1))
+    following = list(range(1, n + 1))
+    heap = [(area(i - 1, i, i + 1), i) for i in range(1, n - 1)]
+    heapq.heapify(heap)
+    current = {i: value for value, i in heap}
+    removed_max = 0.0
+    while heap:
+        value, i = heapq.heappop(heap)
+        if current.get(i) != value:
+            continue
+        del current[i]
+        removed_max = max(removed_max, value)
+        significance[i] = removed_max
+        a, c = previous[i], following[i]
+        following[a] = c
+        previous[c] = a
+        for j in (a, c):
+            if 0 < j < n - 1:
+                current[j] = area(previous[j], j, following[j])
+                heapq.heappush(heap, (current[j], j))
+    return np.sqrt(significance)
+
+
+ALGORITHMS = {
+    "dp": dp_significance,
+    "vw": vw_significance
+}
+
+
+def significance(track, algorithm="dp"):
+    x, y = project(track.latitudes, track.longitudes)
+    return ALGORITHMS[algorithm](x, y)
+
+
+# Išlaikomų taškų indeksai (laiko tvarka) pagal toleranciją (m) ir (arba) taškų skaičių
+def select(significance, tolerance=None, max_points=None):
+    indices = np.arange(len(significance))
+    if tolerance is not None:
+        indices = indices[significance > tolerance]
+    if max_points is not None and len(indices) > max_points:
+        top = np.argpartition(-significance[indices], max_points - 1)[:max_points]
+        indices = np.sort(indices[top])
+    return indices
+
+
+# Baigtų kelionių taškų ir jų reikšmingumo podėlis (baigta kelionė nebesikeičia).
+# Ribojamas bendru saugomų taškų skaičiumi, šalinami seniausiai naudoti įrašai.
+class SimplificationCache:
+    def __init__(self, max_points=5000000):
+        self.max_points = max_points
+        self._entries = OrderedDict()
+        self._points = 0
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, track, values):
+        if len(track) > self.max_points:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = (track, values)
+            self._points += len(track)
+            while self._points > self.max_points:
+                _, (old_track, _) = self._entries.popitem(last=False)
+                self._points -= len(old_track)
+
+    def invalidate(self, journey_id):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == journey_id]:
+                track, _ = self._entries.pop(key)
+                self._points -= len(track)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._points = 0
@@ -0,0 +1,156 @@
+import json
+import re
+from datetime import datetime
+
+from bson.objectid import ObjectId
+
+from distance import METHODS, DEFAULT_METHOD
+from export import TIMESTAMP_FORMAT
+from search import vehicle_search_keys
+
+# Didžiausias taškų kiekis vienoje paketinėje užklausoje
+MAX_BATCH_POINTS = 10000
+# Mažiausias periodinio koordinačių registravimo intervalas sekundėmis
+MIN_JOURNEY_INTERVAL = 5
+
+EMAIL_REGEX = re.compile(r'^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$')
+
+
+# Užklausų duomenų tikrinimas, bendras Flask ir ASGI programoms.
+# Netinkamų duomenų atveju keliama ValueError su klaidos pranešimu (atsakymas 400).
+
+def is_valid_email(email):
+    return isinstance(email, str) and EMAIL_REGEX.match(email) is not None
+
+
+def require_fields(data, fields, message="Trūksta duomenų"):
+    if not isinstance(data, dict):
+        raise ValueError("Netinkamas įrašo formatas!")
+    for field in fields:
+        if field not in data:
+            raise ValueError(f"{message}: {field}")
+
+
+def parse_object_id(value, name):
+    if not ObjectId.is_valid(value):
+        raise ValueError(f"Neteisingas {name} formatas!")
+    return ObjectId(value)
+
+
+# Naujo kliento dokumentas (birth_date paverčiama į datetime tipą)
+def parse_client(data):
+    require_fields(data, ["first_name", "last_name", "email", "birth_date"])
+    if not is_valid_email(data["email"]):
+        raise ValueError("Netinkamas pašto formatas.")
+    try:
+        birth_date = datetime.strptime(data["birth_date"], "%Y-%m-%d")
+    except (TypeError, ValueError):
+        raise ValueError("Netinkamas datos formatas. Naudokite YYYY-MM-DD.")
+
+    return {
+        "first_name": data["first_name"],
+        "last_name": data["last_name"],
+        "email": data["email"],
+        "birth_date": birth_date
+    }
+
+
+# Naujos transporto priemonės dokumentas (client_id paverčiamas į ObjectId,
+# pridedami valstybinio numerio ir VIN paieškos raktai)
+def parse_vehicle(data):
+    if not isinstance(data, dict):
+        raise ValueError("Netinkamas įrašo formatas!")
+    client_id = parse_object_id(data.get("client_id"), "client_id")
+    require_fields(data, ["model", "manufacturer", "license_plate", "vin", "year"])
+
+    return {
+        "client_id": client_id,
+        "model": data["model"],
+        "manufacturer": data["manufacturer"],
+        "license_plate": data["license_plate"],
+        "vin": data["vin"],
+        "year": data["year"],
+        "search_keys": vehicle_search_keys(data["license_plate"], data["vin"])
+    }
+
+
+# Naujos kelionės transporto priemonės ID ir registravimo intervalas
+def parse_journey(data):
+    if not isinstance(data, dict) or "vehicle_id" not in data or "interval" not in data:
+        raise ValueError("Trūksta laukelių: vehicle_id arba interval")
+    try:
+        interval = int(data["interval"])
+    except (TypeError, ValueError):
+        raise ValueError("Netinkamas intervalo formatas!")
+    if interval < MIN_JOURNEY_INTERVAL:
+        raise ValueError(f"Intervalas turi būti ne mažesnis kaip {MIN_JOURNEY_INTERVAL} sekundės!")
+    return parse_object_id(data["vehicle_id"], "vehicle_id"), interval
+
+
+# Patikrinamas vienas koordinačių įrašas ir paverčiamas duomenų bazės dokumentu
+def parse_coordinates(journey_id, data):
+    require_fields(data, ["latitude", "longitude", "timestamp"], "Trūksta laukelio")
+
+    try:
+        timestamp = datetime.strptime(data["timestamp"], TIMESTAMP_FORMAT)
+    except (TypeError, ValueError):
+        raise ValueError("Netinkamas laiko formatas. Naudokite YYYY-MM-DDTHH:MM:SS.")
+
+    try:
+        latitude = float(data["latitude"])
+        longitude = float(data["longitude"])
+    except (TypeError, ValueError):
+        raise ValueError("Netinkamas koordinačių formatas!")
+    if not (-90 <= latitude <= 90) or not (-180 <= longitude <= 180):
+        raise ValueError("Koordinatės už leistinų ribų!")
+
+    return {
+        "journey_id": journey_id,
+        "timestamp": timestamp,
+        "latitude": latitude,
+        "longitude": longitude
+    }
+
+
+# Neprivaloma laiko žyma iš užklausos parametro (YYYY-MM-DDTHH:MM:SS)
+def parse_timestamp(value):
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, TIMESTAMP_FORMAT)
+    except ValueError:
+        raise ValueError("Netinkamas laiko formatas. Naudokite YYYY-MM-DDTHH:MM:SS.")
+
+
+# Atstumo skaičiavimo metodas (?method=), numatytasis - suvestinėse naudojamas metodas
+def parse_distance_method(value):
+    method = value or DEFAULT_METHOD
+    if method not in METHODS:
+        raise ValueError(f"Nežinomas atstumo skaičiavimo metodas! Galimi: {', '.join(METHODS)}")
+    return method
+
+
+# Paketinės užklausos įrašai: JSON masyvas arba NDJSON (po vieną įrašą eilutėje).
+# Grąžinamas sąrašas porų (įrašas, klaida), kad klaidos būtų pranešamos pagal įrašo indeksą,
+# arba None, jei užklausos turinys nėra nei vienas iš šių formatų.
+def parse_batch_records(mimetype, body):
+    if mimetype in ("application/x-ndjson", "application/jsonl"):
+        records = []
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                records.append((json.loads(line), None))
+            except ValueError:
+                records.append((None, "Netinkama JSON eilutė!"))
+        return records
+
+    if mimetype != "application/json" and not mimetype.endswith("+json"):
+        return None
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return None
+    if not isinstance(data, list):
+        return None
+    return [(record, None) for record in data]
@@ -0,0 +1,143 @@
+from datetime import datetime, timedelta
+
+from pymongo import ASCENDING
+
+
+# Dienos pradžia, pagal kurią kaupiamos dienos suvestinės
+def day_start(moment):
+    return datetime(moment.year, moment.month, moment.day)
+
+
+# Baigtos kelionės indėlis į transporto priemonės suvestines
+def journey_totals(journey):
+    duration = 0
+    if journey.get("start_time") and journey.get("end_time"):
+        duration = (journey["end_time"] - journey["start_time"]).total_seconds() / 60
+    return {
+        "journey_count": 1,
+        "point_count": journey.get("point_count", 0),
+        "total_distance": journey.get("total_distance", 0),
+        "total_duration": duration
+    }
+
+
+def empty_totals():
+    return {"journey_count": 0, "point_count": 0, "total_distance": 0, "total_duration": 0}
+
+
+def add_totals(target, source):
+    for key in target:
+        target[key] += source.get(key, 0)
+    return target
+
+
+# Transporto priemonių statistikos suvestinės: bendros sumos (vehicle_stats) ir
+# dienos suvestinės (vehicle_stats_daily). Atnaujinamos baigus kelionę, o vykstančios
+# kelionės pridedamos skaitant, todėl užklausa nepriklauso nuo kelionių istorijos dydžio.
+class VehicleStatsRollup:
+    def __init__(self, stats_collection, daily_collection, journeys_collection, refresh=None):
+        self.stats_collection = stats_collection
+        self.daily_collection = daily_collection
+        self.journeys_collection = journeys_collection
+        # Vykstančios kelionės, pažymėtos perskaičiavimui, suvestinių perskaičiavimas prieš sumuojant
+        self.refresh = refresh
+
+    # Baigta kelionė pridedama prie bendros ir dienos suvestinės
+    def record_completed(self, journey):
+        totals = journey_totals(journey)
+        self.stats_collection.update_one(
+            {"_id": journey["vehicle_id"]},
+            {
+                "$inc": totals,
+                "$min": {"first_start_time": journey["start_time"]},
+                "$max": {"last_end_time": journey["end_time"]}
+            },
+            upsert=True
+        )
+        self.daily_collection.update_one(
+            {"vehicle_id": journey["vehicle_id"], "day": day_start(journey["start_time"])},
+            {"$inc": totals},
+            upsert=True
+        )
+
+    # Vykstančių transporto priemonės kelionių, pradėtų [since, until) intervale, kursorius
+    def live_cursor(self, vehicle_id, since=None, until=None):
+        query = {"vehicle_id": vehicle_id, "is_completed": False}
+        if since is not None or until is not None:
+            query["start_time"] = {}
+            if since is not None:
+                query["start_time"]["$gte"] = since
+            if until is not None:
+                query["start_time"]["$lt"] = until
+        return self.journeys_collection.find(
+            query, {"start_time": 1, "point_count": 1, "total_distance": 1, "stats_stale": 1}
+        )
+
+    # Vykstančios kelionės (pažymėtų perskaičiavimui suvestinės atnaujinamos)
+    def _live_journeys(self, vehicle_id, since=None, until=None):
+        for journey in self.live_cursor(vehicle_id, since, until):
+            if self.refresh is not None:
+                self.refresh(journey)
+            yield journey
+
+    # Vykstančios kelionės indėlis (trukmė įskaičiuojama tik ją baigus)
+    @staticmethod
+    def _live_totals(journey):
+        return {
+            "journey_count": 1,
+            "point_count": journey.get("point_count", 0),
+            "total_distance": journey.get("total_distance", 0)
+        }
+
+    # Bendra statistika: suvestinė + vykstančios kelionės. Grąžina None, jei kelionių nėra.
+    def totals(self, vehicle_id):
+        totals = empty_totals()
+        stats = self.stats_collection.find_one({"_id": vehicle_id})
+        if stats:
+            add_totals(totals, stats)
+        for journey in self._live_journeys(vehicle_id):
+            add_totals(totals, self._live_totals(journey))
+        return totals if totals["journey_count"] else None
+
+    # Dienų suvestinių [since, until) intervale kursorius
+    def daily_cursor(self, vehicle_id, since=None, until=None):
+        query = {"vehicle_id": vehicle_id}
+        if since is not None or until is not None:
+            query["day"] = {}
+            if since is not None:
+                query["day"]["$gte"] = since
+            if until is not None:
+                query["day"]["$lt"] = until
+        return self.daily_collection.find(query, {"_id": 0, "vehicle_id": 0}).sort("day", ASCENDING)
+
+    # Statistika pagal dienas [since, until] intervale (abi ribos imtinai)
+    def daily(self, vehicle_id, since=None, until=None):
+        until_exclusive = until + timedelta(days=1) if until is not None else None
+        days = {}
+        for bucket in self.daily_cursor(vehicle_id, since, until_exclusive):
+            days[bucket["day"]] = add_totals(empty_totals(), bucket)
+
+        for journey in self._live_journeys(vehicle_id, since, until_exclusive):
+            totals = days.setdefault(day_start(journey["start_time"]), empty_totals())
+            add_totals(totals, self._live_totals(journey))
+
+        return [dict(day=day, **days[day]) for day in sorted(days)]
+
+    # Suvestinių perskaičiavimas iš baigtų kelionių (vienkartinis užpildymas)
+    def rebuild(self, vehicle_id=None):
+        query = {"is_completed": True}
+        if vehicle_id is not None:
+            query["vehicle_id"] = vehicle_id
+            self.stats_collection.delete_one({"_id": vehicle_id})
+            self.daily_collection.delete_many({"vehicle_id": vehicle_id})
+        else:
+            self.stats_collection.delete_many({})
+            self.daily_collection.delete_many({})
+
+        count = 0
+        projection = {"vehicle_id": 1, "start_time": 1, "end_time": 1, "point_count": 1, "total_distance": 1}
+        for journey in self.journeys_collection.find(query, projection):
+            if journey.get("start_time") and journey.get("end_time"):
+                self.record_completed(journey)
+                count += 1
+        return count
@@ -0,0 +1,58 @@
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+from bson.objectid import ObjectId
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "flaskr"))
+from point_store import BucketedPointStore  # noqa: E402
+
+mongomock = pytest.importorskip("mongomock")
+
+START = datetime(2024, 12, 16, 8, 0, 0)
+
+
+def points(journey_id, *minutes):
+    return [
+        {"journey_id": journey_id, "timestamp": START + timedelta(minutes=minute), "latitude": 54.0, "longitude": 25.0}
+        for minute in minutes
+    ]
+
+
+# Kiekvieno kibiro intervalas apima visus jo taškus ir neviršija max_span
+def assert_buckets_within_span(collection, max_span):
+    for bucket in collection.find():
+        assert bucket["start"] == min(bucket["t"])
+        assert bucket["end"] == max(bucket["t"])
+        assert bucket["end"] - bucket["start"] <= max_span
+
+
+def test_out_of_order_chunks_do_not_stretch_bucket_past_max_span():
+    collection = mongomock.MongoClient().db.journey_point_buckets
+    max_span = timedelta(minutes=10)
+    store = BucketedPointStore(collection, max_points=100, max_span=max_span)
+    journey_id = ObjectId()
+
+    store.insert(points(journey_id, 0, 5))
+    # Dalis, kurios pradžia ir pabaiga atskirai artimos kibirui, bet sujungtas intervalas (-2..9) per ilgas
+    store.insert(points(journey_id, 9, -2))
+    # Vėliau atėjęs senesnis taškas, telpantis į esamą kibirą
+    store.insert(points(journey_id, -3))
+
+    assert_buckets_within_span(collection, max_span)
+    assert sorted(point["timestamp"] for point in store.iter_points(journey_id)) == \
+        [START + timedelta(minutes=minute) for minute in (-3, -2, 0, 5, 9)]
+
+
+def test_out_of_order_chunk_is_appended_when_merged_range_fits():
+    collection = mongomock.MongoClient().db.journey_point_buckets
+    max_span = timedelta(minutes=10)
+    store = BucketedPointStore(collection, max_points=100, max_span=max_span)
+    journey_id = ObjectId()
+
+    store.insert(points(journey_id, 4, 6))
+    store.insert(points(journey_id, 8, 1))
+
+    assert collection.count_documents({}) == 1
+    assert_buckets_within_span(collection, max_span)